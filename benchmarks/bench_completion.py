@@ -0,0 +1,493 @@
+"""
+Completion latency benchmarks for ClickCompleter.
+
+Builds synthetic click applications (very wide and very deep groups, chained
+groups, commands with many options, huge choices and big directories), and
+measures the latency of ``get_completions`` for every keystroke of a typed
+command line, as well as ``_resolve_context`` and ``split_arg_string`` alone,
+and the time to complete a pasted command line with and without debouncing.
+
+Usage::
+
+    python benchmarks/bench_completion.py --json bench.json
+    python benchmarks/bench_completion.py --json new.json --compare bench.json
+
+Results are printed as a table, and written as JSON with ``--json``, so that
+runs of different commits can be compared with ``--compare``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from importlib.metadata import version
+from typing import Any, Callable, Iterator
+
+import click
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from click_repl import ClickCompleter, build_manifest  # noqa: E402
+from click_repl._cache import ContextCache  # noqa: E402
+from click_repl.utils import _resolve_context, split_arg_string  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+
+class Scenario:
+    """A command line typed one keystroke at a time against a completer."""
+
+    def __init__(
+        self,
+        name: str,
+        cli: click.Group | Callable[[], click.Group],
+        line: str,
+        completer_options: dict[str, Any] | None = None,
+    ) -> None:
+        self.name = name
+        self.cli = cli
+        self.line = line
+        self.completer_options = completer_options or {}
+
+    def completer(self) -> ClickCompleter:
+        cli = self.cli if isinstance(self.cli, click.Group) else self.cli()
+        return ClickCompleter(cli, click.Context(cli), **self.completer_options)
+
+    def keystrokes(self) -> Iterator[Document]:
+        for end in range(1, len(self.line) + 1):
+            yield Document(self.line[:end])
+
+
+def _noop(**kwargs: Any) -> None:
+    pass
+
+
+def wide_cli(size: int) -> click.Group:
+    cli = click.Group("wide")
+    for i in range(size):
+        cli.add_command(click.Command(f"cmd-{i:05}", callback=_noop, help=f"Do {i}"))
+    return cli
+
+
+def deep_cli(depth: int) -> click.Group:
+    cli = group = click.Group("deep")
+    for level in range(depth):
+        child = click.Group(
+            f"level-{level}",
+            params=[click.Option([f"--opt-{level}"])],
+        )
+        group.add_command(child)
+        group = child
+
+    group.add_command(
+        click.Command(
+            "leaf",
+            callback=_noop,
+            params=[click.Argument(["value"], type=click.Choice(["alpha", "beta"]))],
+        )
+    )
+    return cli
+
+
+def chained_cli(size: int) -> click.Group:
+    cli = click.Group("chained", chain=True)
+    for i in range(size):
+        cli.add_command(
+            click.Command(
+                f"step-{i:03}",
+                callback=_noop,
+                params=[click.Option(["--count"], type=int)],
+            )
+        )
+    return cli
+
+
+def options_cli(size: int) -> click.Group:
+    cli = click.Group("options")
+    params: list[click.Parameter] = [
+        click.Option([f"--option-{i:04}"], type=click.Choice(["on", "off"]))
+        for i in range(size)
+    ]
+    params.append(click.Argument(["target"], type=click.Choice(["a", "b"])))
+    cli.add_command(click.Command("configure", callback=_noop, params=params))
+    return cli
+
+
+def choice_cli(size: int) -> click.Group:
+    cli = click.Group("choices")
+    choices = [f"sku-{i:07}" for i in range(size)]
+    cli.add_command(
+        click.Command(
+            "order",
+            callback=_noop,
+            params=[click.Argument(["sku"], type=click.Choice(choices))],
+        )
+    )
+    return cli
+
+
+class LazyGroup(click.Group):
+    """Imports its subcommands when they're first asked for."""
+
+    def __init__(self, name: str, size: int, import_time: float) -> None:
+        super().__init__(name)
+        self.names = [f"task-{i:04}" for i in range(size)]
+        self.import_time = import_time
+        self.imported: dict[str, click.Command] = {}
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return self.names
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        command = self.imported.get(cmd_name, None)
+        if command is None and cmd_name in self.names:
+            time.sleep(self.import_time)
+            command = self.imported[cmd_name] = click.Command(
+                cmd_name,
+                callback=_noop,
+                params=[click.Option(["--level"], type=click.Choice(["1", "2"]))],
+            )
+        return command
+
+
+def path_cli() -> click.Group:
+    cli = click.Group("paths")
+    cli.add_command(
+        click.Command(
+            "open",
+            callback=_noop,
+            params=[click.Argument(["path"], type=click.Path())],
+        )
+    )
+    return cli
+
+
+def make_directory(size: int) -> str:
+    directory = tempfile.mkdtemp(prefix="click-repl-bench-")
+    for i in range(size):
+        with open(os.path.join(directory, f"file-{i:06}.txt"), "w"):
+            pass
+    return directory
+
+
+def scenarios(scale: float, directory: str) -> list[Scenario]:
+    def scaled(size: int) -> int:
+        return max(1, int(size * scale))
+
+    wide = wide_cli(scaled(10_000))
+    deep = deep_cli(20)
+    deep_line = " ".join(f"level-{i} --opt-{i} x" for i in range(20)) + " leaf al"
+
+    options = options_cli(scaled(1_000))
+    choice = choice_cli(scaled(200_000))
+    fuzzy = {"fuzzy": True, "max_completions": 20}
+
+    lazy_line = "task-0042 --level "
+    lazy_manifest = build_manifest(LazyGroup("lazy", scaled(1_000), 0))
+
+    return [
+        Scenario("wide", wide, "cmd-0999"),
+        Scenario("wide-indexed", wide, "cmd-0999", {"use_command_index": True}),
+        Scenario("wide-fuzzy", wide, "cmd-0999", fuzzy),
+        Scenario("deep", deep, deep_line),
+        Scenario(
+            "deep-uncached", deep, deep_line, {"context_cache_size": 0}
+        ),
+        Scenario(
+            "chained",
+            chained_cli(scaled(200)),
+            " ".join(f"step-{i:03} --count 1" for i in range(0, 40, 4)),
+        ),
+        Scenario(
+            "options",
+            options,
+            "configure --option-0001 on --option-0999 off --option-05",
+        ),
+        Scenario(
+            "options-fuzzy",
+            options,
+            "configure --option-0001 on --option-0999 off --option-05",
+            fuzzy,
+        ),
+        Scenario("choice", choice, "order sku-01234"),
+        Scenario("choice-fuzzy", choice, "order sku-01234", fuzzy),
+        Scenario("choice-capped", choice, "order sku-01234", {"max_completions": 100}),
+        Scenario("directory", path_cli(), f"open {directory}{os.sep}file-0012"),
+        # A new application for every repetition, as imports happen only once
+        Scenario("lazy", lambda: LazyGroup("lazy", scaled(1_000), 0.001), lazy_line),
+        Scenario(
+            "lazy-manifest",
+            lambda: LazyGroup("lazy", scaled(1_000), 0.001),
+            lazy_line,
+            {"manifest": lazy_manifest},
+        ),
+    ]
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": at(0.5),
+        "p90": at(0.9),
+        "p99": at(0.99),
+        "max": ordered[-1],
+    }
+
+
+def run_scenario(scenario: Scenario, repeat: int) -> dict[str, Any]:
+    latencies = []
+    for _ in range(repeat):
+        completer = scenario.completer()
+        for document in scenario.keystrokes():
+            start = time.perf_counter()
+            list(completer.get_completions(document))
+            latencies.append(time.perf_counter() - start)
+
+    # Allocations are measured in a separate pass, as tracing slows down
+    # everything else.
+    completer = scenario.completer()
+    peaks = []
+    allocated = []
+    tracemalloc.start()
+    try:
+        for document in scenario.keystrokes():
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            list(completer.get_completions(document))
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            allocated.append(current - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "latency": percentiles(latencies),
+        "peak_bytes": percentiles([float(x) for x in peaks]),
+        "retained_bytes": percentiles([float(x) for x in allocated]),
+    }
+
+
+def time_calls(func: Callable[[], Any], number: int) -> dict[str, float]:
+    samples = []
+    for _ in range(number):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def run_micro(repeat: int) -> dict[str, Any]:
+    deep = deep_cli(20)
+    ctx = click.Context(deep)
+    args = split_arg_string(
+        " ".join(f"level-{i} --opt-{i} x" for i in range(20)) + " leaf"
+    )
+    cache = ContextCache()
+    line = " ".join(f"--name 'value {i}' \"quoted {i}\"" for i in range(200))
+    number = 50 * repeat
+
+    return {
+        "resolve_context": time_calls(lambda: _resolve_context(args, ctx), number),
+        "resolve_context_cached": time_calls(
+            lambda: _resolve_context(args, ctx, cache), number
+        ),
+        "split_arg_string": time_calls(lambda: split_arg_string(line), number),
+    }
+
+
+async def paste(completer: ClickCompleter, line: str) -> None:
+    """
+    Asks for the completions of every prefix of ``line`` at once, like a
+    prompt receiving a pasted line one character at a time.
+    """
+
+    async def collect(document: Document) -> None:
+        async for _ in completer.get_completions_async(document, CompleteEvent()):
+            pass
+
+    await asyncio.gather(
+        *(collect(Document(line[:end])) for end in range(1, len(line) + 1))
+    )
+
+
+def run_paste(repeat: int) -> dict[str, Any]:
+    deep = deep_cli(20)
+    line = " ".join(f"level-{i} --opt-{i} x" for i in range(20)) + " leaf al"
+
+    results = {}
+    for name, interval in (("paste", None), ("paste_debounced", 0.005)):
+        completer = ClickCompleter(
+            deep, click.Context(deep), collect_stats=True, debounce_interval=interval
+        )
+        timings = time_calls(lambda: asyncio.run(paste(completer, line)), repeat)
+
+        # Number of documents whose completions were computed, per paste
+        computed = completer.stats.summary()["total"].samples / repeat
+        results[name] = {**timings, "computed": computed}
+
+    return results
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(scale: float, repeat: int) -> dict[str, Any]:
+    return {
+        "schema": SCHEMA_VERSION,
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "click": version("click"),
+        "prompt_toolkit": version("prompt_toolkit"),
+        "scale": scale,
+        "repeat": repeat,
+    }
+
+
+def flatten(results: dict[str, Any]) -> dict[str, float]:
+    """Maps ``<benchmark>`` to its median latency, in seconds."""
+    flat = {name: r["latency"]["p50"] for name, r in results["scenarios"].items()}
+    flat.update({name: r["p50"] for name, r in results["micro"].items()})
+    return flat
+
+
+def report(results: dict[str, Any], baseline: dict[str, Any] | None) -> bool:
+    """Prints the results, and tells whether any benchmark regressed."""
+
+    old = flatten(baseline) if baseline is not None else {}
+    threshold = results["threshold"]
+    regressed = False
+
+    print(f"{'benchmark':<24}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'peak KiB':>10}")
+    for name, r in results["scenarios"].items():
+        latency = r["latency"]
+        print(
+            f"{name:<24}{latency['p50'] * 1e3:>10.3f}{latency['p90'] * 1e3:>10.3f}"
+            f"{latency['p99'] * 1e3:>10.3f}{r['peak_bytes']['max'] / 1024:>10.1f}"
+        )
+    for name, r in results["micro"].items():
+        print(
+            f"{name:<24}{r['p50'] * 1e3:>10.3f}{r['p90'] * 1e3:>10.3f}"
+            f"{r['p99'] * 1e3:>10.3f}{'':>10}"
+        )
+
+    if old:
+        print()
+        print(f"{'benchmark':<24}{'old ms':>10}{'new ms':>10}{'ratio':>10}")
+        for name, new in flatten(results).items():
+            if name not in old or not old[name]:
+                continue
+
+            ratio = new / old[name]
+            flag = ""
+            if ratio > threshold:
+                flag = "  regression"
+                regressed = True
+
+            print(
+                f"{name:<24}{old[name] * 1e3:>10.3f}{new * 1e3:>10.3f}"
+                f"{ratio:>10.2f}{flag}"
+            )
+
+    return regressed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--json", metavar="PATH", help="write the results to PATH")
+    parser.add_argument(
+        "--compare", metavar="PATH", help="compare with the results in PATH"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="median latency ratio reported as a regression (default: 1.25)",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiplies the size of the synthetic applications (default: 1)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="number of times each command line is typed (default: 3)",
+    )
+    parser.add_argument(
+        "--directory-size",
+        type=int,
+        default=100_000,
+        help="number of files in the benchmarked directory (default: 100000)",
+    )
+    parser.add_argument(
+        "-k", dest="only", metavar="NAME", help="run only scenarios containing NAME"
+    )
+    options = parser.parse_args(argv)
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+
+    directory = make_directory(max(1, int(options.directory_size * options.scale)))
+    try:
+        results: dict[str, Any] = {
+            "meta": metadata(options.scale, options.repeat),
+            "threshold": options.threshold,
+            "scenarios": {},
+            "micro": {},
+        }
+
+        for scenario in scenarios(options.scale, directory):
+            if options.only and options.only not in scenario.name:
+                continue
+            results["scenarios"][scenario.name] = run_scenario(scenario, options.repeat)
+
+        if not options.only:
+            results["micro"] = run_micro(options.repeat)
+            results["micro"].update(run_paste(options.repeat))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if report(results, baseline) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
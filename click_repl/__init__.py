@@ -1,4 +1,15 @@
+from ._batch import run_script as run_script  # noqa: F401
+from ._cache import cached_completion as cached_completion  # noqa: F401
+from ._cache import clear_completion_caches as clear_completion_caches  # noqa: F401
 from ._completer import ClickCompleter as ClickCompleter  # noqa: F401
+from ._file_history import MappedFileHistory as MappedFileHistory  # noqa: F401
+from ._history_search import (  # noqa: F401
+    history_search_key_bindings as history_search_key_bindings,
+)
+from ._manifest import build_manifest as build_manifest  # noqa: F401
+from ._manifest import load_manifest as load_manifest  # noqa: F401
+from ._manifest import save_manifest as save_manifest  # noqa: F401
+from ._vectorized import match_candidates as match_candidates  # noqa: F401
 from .core import pass_context as pass_context  # noqa: F401
 from ._repl import register_repl as register_repl  # noqa: F401
 from ._repl import repl as repl  # noqa: F401
@@ -0,0 +1,279 @@
+"""
+Batch mode of the REPL: runs the commands of a non-interactive stream, like
+stdin redirected from a file or a pipe, or a script, as fast as possible.
+"""
+
+from __future__ import annotations
+
+import os
+import stat
+import time
+from typing import IO, Callable, Iterable, Iterator, NamedTuple, cast
+
+import click
+
+from ._history import RingHistory
+from .exceptions import CommandLineParserError, ExitReplException
+from .globals_ import get_current_repl_ctx
+from .utils import _dispatch, _register_internal_command
+
+__all__ = [
+    "BATCH_HISTORY_SIZE",
+    "BatchReport",
+    "iter_commands",
+    "run_batch",
+    "run_script",
+]
+
+#: Number of characters read from regular files at once.
+CHUNK_SIZE = 1 << 16
+
+#: Number of commands kept in memory in the history in batch mode, unless
+#: another size is given, so that streams of any length run in bounded memory.
+BATCH_HISTORY_SIZE = 1000
+
+# Resolved paths of the scripts being run, so that a script sourcing itself,
+# directly or not, is rejected instead of recursing endlessly
+_running_scripts: list[str] = []
+
+
+class BatchReport(NamedTuple):
+    """Outcome of a batch of commands."""
+
+    #: Commands that were run.
+    commands: int
+    #: Commands that failed.
+    failures: int
+    #: Duration of the batch, in seconds.
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        """Commands run per second."""
+        return self.commands / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.commands} commands in {self.elapsed:.2f}s "
+            f"({self.rate:.0f} commands/s), {self.failures} failed"
+        )
+
+
+def _may_block(stream: IO[str]) -> bool:
+    """Tells whether reading ``stream`` may wait for a writer, like a pipe."""
+    try:
+        mode = os.fstat(stream.fileno()).st_mode
+    except (AttributeError, OSError, ValueError):
+        # In memory
+        return False
+
+    return not stat.S_ISREG(mode)
+
+
+def iter_commands(
+    stream: IO[str], chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[int, str]]:
+    """
+    Reads the commands of ``stream``, a chunk of lines at a time.
+
+    Pipes and terminals are read a line at a time instead, so that each
+    command runs as soon as it's written, rather than once a whole chunk
+    arrived.
+
+    Blank lines, and comments starting with ``#``, are skipped.
+
+    Yields
+    ------
+    tuple[int, str]
+        The line number of a command, and the command.
+    """
+
+    chunks: Iterable[list[str]]
+    if _may_block(stream):
+        chunks = ([line] for line in stream)
+    else:
+        chunks = iter(lambda: stream.readlines(chunk_size), [])
+
+    line_number = 0
+
+    for lines in chunks:
+        for line in lines:
+            line_number += 1
+            command = line.strip()
+
+            if command and not command.startswith("#"):
+                yield line_number, command
+
+
+def run_batch(
+    commands: Iterator[tuple[int, str]],
+    dispatch: Callable[[str], bool],
+    history: RingHistory | None = None,
+    fail_fast: bool = False,
+    source: str | None = None,
+) -> BatchReport:
+    """
+    Runs ``commands``, and reports the failed ones on stderr.
+
+    Parameters
+    ----------
+    commands
+        Line numbers and commands, as yielded by :func:`iter_commands`.
+
+    dispatch
+        Runs a command, and tells whether it succeeded.
+
+    history
+        Where the commands are recorded, if given.
+
+    fail_fast
+        Whether to stop at the first failed command, instead of continuing
+        with the next one.
+
+    source
+        Name of the file the commands come from, in the reported errors.
+    """
+
+    count = failures = 0
+    start = time.perf_counter()
+
+    for line_number, command in commands:
+        if history is not None:
+            history.append(command)
+        count += 1
+
+        location = f"line {line_number}"
+        if source is not None:
+            location = f"{source}, {location}"
+
+        try:
+            succeeded = dispatch(command)
+
+        except ExitReplException:
+            break
+
+        except CommandLineParserError as e:
+            click.echo(f"Error: {location}: {e}", err=True)
+            succeeded = False
+
+        except Exception as e:
+            # Unlike in an interactive session, an error of a command
+            # shouldn't discard the rest of the stream.
+            click.echo(f"Error: {location}: {type(e).__name__}: {e}", err=True)
+            succeeded = False
+
+        else:
+            if not succeeded:
+                # The error itself, if any, was shown by the command
+                click.echo(f"Error: {location}: command failed: {command}", err=True)
+
+        if not succeeded:
+            failures += 1
+            if fail_fast:
+                break
+
+    return BatchReport(count, failures, time.perf_counter() - start)
+
+
+def run_script(
+    group_ctx: click.Context,
+    path: str | os.PathLike[str],
+    allow_system_commands: bool = True,
+    allow_internal_commands: bool = True,
+    fail_fast: bool = False,
+) -> BatchReport:
+    """
+    Runs the commands of a script, a file with a REPL command per line, as
+    if they were entered in the REPL of ``group_ctx``.
+
+    The file is read in chunks, so that scripts of any size run in bounded
+    memory. Blank lines, and comments starting with ``#``, are skipped. The
+    commands that fail are reported on stderr, with their line number.
+
+    Parameters
+    ----------
+    group_ctx
+        Context of the group whose subcommands are run.
+
+    path
+        Path of the script, encoded in UTF-8.
+
+    allow_system_commands
+        Whether commands starting with ``!`` are run by the shell.
+
+    allow_internal_commands
+        Whether commands starting with ``:`` are run as internal commands.
+
+    fail_fast
+        Whether to stop at the first failed command, instead of continuing
+        with the next one.
+
+    Returns
+    -------
+    BatchReport
+        How many commands were run, and how many of them failed.
+
+    Raises
+    ------
+    OSError
+        If the script can't be read.
+
+    click.ClickException
+        If the script is already being run, because it sources itself,
+        directly or through other scripts.
+    """
+
+    group = cast(click.MultiCommand, group_ctx.command)
+    real_path = os.path.realpath(path)
+    if real_path in _running_scripts:
+        raise click.ClickException(f"{os.fspath(path)} sources itself")
+
+    def dispatch(command: str) -> bool:
+        return _dispatch(
+            command, group, group_ctx, allow_internal_commands, allow_system_commands
+        )
+
+    with open(path, encoding="utf-8") as f:
+        _running_scripts.append(real_path)
+        try:
+            return run_batch(
+                iter_commands(f), dispatch, fail_fast=fail_fast, source=os.fspath(path)
+            )
+        finally:
+            _running_scripts.pop()
+
+
+def _source_internal(path: str) -> None:
+    repl_ctx = get_current_repl_ctx(silent=True)
+    if repl_ctx is None:
+        print("No REPL to run the script in")
+        return
+
+    if not path:
+        print("Usage: :source <file>")
+        return
+
+    try:
+        report = run_script(
+            repl_ctx.group_ctx,
+            path,
+            allow_system_commands=repl_ctx.allow_system_commands,
+            fail_fast=repl_ctx.fail_fast,
+        )
+    except OSError as e:
+        raise click.FileError(path, hint=e.strerror or str(e))
+
+    click.echo(str(report), err=True)
+    if report.failures:
+        # Fails the :source command itself, in the batch it's run from
+        raise click.ClickException(
+            f"{path}: {report.failures} of {report.commands} commands failed"
+        )
+
+
+_register_internal_command(
+    "source",
+    _source_internal,
+    "runs the commands of a file, one per line",
+    takes_argument=True,
+)
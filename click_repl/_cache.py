@@ -0,0 +1,445 @@
+"""
+Bounded caches used to avoid repeating work between keystrokes.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import typing as t
+import weakref
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Generic, Hashable, Iterable, NamedTuple
+
+import click
+
+from ._vectorized import HAS_NUMPY, VECTORIZE_THRESHOLD, CandidateArray
+
+__all__ = [
+    "CacheInfo",
+    "CompletionCache",
+    "ContextCache",
+    "ContextCacheInfo",
+    "LRUCache",
+    "cached_completion",
+    "clear_completion_caches",
+]
+
+K = t.TypeVar("K", bound=Hashable)
+V = t.TypeVar("V")
+F = t.TypeVar("F", bound=Callable[..., Iterable[Any]])
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class ContextCacheInfo(NamedTuple):
+    hits: int
+    #: Lookups that resumed from a cached ancestor context.
+    partial_hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A size-bounded mapping that evicts the least recently used entry.
+
+    Parameters
+    ----------
+    maxsize
+        Maximum number of entries kept in the cache.
+    """
+
+    __slots__ = ("maxsize", "hits", "misses", "_data")
+
+    def __init__(self, maxsize: int = 128) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, V] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def peek(self, key: K) -> V | None:
+        """Returns the value of ``key`` without touching counters or recency."""
+        return self._data.get(key, None)
+
+    def get(self, key: K) -> V | None:
+        """Returns the value of ``key`` and marks it as most recently used."""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def touch(self, key: K) -> None:
+        self._data.move_to_end(key)
+
+    def pop(self, key: K) -> V | None:
+        return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = self.misses = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+
+#: A resolved context, and the index of the first token its command received.
+ContextEntry = t.Tuple[click.Context, int]
+
+
+class ContextCache:
+    """
+    LRU cache of resolved click contexts, keyed by tuples of tokens.
+
+    Two kinds of entries are stored. *Resolved* entries map a complete token
+    list to the context it resolves to. *Ancestor* entries map a token prefix
+    to the context of a group that stopped parsing at the last token of that
+    prefix (its subcommand name), so the context is completely determined by
+    the prefix. Any longer token list starting with such a prefix can resume
+    resolving from that context at the subcommand name, instead of from the
+    root.
+
+    Parameters
+    ----------
+    maxsize
+        Maximum number of contexts kept in the cache.
+    """
+
+    __slots__ = ("_cache", "_max_prefix_len", "hits", "partial_hits", "misses")
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self._cache: LRUCache[tuple[bool, tuple[str, ...]], ContextEntry] = LRUCache(
+            maxsize
+        )
+        self._max_prefix_len = 0
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def maxsize(self) -> int:
+        return self._cache.maxsize
+
+    def get_resolved(self, key: tuple[str, ...]) -> ContextEntry | None:
+        entry = self._cache.peek((False, key))
+        if entry is not None:
+            self._cache.touch((False, key))
+            self.hits += 1
+        return entry
+
+    def set_resolved(self, key: tuple[str, ...], entry: ContextEntry) -> None:
+        self._cache.set((False, key), entry)
+
+    def get_ancestor(self, key: tuple[str, ...]) -> tuple[int, ContextEntry] | None:
+        """
+        Finds the context of the longest cached prefix of ``key``.
+
+        Returns
+        -------
+        tuple[int, ContextEntry] | None
+            The length of the prefix, and its cached entry. :obj:`None` if no
+            prefix of ``key`` is cached.
+        """
+
+        for length in range(min(len(key), self._max_prefix_len), 0, -1):
+            entry = self._cache.peek((True, key[:length]))
+
+            if entry is not None:
+                self._cache.touch((True, key[:length]))
+                self.partial_hits += 1
+                return length, entry
+
+        self.misses += 1
+        return None
+
+    def set_ancestor(self, prefix: tuple[str, ...], entry: ContextEntry) -> None:
+        self._cache.set((True, prefix), entry)
+        self._max_prefix_len = max(self._max_prefix_len, len(prefix))
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._max_prefix_len = 0
+        self.hits = self.partial_hits = self.misses = 0
+
+    def info(self) -> ContextCacheInfo:
+        return ContextCacheInfo(
+            self.hits,
+            self.partial_hits,
+            self.misses,
+            self._cache.maxsize,
+            len(self._cache),
+        )
+
+
+def _freeze(value: Any) -> Hashable:
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return t.cast(Hashable, value)
+
+
+def _completion_value(item: Any) -> str:
+    if isinstance(item, tuple):
+        return str(item[0])
+    return str(getattr(item, "value", item))
+
+
+class _CompletionEntry(NamedTuple):
+    items: list[Any]
+    expires: float
+    #: Values of the items, for vectorized filtering of large results.
+    array: CandidateArray | None = None
+
+
+# Every cache created by cached_completion(), for clear_completion_caches()
+_completion_caches: weakref.WeakSet[CompletionCache] = weakref.WeakSet()
+
+
+class CompletionCache:
+    """
+    TTL and size bounded cache of the results of a completion callback.
+
+    Parameters
+    ----------
+    ttl
+        Seconds after which cached results expire. :obj:`None` keeps them
+        until they are evicted or invalidated.
+
+    maxsize
+        Maximum number of results kept in the cache.
+
+    prefix_filter
+        If :obj:`True`, results cached for a prefix of the incomplete value are
+        filtered to answer a lookup, instead of calling the callback again. This
+        requires the callback to only return values that start with the
+        incomplete value.
+
+    vectorize_threshold
+        Number of cached results from which they're filtered with NumPy, if
+        it's installed. :obj:`None` always filters in pure Python.
+    """
+
+    __slots__ = (
+        "ttl",
+        "prefix_filter",
+        "vectorize_threshold",
+        "_cache",
+        "_lock",
+        "__weakref__",
+    )
+
+    def __init__(
+        self,
+        ttl: float | None = 60.0,
+        maxsize: int = 128,
+        prefix_filter: bool = True,
+        vectorize_threshold: int | None = VECTORIZE_THRESHOLD,
+    ) -> None:
+        self.ttl = ttl
+        self.prefix_filter = prefix_filter
+        self.vectorize_threshold = vectorize_threshold
+        self._cache: LRUCache[tuple[Hashable, str], _CompletionEntry] = LRUCache(
+            maxsize
+        )
+        self._lock = threading.Lock()
+
+    def _get_valid(
+        self, key: tuple[Hashable, str], now: float
+    ) -> _CompletionEntry | None:
+        entry = self._cache.peek(key)
+        if entry is None:
+            return None
+
+        if entry.expires < now:
+            self._cache.pop(key)
+            return None
+
+        self._cache.touch(key)
+        return entry
+
+    def lookup(self, scope: Hashable, incomplete: str) -> list[Any] | None:
+        """
+        Returns the cached results for ``incomplete`` in the given ``scope``,
+        or :obj:`None` if they have to be computed.
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._get_valid((scope, incomplete), now)
+            if entry is not None:
+                self._cache.hits += 1
+                return entry.items
+
+            if self.prefix_filter:
+                for length in range(len(incomplete) - 1, -1, -1):
+                    key = (scope, incomplete[:length])
+                    entry = self._get_valid(key, now)
+                    if entry is None:
+                        continue
+
+                    # Narrowed results expire along with their superset
+                    narrowed = self._narrow(key, entry, incomplete)
+                    self._cache.set((scope, incomplete), narrowed)
+                    self._cache.hits += 1
+                    return narrowed.items
+
+            self._cache.misses += 1
+            return None
+
+    def _vectorize(self, size: int) -> bool:
+        threshold = self.vectorize_threshold
+        return HAS_NUMPY and threshold is not None and size >= threshold
+
+    def _narrow(
+        self, key: tuple[Hashable, str], entry: _CompletionEntry, incomplete: str
+    ) -> _CompletionEntry:
+        items = entry.items
+
+        array = entry.array
+        if array is None and self._vectorize(len(items)):
+            try:
+                array = CandidateArray([_completion_value(item) for item in items])
+            except MemoryError:
+                pass
+            else:
+                # Kept for narrowing the same results again
+                self._cache.set(key, entry._replace(array=array))
+
+        if array is None:
+            return _CompletionEntry(
+                [
+                    item
+                    for item in items
+                    if _completion_value(item).startswith(incomplete)
+                ],
+                entry.expires,
+            )
+
+        indices = array.match(incomplete)
+        narrowed = [items[i] for i in indices]
+
+        return _CompletionEntry(
+            narrowed,
+            entry.expires,
+            array.take(indices) if self._vectorize(len(narrowed)) else None,
+        )
+
+    def store(self, scope: Hashable, incomplete: str, items: list[Any]) -> None:
+        expires = float("inf") if self.ttl is None else time.monotonic() + self.ttl
+
+        with self._lock:
+            self._cache.set((scope, incomplete), _CompletionEntry(items, expires))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def info(self) -> CacheInfo:
+        return self._cache.info()
+
+
+def cached_completion(
+    ttl: float | None = 60.0,
+    maxsize: int = 128,
+    prefix_filter: bool = True,
+    vectorize_threshold: int | None = VECTORIZE_THRESHOLD,
+) -> Callable[[F], F]:
+    """
+    Decorator that memoizes the results of a dynamic completion callback,
+    i.e. a ``shell_complete`` function of click 8, or an ``autocompletion``
+    function of click 7.
+
+    Results are cached per parameter, values of the already parsed parameters
+    of the command and its parent groups, and incomplete value. See
+    :class:`CompletionCache` for the meaning of the arguments.
+
+    The decorated function gets ``cache_clear()`` and ``cache_info()``
+    attributes. :func:`clear_completion_caches` invalidates every cache.
+
+    .. code-block:: python
+
+        @click.argument("host", shell_complete=cached_completion(ttl=30)(hosts))
+    """
+
+    def decorator(func: F) -> F:
+        cache = CompletionCache(ttl, maxsize, prefix_filter, vectorize_threshold)
+        _completion_caches.add(cache)
+
+        @wraps(func)
+        def wrapper(*args: Any) -> list[Any]:
+            # (ctx, param, incomplete) for shell_complete, and
+            # (ctx, args, incomplete) for autocompletion. A ParamType's
+            # shell_complete method gets the type as well.
+            ctx: click.Context = args[-3]
+            incomplete: str = args[-1]
+            param_or_args = args[-2]
+
+            if isinstance(param_or_args, list):
+                param_or_args = tuple(param_or_args)
+
+            parent_params = []
+            parent: click.Context | None = ctx
+            while parent is not None:
+                parent_params.append(
+                    tuple((name, _freeze(value)) for name, value in parent.params.items())
+                )
+                parent = parent.parent
+
+            scope = (args[:-3], param_or_args, tuple(parent_params))
+
+            items = cache.lookup(scope, incomplete)
+            if items is None:
+                items = list(func(*args))
+                cache.store(scope, incomplete, items)
+
+            return list(items)
+
+        wrapper.cache_clear = cache.clear  # type: ignore[attr-defined]
+        wrapper.cache_info = cache.info  # type: ignore[attr-defined]
+        return t.cast(F, wrapper)
+
+    return decorator
+
+
+def clear_completion_caches() -> None:
+    """
+    Invalidates the results cached by every :func:`cached_completion`
+    decorated callback, e.g. from a REPL command that changed the data
+    those callbacks complete.
+    """
+
+    for cache in list(_completion_caches):
+        cache.clear()
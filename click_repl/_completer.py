@@ -1,36 +1,102 @@
 from __future__ import annotations
 
+import asyncio
+import inspect
 import os
+import threading
+import time
 import typing as t
-from glob import iglob
-from typing import Generator
+from functools import partial
+from itertools import islice
+from typing import (
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Generator,
+    Iterator,
+    NamedTuple,
+)
 
 import click
+from prompt_toolkit.application.current import get_app_or_none
 from prompt_toolkit.completion import CompleteEvent, Completer, Completion
 from prompt_toolkit.document import Document
 
-from .utils import _resolve_context, split_arg_string
+from ._cache import ContextCache
+from ._index import FUZZY_LIMIT, ChoiceIndex, CommandEntry, CommandIndex, OptionTable
+from ._manifest import load_manifest, manifest_cli
+from ._paths import DirectoryCache, DirectoryScan, accepts_entry
+from ._prewarm import Prewarmer
+from ._snapshot import IndexSnapshot, cli_fingerprint
+from ._stats import CompletionStats
+from ._workers import CallbackRunner, run_coroutine
+from .utils import (
+    AUTO_COMPLETION_PARAM,
+    HAS_CLICK_V8,
+    IncrementalTokenizer,
+    _resolve_leaf_context,
+)
 
 __all__ = ["ClickCompleter"]
 
 IS_WINDOWS = os.name == "nt"
 
 
-# Handle backwards compatibility between Click<=7.0 and >=8.0
-try:
-    import click.shell_completion
+# Shown in place of the results of completion callbacks that are still running.
+# Selecting it inserts nothing.
+LOADING_COMPLETION = Completion("", 0, display="...", display_meta="loading")
 
-    HAS_CLICK_V8 = True
-    AUTO_COMPLETION_PARAM = "shell_complete"
-except (ImportError, ModuleNotFoundError):
-    import click._bashcomplete  # type: ignore[import]
+# Shown after the entries of a directory that couldn't be listed in time.
+TRUNCATED_COMPLETION = Completion("", 0, display="...", display_meta="truncated")
 
-    HAS_CLICK_V8 = False
-    AUTO_COMPLETION_PARAM = "autocompletion"
+
+def _is_async_callback(callback: Callable[..., t.Any]) -> bool:
+    return inspect.iscoroutinefunction(callback) or inspect.isasyncgenfunction(callback)
+
+
+class _PathRequest(NamedTuple):
+    directory: str
+    prefix: str
+    files: bool
+    hidden: bool
+    incomplete: str
+    quote: str
 
 
 class ClickCompleter(Completer):
-    __slots__ = ("cli", "ctx", "parsed_args", "parsed_ctx", "ctx_command")
+    __slots__ = (
+        "cli",
+        "ctx",
+        "parsed_args",
+        "parsed_ctx",
+        "ctx_command",
+        "use_command_index",
+        "context_cache",
+        "_command_indexes",
+        "_option_tables",
+        "_choice_indexes",
+        "_build_lock",
+        "_prewarmer",
+        "_snapshot",
+        "_tokenizer",
+        "callback_timeout",
+        "callback_workers",
+        "_callback_runner",
+        "_parsed_offset",
+        "max_completions",
+        "directory_cache",
+        "async_path_completion",
+        "path_scan_deadline",
+        "_path_scan",
+        "_pending_path_request",
+        "_pending_providers",
+        "_deferring",
+        "debounce_interval",
+        "_last_request",
+        "_request_generation",
+        "stats",
+        "fuzzy",
+    )
 
     def __init__(
         self,
@@ -38,88 +104,534 @@ class ClickCompleter(Completer):
         ctx: click.Context,
         show_only_unused: bool = False,
         shortest_only: bool = False,
+        use_command_index: bool = False,
+        context_cache_size: int = 128,
+        callback_timeout: float | None = None,
+        callback_workers: int = 4,
+        max_completions: int | None = None,
+        directory_cache_size: int = 64,
+        async_path_completion: bool = False,
+        path_scan_deadline: float | None = 1.0,
+        collect_stats: bool = False,
+        fuzzy: bool = False,
+        manifest: str | os.PathLike[str] | t.Mapping[str, t.Any] | None = None,
+        index_cache: str | os.PathLike[str] | None = None,
+        debounce_interval: float | None = None,
     ) -> None:
+        fingerprint_args: tuple[t.Any, ...] = (cli, ctx)
+
+        if manifest is not None:
+            # Completions come from stand-ins of the commands described by the
+            # manifest, so that the commands of cli are only loaded to run them.
+            if not isinstance(manifest, t.Mapping):
+                manifest = load_manifest(manifest)
+
+            cli = manifest_cli(manifest, cli)
+            ctx = click.Context(cli, info_name=ctx.info_name, obj=ctx.obj)
+            fingerprint_args += (manifest["root"],)
+
         self.cli = cli
         self.ctx = ctx
         self.parsed_args: list[str] = []
         self.parsed_ctx = ctx
+        # Index of the first token passed to the parsed context's command
+        self._parsed_offset = 0
         self.ctx_command = ctx.command
         self.show_only_unused = show_only_unused
         self.shortest_only = shortest_only
 
-    def _get_completion_from_autocompletion_functions(
+        # Subcommand names are looked up in a prefix trie per group, instead of
+        # resolving every subcommand of the group on every keystroke.
+        self.use_command_index = use_command_index
+        self._command_indexes: dict[click.MultiCommand, CommandIndex] = {}
+        self._option_tables: dict[click.Command, OptionTable] = {}
+        self._choice_indexes: dict[click.Choice, ChoiceIndex] = {}
+
+        # Held while the indexes above and the context cache are built or
+        # looked up, as a Prewarmer may be building them in its own thread.
+        self._build_lock = threading.RLock()
+        self._prewarmer: Prewarmer | None = None
+
+        # The indexes are saved to the index_cache file, and restored from it
+        # in the next REPL, unless the CLI changed in the meantime.
+        self._snapshot: IndexSnapshot | None = None
+        if index_cache is not None:
+            self._snapshot = IndexSnapshot(
+                index_cache, cli_fingerprint(*fingerprint_args)
+            )
+            self._snapshot.load()
+
+        # Resolved contexts keyed by token prefixes, so that editing the
+        # command line doesn't re-parse it from the root every time.
+        self.context_cache: ContextCache | None = None
+        if context_cache_size > 0:
+            self.context_cache = ContextCache(context_cache_size)
+
+        self._tokenizer = IncrementalTokenizer(posix=False)
+
+        # With a timeout, the shell_complete/autocompletion callbacks run in a
+        # worker pool, and the prompt waits for them only up to the timeout.
+        # Parameters can override it with a ``completion_timeout`` attribute.
+        self.callback_timeout = callback_timeout
+        self.callback_workers = callback_workers
+        self._callback_runner: CallbackRunner | None = None
+
+        # Upper bound on the number of completions offered for a value, and
+        # on their total. Completions are produced lazily, so those past the
+        # bound are never built.
+        self.max_completions = max_completions
+
+        # Directory listings for path completion, reused until the directory
+        # is modified.
+        self.directory_cache = DirectoryCache(directory_cache_size)
+
+        # With async completion, directories are listed in a background thread
+        # and their entries are streamed to the prompt as they're found, for
+        # at most ``path_scan_deadline`` seconds.
+        self.async_path_completion = async_path_completion
+        self.path_scan_deadline = path_scan_deadline
+        self._path_scan: DirectoryScan | None = None
+        self._pending_path_request: _PathRequest | None = None
+
+        # While get_completions_async produces completions, the sources that
+        # may block (completion callbacks, and directory scans with async
+        # completion) are set aside, to be run concurrently once the others
+        # are yielded.
+        self._pending_providers: list[AsyncIterator[Completion]] = []
+        self._deferring = False
+
+        # When get_completions_async is called again within debounce_interval
+        # seconds, as while pasting or typing fast, it waits for that long, and
+        # gives up if the document has been superseded in the meantime. The
+        # prompt asks again for the latest one.
+        self.debounce_interval = debounce_interval
+        self._last_request = float("-inf")
+        self._request_generation = 0
+
+        # Durations of the completion phases, recorded while enabled.
+        self.stats = CompletionStats(collect_stats)
+
+        # Subcommands, options and choices are matched fuzzily instead of by
+        # prefix, ranked best first, through indexes built on first use. Only
+        # the max_completions best matches are kept, FUZZY_LIMIT by default.
+        self.fuzzy = fuzzy
+
+    def _fuzzy_limit(self) -> int:
+        # Fuzzy matches are ranked, which is only cheap for the best few
+        if self.max_completions is None:
+            return FUZZY_LIMIT
+        return self.max_completions
+
+    def _get_command_index(
+        self, group: click.MultiCommand, ctx: click.Context, thorough: bool = False
+    ) -> CommandIndex:
+        with self._build_lock:
+            index = self._command_indexes.get(group, None)
+
+            if index is None and self._snapshot is not None:
+                index = self._snapshot.command_index(
+                    self._command_path(ctx), group, ctx
+                )
+
+            if index is None or index.is_stale(ctx, thorough):
+                if index is not None and self.context_cache is not None:
+                    # Cached contexts might refer to replaced or removed commands.
+                    self.context_cache.clear()
+
+                index = CommandIndex(group, ctx)
+                if self._snapshot is not None:
+                    self._snapshot.add_command_index(self._command_path(ctx), index)
+
+            self._command_indexes[group] = index
+
+        return index
+
+    def _command_path(self, ctx: click.Context) -> tuple[str, ...]:
+        # Names of the commands leading from the root context to ctx
+        names = []
+        while ctx is not self.ctx and ctx.parent is not None:
+            names.append(ctx.info_name or "")
+            ctx = ctx.parent
+
+        return tuple(reversed(names))
+
+    def save_index_cache(self) -> bool:
+        """
+        Writes the completion indexes built so far to the ``index_cache`` file,
+        unless they're all already saved there.
+
+        Returns
+        -------
+        bool
+            Whether the file was written. A file that can't be written is
+            only a missed optimization, so errors are ignored.
+        """
+        if self._snapshot is None:
+            return False
+
+        with self._build_lock:
+            try:
+                return self._snapshot.save()
+            except OSError:
+                return False
+
+    def prewarm(self) -> Prewarmer:
+        """
+        Starts building the structures used for completion in a background
+        thread, see :class:`~click_repl._prewarm.Prewarmer`. Calling it again
+        returns the same, already started, :class:`Prewarmer`.
+        """
+        if self._prewarmer is None:
+            self._prewarmer = Prewarmer(self)
+
+        return self._prewarmer.start()
+
+    def _get_completion_for_subcommands(
+        self, group: click.MultiCommand, ctx: click.Context, incomplete: str
+    ) -> Iterator[Completion]:
+        if self.fuzzy and incomplete:
+            entries: t.Iterable[t.Any] = self._get_command_index(
+                group, ctx
+            ).fuzzy_search(incomplete, self._fuzzy_limit())
+
+            if not entries:
+                # A miss might be a command added since the index was checked
+                entries = self._get_command_index(
+                    group, ctx, thorough=True
+                ).fuzzy_search(incomplete, self._fuzzy_limit())
+
+        elif self.use_command_index:
+            entries = self._get_command_index(group, ctx).search(incomplete)
+
+            if not entries:
+                entries = self._get_command_index(group, ctx, thorough=True).search(
+                    incomplete
+                )
+
+        else:
+            entries = self._iter_subcommands(group, ctx, incomplete.lower())
+
+        for entry in entries:
+            yield Completion(entry.name, -len(incomplete), display_meta=entry.short_help)
+
+    def _iter_subcommands(
+        self, group: click.MultiCommand, ctx: click.Context, incomplete_lower: str
+    ) -> Iterator[CommandEntry]:
+        for position, name in enumerate(group.list_commands(ctx)):
+            # Names are matched first, so that only the commands that are
+            # offered get loaded.
+            if not name.lower().startswith(incomplete_lower):
+                continue
+
+            command = group.get_command(ctx, name)
+            if getattr(command, "hidden", False):
+                continue
+
+            yield CommandEntry(
+                name, False, getattr(command, "short_help", ""), position
+            )
+
+    def _get_custom_callback(
+        self, param: click.Parameter
+    ) -> Callable[..., t.Any] | None:
+        if HAS_CLICK_V8:
+            return getattr(param, "_custom_shell_complete", None)
+
+        return getattr(param, "autocompletion", None)
+
+    def _call_async_callback(
         self,
+        callback: Callable[..., t.Any],
         param: click.Parameter,
         autocomplete_ctx: click.Context,
         args: list[str],
         incomplete: str,
-    ) -> list[Completion]:
-        param_choices: list[Completion] = []
-
+    ) -> t.Any:
         if HAS_CLICK_V8:
-            autocompletions = param.shell_complete(autocomplete_ctx, incomplete)
+            return callback(autocomplete_ctx, param, incomplete)
+
+        return callback(autocomplete_ctx, args, incomplete)
+
+    async def _await_async_callback(
+        self,
+        callback: Callable[..., t.Any],
+        param: click.Parameter,
+        autocomplete_ctx: click.Context,
+        args: list[str],
+        incomplete: str,
+    ) -> list[t.Any]:
+        result = self._call_async_callback(
+            callback, param, autocomplete_ctx, args, incomplete
+        )
+
+        if inspect.isasyncgen(result):
+            return [item async for item in result]
+
+        return list(await result)
+
+    def _get_autocompletions(
+        self,
+        param: click.Parameter,
+        autocomplete_ctx: click.Context,
+        args: list[str],
+        incomplete: str,
+        param_type: click.ParamType | None = None,
+    ) -> t.Iterable[t.Any]:
+        callback = self._get_custom_callback(param)
+
+        if callback is not None and _is_async_callback(callback):
+            # click itself can't use the results of async callbacks
+            return run_coroutine(
+                self._await_async_callback(
+                    callback, param, autocomplete_ctx, args, incomplete
+                )
+            )
+
+        elif (
+            HAS_CLICK_V8
+            and param_type is not None
+            and param_type is not param.type
+            and callback is None
+        ):
+            # Completing a single slot of a click.Tuple
+            return param_type.shell_complete(autocomplete_ctx, param, incomplete)
+
+        elif HAS_CLICK_V8:
+            return param.shell_complete(autocomplete_ctx, incomplete)
+
         else:
-            autocompletions = param.autocompletion(  # type: ignore[attr-defined]
+            return param.autocompletion(  # type: ignore[attr-defined]
                 autocomplete_ctx, args, incomplete
             )
 
+    def _run_autocompletions(
+        self,
+        param: click.Parameter,
+        autocomplete_ctx: click.Context,
+        args: list[str],
+        incomplete: str,
+        param_type: click.ParamType | None = None,
+    ) -> tuple[t.Iterable[t.Any], bool]:
+        # A completion_timeout attribute of the parameter takes precedence
+        timeout = getattr(param, "completion_timeout", self.callback_timeout)
+
+        get_autocompletions = partial(
+            self._get_autocompletions,
+            param,
+            autocomplete_ctx,
+            args,
+            incomplete,
+            param_type,
+        )
+
+        if timeout is None:
+            return get_autocompletions(), True
+
+        if self._callback_runner is None:
+            self._callback_runner = CallbackRunner(self.callback_workers)
+
+        return self._callback_runner.run(
+            (param, param_type, tuple(args), incomplete),
+            get_autocompletions,
+            timeout,
+        )
+
+    def _get_completion_from_autocompletion(
+        self, autocomplete: t.Any, incomplete: str
+    ) -> Completion:
+        if isinstance(autocomplete, tuple):
+            return Completion(
+                str(autocomplete[0]),
+                -len(incomplete),
+                display_meta=autocomplete[1],
+            )
+
+        elif HAS_CLICK_V8 and isinstance(
+            autocomplete, click.shell_completion.CompletionItem
+        ):
+            return Completion(autocomplete.value, -len(incomplete))
+
+        return Completion(str(autocomplete), -len(incomplete))
+
+    def _get_completion_from_autocompletion_functions(
+        self,
+        param: click.Parameter,
+        autocomplete_ctx: click.Context,
+        args: list[str],
+        incomplete: str,
+        param_type: click.ParamType | None = None,
+    ) -> Iterator[Completion]:
+        autocompletions, finished = self._run_autocompletions(
+            param, autocomplete_ctx, args, incomplete, param_type
+        )
+
         for autocomplete in autocompletions:
-            if isinstance(autocomplete, tuple):
-                param_choices.append(
-                    Completion(
-                        str(autocomplete[0]),
-                        -len(incomplete),
-                        display_meta=autocomplete[1],
+            yield self._get_completion_from_autocompletion(autocomplete, incomplete)
+
+        if not finished:
+            yield LOADING_COMPLETION
+
+    async def _stream_autocompletions(
+        self,
+        param: click.Parameter,
+        autocomplete_ctx: click.Context,
+        args: list[str],
+        incomplete: str,
+        param_type: click.ParamType | None = None,
+    ) -> AsyncGenerator[Completion, None]:
+        callback = self._get_custom_callback(param)
+
+        if callback is not None and _is_async_callback(callback):
+            # Awaited in the event loop, and cancelled along with the
+            # completion when the input changes.
+            result = self._call_async_callback(
+                callback, param, autocomplete_ctx, args, incomplete
+            )
+
+            if inspect.isasyncgen(result):
+                async for autocomplete in result:
+                    yield self._get_completion_from_autocompletion(
+                        autocomplete, incomplete
                     )
+                return
+
+            with self.stats.timer("callbacks"):
+                autocompletions: t.Iterable[t.Any] = await result
+            finished = True
+
+        else:
+            # Synchronous callbacks are run in the loop's default executor
+            loop = asyncio.get_running_loop()
+            with self.stats.timer("callbacks"):
+                autocompletions, finished = await loop.run_in_executor(
+                    None,
+                    partial(
+                        self._collect_autocompletions,
+                        param,
+                        autocomplete_ctx,
+                        args,
+                        incomplete,
+                        param_type,
+                    ),
                 )
 
-            elif HAS_CLICK_V8 and isinstance(
-                autocomplete, click.shell_completion.CompletionItem
-            ):
-                param_choices.append(Completion(autocomplete.value, -len(incomplete)))
+        for autocomplete in autocompletions:
+            yield self._get_completion_from_autocompletion(autocomplete, incomplete)
 
-            else:
-                param_choices.append(Completion(str(autocomplete), -len(incomplete)))
+        if not finished:
+            yield LOADING_COMPLETION
+
+    def _collect_autocompletions(
+        self,
+        param: click.Parameter,
+        autocomplete_ctx: click.Context,
+        args: list[str],
+        incomplete: str,
+        param_type: click.ParamType | None = None,
+    ) -> tuple[list[t.Any], bool]:
+        autocompletions, finished = self._run_autocompletions(
+            param, autocomplete_ctx, args, incomplete, param_type
+        )
+        return list(autocompletions), finished
+
+    def _get_choice_index(
+        self, param_type: click.Choice, ctx: click.Context | None = None
+    ) -> ChoiceIndex:
+        with self._build_lock:
+            index = self._choice_indexes.get(param_type, None)
+
+            if index is None or index.is_stale(param_type):
+                snapshot, key = self._snapshot, self._choice_key(param_type, ctx)
+
+                restored = None
+                if index is None and snapshot is not None and key is not None:
+                    restored = snapshot.choice_index(*key, param_type)
+
+                index = restored
+                if index is None:
+                    index = ChoiceIndex(param_type, ctx)
+                    if snapshot is not None and key is not None:
+                        snapshot.add_choice_index(*key, index)
+
+                self._choice_indexes[param_type] = index
+
+        return index
+
+    def _choice_key(
+        self, param_type: click.Choice, ctx: click.Context | None
+    ) -> tuple[tuple[str, ...], str] | None:
+        # Choices are saved in the snapshot by the name of their parameter
+        if self._snapshot is None or ctx is None:
+            return None
+
+        for param in ctx.command.params:
+            if param.type is param_type and param.name is not None:
+                return self._command_path(ctx), param.name
+
+        return None
+
+    def _can_index_choice(
+        self, param: click.Parameter, param_type: click.Choice, ctx: click.Context
+    ) -> bool:
+        # The index must give the same results as click.Choice.shell_complete,
+        # which can be overridden, or depend on the context's normalization.
+        # Before click 8, choices are always completed from the index.
+        if not HAS_CLICK_V8:
+            return True
+
+        return (
+            type(param_type).shell_complete is click.Choice.shell_complete
+            and getattr(param, "_custom_shell_complete", None) is None
+            and ctx.token_normalize_func is None
+        )
+
+    def _search_choice_index(self, index: ChoiceIndex, incomplete: str) -> list[str]:
+        if self.fuzzy and incomplete:
+            return index.fuzzy_search(incomplete, self._fuzzy_limit())
 
-        return param_choices
+        return index.search(incomplete, self.max_completions)
+
+    def _get_completion_from_choice_index(
+        self, param_type: click.Choice, ctx: click.Context, incomplete: str
+    ) -> Iterator[Completion]:
+        for choice in self._search_choice_index(
+            self._get_choice_index(param_type, ctx), incomplete
+        ):
+            yield Completion(choice, -len(incomplete))
 
     def _get_completion_from_choices_click_le_7(
-        self, param: click.Parameter, incomplete: str
-    ) -> list[Completion]:
-        param_type = t.cast(click.Choice, param.type)
-
-        if not getattr(param.type, "case_sensitive", True):
-            incomplete = incomplete.lower()
-            return [
-                Completion(
-                    choice,
-                    -len(incomplete),
-                    display=repr(choice) if " " in choice else choice,
-                )
-                for choice in param_type.choices  # type: ignore[attr-defined]
-                if choice.lower().startswith(incomplete)
-            ]
+        self,
+        param: click.Parameter,
+        incomplete: str,
+        param_type: click.ParamType | None = None,
+        ctx: click.Context | None = None,
+    ) -> Iterator[Completion]:
+        param_type = t.cast(click.Choice, param_type or param.type)
 
-        else:
-            return [
-                Completion(
-                    choice,
-                    -len(incomplete),
-                    display=repr(choice) if " " in choice else choice,
-                )
-                for choice in param_type.choices  # type: ignore[attr-defined]
-                if choice.startswith(incomplete)
-            ]
+        for choice in self._search_choice_index(
+            self._get_choice_index(param_type, ctx), incomplete
+        ):
+            yield Completion(
+                choice,
+                -len(incomplete),
+                display=repr(choice) if " " in choice else choice,
+            )
 
     def _get_completion_for_Path_types(
-        self, param: click.Parameter, args: list[str], incomplete: str
-    ) -> list[Completion]:
+        self,
+        param: click.Parameter,
+        args: list[str],
+        incomplete: str,
+        param_type: click.ParamType | None = None,
+    ) -> Iterator[Completion]:
         if "*" in incomplete:
-            return []
+            return
+
+        if param_type is None:
+            param_type = param.type
 
-        choices: list[Completion] = []
         _incomplete = os.path.expandvars(incomplete)
-        search_pattern = _incomplete.strip("'\"\t\n\r\v ").replace("\\\\", "\\") + "*"
+        search_path = _incomplete.strip("'\"\t\n\r\v ").replace("\\\\", "\\")
         quote = ""
 
         if " " in _incomplete:
@@ -128,26 +640,89 @@ class ClickCompleter(Completer):
                     quote = i
                     break
 
-        for path in iglob(search_pattern):
-            if " " in path:
-                if quote:
-                    path = quote + path
-                else:
-                    if IS_WINDOWS:
-                        path = repr(path).replace("\\\\", "\\")
+        directory, prefix = os.path.split(search_path)
+
+        # Directories are offered even if they're not accepted as values,
+        # as the files inside them may be.
+        request = _PathRequest(
+            directory,
+            prefix,
+            getattr(param_type, "file_okay", True),
+            prefix.startswith("."),
+            incomplete,
+            quote,
+        )
+
+        if self._deferring and self.async_path_completion:
+            # Listed in the background by get_completions_async
+            self._pending_path_request = request
+            return
+
+        yield from self.stats.timed("paths", self._list_path_completions(request))
+
+    def _list_path_completions(self, request: _PathRequest) -> Iterator[Completion]:
+        listing = self.directory_cache.listing(request.directory)
+        if listing is None:
+            return
+
+        for name, _ in listing.search(
+            request.prefix, request.files, request.hidden, limit=self.max_completions
+        ):
+            yield self._get_path_completion(request, name)
+
+    def _get_path_completion(self, request: _PathRequest, name: str) -> Completion:
+        path = os.path.join(request.directory, name) if request.directory else name
+
+        if " " in path:
+            if request.quote:
+                path = request.quote + path
             else:
                 if IS_WINDOWS:
-                    path = path.replace("\\", "\\\\")
+                    path = repr(path).replace("\\\\", "\\")
+        else:
+            if IS_WINDOWS:
+                path = path.replace("\\", "\\\\")
 
-            choices.append(
-                Completion(
-                    path,
-                    -len(incomplete),
-                    display=os.path.basename(path.strip("'\"")),
-                )
-            )
+        return Completion(
+            path,
+            -len(request.incomplete),
+            display=os.path.basename(path.strip("'\"")),
+        )
+
+    async def _stream_path_completions(
+        self, request: _PathRequest
+    ) -> AsyncGenerator[Completion, None]:
+        path = os.path.abspath(request.directory or os.curdir)
+        scan = self._path_scan
+
+        # A scan of the same directory that's still running is reused, so that
+        # typing more of a name doesn't list the directory again.
+        if scan is None or scan.path != path or scan.done.is_set():
+            if scan is not None:
+                scan.cancel()
+
+            scan = self._path_scan = DirectoryScan(path, self.directory_cache)
+            scan.start()
 
-        return choices
+        key = os.path.normcase(request.prefix)
+        limit = self.max_completions
+        count = 0
+
+        async for name, is_dir in scan.stream(self.path_scan_deadline):
+            if not os.path.normcase(name).startswith(key):
+                continue
+
+            if not accepts_entry(name, is_dir, request.files, request.hidden):
+                continue
+
+            if limit is not None and count >= limit:
+                return
+
+            count += 1
+            yield self._get_path_completion(request, name)
+
+        if not scan.done.is_set():
+            yield TRUNCATED_COMPLETION
 
     def _get_completion_for_Boolean_type(
         self, param: click.Parameter, incomplete: str
@@ -169,33 +744,106 @@ class ClickCompleter(Completer):
         args: list[str],
         param: click.Parameter,
         incomplete: str,
-    ) -> list[Completion]:
-        choices: list[Completion] = []
+        slot: int = 0,
+    ) -> Iterator[Completion]:
         param_type = param.type
 
+        # Each value of a click.Tuple has its own type
+        if isinstance(param_type, click.Tuple) and slot < len(param_type.types):
+            param_type = param_type.types[slot]
+
         # shell_complete method for click.Choice is intorduced in click-v8
         if not HAS_CLICK_V8 and isinstance(param_type, click.Choice):
-            choices.extend(
-                self._get_completion_from_choices_click_le_7(param, incomplete)
+            yield from self._get_completion_from_choices_click_le_7(
+                param, incomplete, param_type, autocomplete_ctx
+            )
+
+        elif isinstance(param_type, click.Choice) and self._can_index_choice(
+            param, param_type, autocomplete_ctx
+        ):
+            yield from self._get_completion_from_choice_index(
+                param_type, autocomplete_ctx, incomplete
             )
 
         elif isinstance(param_type, click.types.BoolParamType):
-            choices.extend(self._get_completion_for_Boolean_type(param, incomplete))
+            yield from self._get_completion_for_Boolean_type(param, incomplete)
 
         elif isinstance(param_type, (click.Path, click.File)):
-            choices.extend(self._get_completion_for_Path_types(param, args, incomplete))
+            yield from self._get_completion_for_Path_types(
+                param, args, incomplete, param_type
+            )
 
         elif getattr(param, AUTO_COMPLETION_PARAM, None) is not None:
-            choices.extend(
+            if self._deferring and self._get_custom_callback(param) is not None:
+                # Run concurrently by get_completions_async
+                self._pending_providers.append(
+                    self._stream_autocompletions(
+                        param, autocomplete_ctx, args, incomplete, param_type
+                    )
+                )
+                return
+
+            yield from self.stats.timed(
+                "callbacks",
                 self._get_completion_from_autocompletion_functions(
                     param,
                     autocomplete_ctx,
                     args,
                     incomplete,
-                )
+                    param_type,
+                ),
             )
 
-        return choices
+    def _get_option_table(self, command: click.Command) -> OptionTable:
+        with self._build_lock:
+            table = self._option_tables.get(command, None)
+
+            if table is None or table.is_stale(command):
+                table = OptionTable(command)
+                self._option_tables[command] = table
+
+        return table
+
+    def _get_argument_under_cursor(
+        self, ctx_command: click.Command, table: OptionTable, command_args: list[str]
+    ) -> tuple[click.Argument, int] | None:
+        """
+        Finds the positional argument that receives the incomplete value,
+        along with the index of the value within the argument's nargs.
+
+        :param command_args: The complete tokens passed to ``ctx_command``.
+        """
+
+        options = table.options
+        prefixes = table.prefixes
+        positionals = 0
+
+        tokens = iter(command_args)
+        for token in tokens:
+            if token == "--" or (
+                positionals and not ctx_command.allow_interspersed_args
+            ):
+                positionals += token != "--"
+                positionals += sum(1 for _ in tokens)
+                break
+
+            option = options.get(token, None)
+            if option is not None:
+                if not option.is_flag and not option.count:
+                    for _ in range(option.nargs):
+                        next(tokens, None)
+
+            # Unknown options, or options with an attached value
+            elif not (token[:1] in prefixes and len(token) > 1):
+                positionals += 1
+
+        for param in table.arguments:
+            if param.nargs == -1 or positionals < param.nargs:
+                return param, positionals
+
+            positionals -= param.nargs
+
+        return None
 
     def _get_completion_for_cmd_args(
         self,
@@ -203,75 +851,256 @@ class ClickCompleter(Completer):
         incomplete: str,
         autocomplete_ctx: click.Context,
         args: list[str],
-    ) -> list[Completion]:
-        choices: list[Completion] = []
-        param_called = False
+        offset: int = 0,
+    ) -> Iterator[Completion]:
+        table = self._get_option_table(ctx_command)
 
-        for param in ctx_command.params:
-            if isinstance(param.type, click.types.UnprocessedParamType):
-                return []
+        # If we are inside an option that was called, we want to show only
+        # relevant choices
+        called = table.find_called_option(args)
+        unprocessed_position = table.unprocessed_position
 
-            elif getattr(param, "hidden", False):
-                continue
+        if unprocessed_position is not None and (
+            called is None or unprocessed_position < called[0]
+        ):
+            return
+
+        if called is not None:
+            position, slot = called
+            yield from self._get_completion_from_params(
+                autocomplete_ctx, args, table.params[position], incomplete, slot
+            )
+            return
 
-            elif isinstance(param, click.Option):
-                opts = param.opts + param.secondary_opts
-                previous_args = args[: param.nargs * -1]
-                current_args = args[param.nargs * -1 :]
+        # (position of the parameter, opt, option) triples, turned into
+        # completions only when they're consumed
+        choices: list[tuple[int, str, click.Option]] = []
 
-                # Show only unused opts
-                already_present = any([opt in previous_args for opt in opts])
-                hide = self.show_only_unused and already_present and not param.multiple
+        # Show only unused opts. As no option was called, none of them is in
+        # its own last nargs tokens, so the whole token list can be checked.
+        used_positions = table.used_positions(args) if self.show_only_unused else ()
+
+        if incomplete:
+            if self.fuzzy and incomplete[:1] in table.prefixes:
+                opts = table.fuzzy_search(incomplete, self._fuzzy_limit())
+            else:
+                opts = table.search(incomplete)
+
+            for opt in opts:
+                position = table.opt_positions[opt][0]
+                param = t.cast(click.Option, table.params[position])
+
+                if position in used_positions and not param.multiple:
+                    continue
+
+                choices.append((position, opt, param))
+
+        else:
+            for position, param, opts in table.visible_options:
+                if position in used_positions and not param.multiple:
+                    continue
 
                 # Show only shortest opt
-                if (
-                    self.shortest_only
-                    and not incomplete  # just typed a space
-                    # not selecting a value for a longer version of this option
-                    and args[-1] not in opts
-                ):
+                if self.shortest_only:
                     opts = [min(opts, key=len)]
 
-                for option in opts:
-                    # We want to make sure if this parameter was called
-                    # If we are inside a parameter that was called, we want to show only
-                    # relevant choices
-                    if option in current_args:  # noqa: E203
-                        param_called = True
-                        break
-
-                    elif option.startswith(incomplete) and not hide:
-                        choices.append(
-                            Completion(
-                                option,
-                                -len(incomplete),
-                                display_meta=param.help or "",
-                            )
-                        )
-
-                if param_called:
-                    choices = self._get_completion_from_params(
-                        autocomplete_ctx, args, param, incomplete
-                    )
-                    break
+                choices.extend((position, opt, param) for opt in opts)
 
-            elif isinstance(param, click.Argument):
-                choices.extend(
-                    self._get_completion_from_params(
-                        autocomplete_ctx, args, param, incomplete
-                    )
-                )
+        argument_under_cursor = self._get_argument_under_cursor(
+            ctx_command, table, args[offset:]
+        )
+
+        if argument_under_cursor is not None and not getattr(
+            argument_under_cursor[0], "hidden", False
+        ):
+            argument, slot = argument_under_cursor
+            position = table.params.index(argument)
+            index = next(
+                (i for i, choice in enumerate(choices) if choice[0] > position),
+                len(choices),
+            )
+
+            yield from self._get_option_completions(choices[:index], incomplete)
+            yield from self._get_completion_from_params(
+                autocomplete_ctx, args, argument, incomplete, slot
+            )
+            choices = choices[index:]
+
+        yield from self._get_option_completions(choices, incomplete)
 
-        return choices
+    def _get_option_completions(
+        self, choices: list[tuple[int, str, click.Option]], incomplete: str
+    ) -> Iterator[Completion]:
+        for _, opt, param in choices:
+            yield Completion(opt, -len(incomplete), display_meta=param.help or "")
 
     def get_completions(
         self, document: Document, complete_event: CompleteEvent | None = None
     ) -> Generator[Completion, None, None]:
+        yield from self._collect_completions(document)
+
+    async def get_completions_async(
+        self, document: Document, complete_event: CompleteEvent
+    ) -> AsyncGenerator[Completion, None]:
+        if self.debounce_interval is not None and await self._is_superseded(document):
+            return
+
+        # The round lasts until the deferred callbacks have run, so that they
+        # reuse the requests of the previous keystrokes.
+        runner = self._callback_runner
+        generation = runner.start_round() if runner is not None else None
+        completions = self._complete_async(document)
+        try:
+            async for completion in completions:
+                yield completion
+        finally:
+            await completions.aclose()
+            if runner is not None:
+                runner.finish_round(generation)
+
+    async def _complete_async(
+        self, document: Document
+    ) -> AsyncGenerator[Completion, None]:
+        limit = self.max_completions
+        count = 0
+
+        choices = self._collect_completions(document, callback_round=False)
+        try:
+            while True:
+                # Only set while completions are produced, not while the
+                # prompt consumes them.
+                self._deferring = True
+                try:
+                    completion = next(choices, None)
+                finally:
+                    self._deferring = False
+
+                if completion is None:
+                    break
+
+                count += 1
+                yield completion
+        finally:
+            choices.close()
+
+            # Also discarded if the prompt stopped asking for completions
+            providers, self._pending_providers = self._pending_providers, []
+            request, self._pending_path_request = self._pending_path_request, None
+
+        if request is not None:
+            providers.append(self._stream_path_completions(request))
+
+        elif self._path_scan is not None:
+            # The directory listed previously is no longer of interest
+            self._path_scan.cancel()
+            self._path_scan = None
+
+        if not providers or (limit is not None and count >= limit):
+            return
+
+        merged = self._merge_providers(providers)
+        try:
+            async for completion in merged:
+                yield completion
+
+                count += 1
+                if limit is not None and count >= limit:
+                    break
+        finally:
+            await merged.aclose()
+
+    async def _is_superseded(self, document: Document) -> bool:
+        """
+        Waits for the input to settle, if it's arriving faster than the
+        debounce interval, and tells whether ``document`` is outdated by then.
+        """
+        interval = t.cast(float, self.debounce_interval)
+
+        self._request_generation += 1
+        generation = self._request_generation
+
+        now = time.monotonic()
+        arriving_fast = now - self._last_request < interval
+        self._last_request = now
+
+        if not arriving_fast:
+            return False
+
+        await asyncio.sleep(interval)
+
+        # Completions were requested for a newer document
+        if generation != self._request_generation:
+            return True
+
+        # The prompt doesn't request completions while it's waiting for these,
+        # but its text may have changed.
+        app = get_app_or_none()
+        if app is not None and app.is_running:
+            return app.current_buffer.document != document
+
+        return False
+
+    async def _merge_providers(
+        self, providers: list[AsyncIterator[Completion]]
+    ) -> AsyncGenerator[Completion, None]:
+        """
+        Runs the providers concurrently, and yields their completions as soon
+        as they're produced.
+        """
+
+        # None marks the end of a provider
+        queue: asyncio.Queue[Completion | None] = asyncio.Queue()
+
+        async def drain(provider: AsyncIterator[Completion]) -> None:
+            try:
+                async for completion in provider:
+                    queue.put_nowait(completion)
+            except Exception as e:
+                click.echo("{}: {}".format(type(e).__name__, str(e)))
+            finally:
+                queue.put_nowait(None)
+
+        tasks = [asyncio.ensure_future(drain(provider)) for provider in providers]
+        try:
+            running = len(tasks)
+            while running:
+                completion = await queue.get()
+                if completion is None:
+                    running -= 1
+                else:
+                    yield completion
+        finally:
+            # Providers still running are no longer of interest
+            for task in tasks:
+                task.cancel()
+
+    def _collect_completions(
+        self, document: Document, callback_round: bool = True
+    ) -> Generator[Completion, None, None]:
+        runner = self._callback_runner if callback_round else None
+        if runner is not None:
+            runner.start_round()
+
+        completions = self._get_completions(document)
+        try:
+            yield from islice(
+                self.stats.timed("total", completions), self.max_completions
+            )
+        finally:
+            completions.close()
+
+            # Callbacks of previous keystrokes are no longer of interest
+            if runner is not None:
+                runner.finish_round()
+
+    def _get_completions(self, document: Document) -> Generator[Completion, None, None]:
         # Code analogous to click._bashcomplete.do_complete
 
-        args = split_arg_string(document.text_before_cursor, posix=False)
+        stats = self.stats
+
+        with stats.timer("tokenize"):
+            args = self._tokenizer.split(document.text_before_cursor)
 
-        choices: list[Completion] = []
         cursor_within_command = (
             document.text_before_cursor.rstrip() == document.text_before_cursor
         )
@@ -291,40 +1120,38 @@ class ClickCompleter(Completer):
         if self.parsed_args != args:
             self.parsed_args = args
             try:
-                self.parsed_ctx = _resolve_context(args, self.ctx)
+                with stats.timer("resolve"), self._build_lock:
+                    self.parsed_ctx, self._parsed_offset = _resolve_leaf_context(
+                        args, self.ctx, cache=self.context_cache
+                    )
             except Exception:
                 return  # autocompletion for nonexistent cmd can throw here
             self.ctx_command = self.parsed_ctx.command
 
-        if getattr(self.ctx_command, "hidden", False):
+        ctx_command, parsed_ctx = self.ctx_command, self.parsed_ctx
+
+        if getattr(ctx_command, "hidden", False):
             return
 
         try:
-            choices.extend(
+            yield from stats.timed(
+                "params",
                 self._get_completion_for_cmd_args(
-                    self.ctx_command, incomplete, self.parsed_ctx, args
-                )
+                    ctx_command,
+                    incomplete,
+                    parsed_ctx,
+                    args,
+                    self._parsed_offset,
+                ),
             )
 
-            if isinstance(self.ctx_command, click.MultiCommand):
-                incomplete_lower = incomplete.lower()
-
-                for name in self.ctx_command.list_commands(self.parsed_ctx):
-                    command = self.ctx_command.get_command(self.parsed_ctx, name)
-                    if getattr(command, "hidden", False):
-                        continue
-
-                    elif name.lower().startswith(incomplete_lower):
-                        choices.append(
-                            Completion(
-                                name,
-                                -len(incomplete),
-                                display_meta=getattr(command, "short_help", ""),
-                            )
-                        )
+            if isinstance(ctx_command, click.MultiCommand):
+                yield from stats.timed(
+                    "subcommands",
+                    self._get_completion_for_subcommands(
+                        ctx_command, parsed_ctx, incomplete
+                    ),
+                )
 
         except Exception as e:
             click.echo("{}: {}".format(type(e).__name__, str(e)))
-
-        for item in choices:
-            yield item
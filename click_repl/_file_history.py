@@ -0,0 +1,276 @@
+"""
+Persistent history of the prompt, for history files too large to be parsed
+entirely at every start of the REPL.
+"""
+
+from __future__ import annotations
+
+import datetime
+import itertools
+import mmap
+import os
+import threading
+from typing import AsyncGenerator, Iterator
+
+from prompt_toolkit.history import History
+
+from ._history_search import TrigramIndex, search_entries
+
+__all__ = ["MappedFileHistory"]
+
+# Number of entries indexed at once, past which the search index is saved
+# right away rather than when the REPL exits
+_SAVE_THRESHOLD = 1000
+
+# Offsets of the "+" prefixed lines of an entry in the file, end excluded
+_Entry = tuple[int, int]
+
+
+def _scan_entries(
+    data: mmap.mmap, low: int, high: int, limit: int | None = None
+) -> tuple[list[_Entry], int]:
+    """
+    Indexes the entries of ``data[low:high]``, from the last one.
+
+    Returns
+    -------
+    tuple[list[tuple[int, int]], int]
+        The offsets of the entries found, from the most recent one, and the
+        offset above which every entry was found. It's ``low`` unless the
+        scan stopped after ``limit`` entries.
+    """
+
+    entries: list[_Entry] = []
+    # End of the entry whose lines are being scanned
+    end: int | None = None
+    start = position = high
+
+    while position > low:
+        line_start = data.rfind(b"\n", low, position - 1) + 1 or low
+
+        if data[line_start] == 0x2B:  # "+"
+            if end is None:
+                end = position
+            start = line_start
+
+        else:
+            if end is not None:
+                entries.append((start, end))
+                end = None
+
+            if limit is not None and len(entries) >= limit:
+                return entries, line_start
+
+        position = line_start
+
+    if end is not None:
+        entries.append((start, end))
+
+    return entries, low
+
+
+def _decode(data: bytes) -> str:
+    lines = data.decode("utf-8", errors="replace").split("\n")
+    if lines[-1] == "":
+        lines.pop()
+
+    return "\n".join(line[1:] for line in lines)
+
+
+class MappedFileHistory(History):
+    """
+    :class:`~prompt_toolkit.history.History` stored in a file, in the format
+    of :class:`~prompt_toolkit.history.FileHistory`.
+
+    Instead of parsing the whole file when the prompt starts, the file is
+    memory-mapped, and the offsets of its entries are indexed backwards, as
+    far as the requested ones. Only the ``tail_size`` most recent entries are
+    loaded in the prompt, to be browsed with the arrow keys, while
+    :meth:`load_history_strings` reaches every one of them.
+
+    Each command is appended to the file in a single ``write`` call, to a
+    descriptor opened with ``O_APPEND``, so that REPLs sharing the file
+    don't interleave their entries. Entries appended by other processes are
+    picked up the next time the history is read.
+
+    :meth:`search` looks up the entries containing a pattern in a trigram
+    index, saved next to the file, with an ``.idx`` suffix, and completed
+    with the entries appended since it was saved.
+
+    Parameters
+    ----------
+    filename
+        Path of the history file. It's created on the first stored command.
+
+    tail_size
+        Number of recent entries loaded in the prompt. Every entry is loaded
+        if :obj:`None`.
+    """
+
+    def __init__(
+        self, filename: str | os.PathLike[str], tail_size: int | None = 1000
+    ) -> None:
+        super().__init__()
+        self.filename = filename
+        self.tail_size = tail_size
+
+        self._lock = threading.Lock()
+        self._map: mmap.mmap | None = None
+        # Size of the file when it was last mapped
+        self._size = 0
+        # Entries of the mapped file, from the most recent one
+        self._older: list[_Entry] = []
+        # Everything above this offset is in self._older
+        self._scanned = 0
+        # Entries appended to the file since it was mapped, oldest first
+        self._newer: list[_Entry] = []
+        # Built on the first search
+        self._index: TrigramIndex | None = None
+
+    async def load(self) -> AsyncGenerator[str, None]:
+        if not self._loaded:
+            self._loaded_strings = list(
+                itertools.islice(self.load_history_strings(), self.tail_size)
+            )
+            self._loaded = True
+
+        for item in self._loaded_strings:
+            yield item
+
+    def load_history_strings(self) -> Iterator[str]:
+        """
+        Yields the entries of the file, from the most recent one, indexing
+        them as they're requested.
+        """
+
+        with self._lock:
+            self._remap()
+            newer = len(self._newer)
+
+        for i in range(newer - 1, -1, -1):
+            with self._lock:
+                text = self._read(self._newer[i])
+            yield text
+
+        for i in itertools.count():
+            with self._lock:
+                if i >= len(self._older):
+                    if self._scanned == 0 or self._map is None:
+                        return
+
+                    entries, self._scanned = _scan_entries(
+                        self._map, 0, self._scanned, limit=64
+                    )
+                    self._older.extend(entries)
+                    if not entries:
+                        return
+
+                text = self._read(self._older[i])
+
+            yield text
+
+    def store_string(self, string: str) -> None:
+        lines = [f"\n# {datetime.datetime.now()}\n"]
+        lines.extend(f"+{line}\n" for line in string.split("\n"))
+
+        fd = os.open(self.filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            os.write(fd, "".join(lines).encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def search(self, pattern: str, limit: int = 10) -> list[str]:
+        """
+        Finds the entries containing ``pattern``, ignoring the case.
+
+        Returns
+        -------
+        list[str]
+            The ``limit`` most recent distinct matching entries, from the
+            most recent one.
+        """
+
+        with self._lock:
+            self._remap()
+            if self._map is None:
+                return []
+
+            index = self._update_index(self._map)
+            entries = (self._read(entry) for entry in index.candidates(pattern))
+            return search_entries(entries, pattern, limit)
+
+    def save_search_index(self) -> bool:
+        """
+        Writes the search index next to the history file, if it changed.
+
+        Returns
+        -------
+        bool
+            Whether the file was written.
+        """
+
+        with self._lock:
+            if self._index is None:
+                return False
+
+            try:
+                return self._index.save()
+            except OSError:
+                return False
+
+    def _update_index(self, data: mmap.mmap) -> TrigramIndex:
+        index = self._index
+        if index is None:
+            index = self._index = TrigramIndex(f"{os.fspath(self.filename)}.idx")
+            index.load(data)
+
+        if index.size < self._size:
+            entries, _ = _scan_entries(data, index.size, self._size)
+            count = index.update(
+                (
+                    (start, end, _decode(data[start:end]))
+                    for start, end in reversed(entries)
+                ),
+                data,
+                self._size,
+            )
+
+            if count >= _SAVE_THRESHOLD:
+                try:
+                    index.save()
+                except OSError:
+                    pass
+
+        return index
+
+    def _read(self, entry: _Entry) -> str:
+        assert self._map is not None
+        return _decode(self._map[entry[0] : entry[1]])
+
+    def _remap(self) -> None:
+        """Maps the file again, if it has grown since it was mapped."""
+
+        try:
+            size = os.path.getsize(self.filename)
+        except FileNotFoundError:
+            return
+
+        if size <= self._size:
+            return
+
+        with open(self.filename, "rb") as f:
+            data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+        if self._map is None:
+            self._scanned = size
+        else:
+            # The file is only appended to, so the known offsets still hold
+            entries, _ = _scan_entries(data, self._size, size)
+            self._newer.extend(reversed(entries))
+            self._map.close()
+
+        self._map = data
+        self._size = size
+
+    def __repr__(self) -> str:
+        return f"MappedFileHistory({self.filename!r})"
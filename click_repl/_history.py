@@ -0,0 +1,145 @@
+"""
+Bounded store of the commands executed in a REPL whose stdin isn't a TTY.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import IO, Iterator
+
+__all__ = ["RingHistory"]
+
+# Size of the blocks in which a spill file is read backwards
+_BLOCK_SIZE = 1 << 16
+
+
+def _escape(command: str) -> str:
+    return command.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _unescape(line: str) -> str:
+    if "\\" not in line:
+        return line
+
+    parts = line.split("\\\\")
+    return "\\".join(part.replace("\\n", "\n") for part in parts)
+
+
+def _read_lines_backwards(path: str | os.PathLike[str]) -> Iterator[str]:
+    """Yields the lines of ``path`` from the last one to the first one."""
+
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+
+    with f:
+        position = f.seek(0, os.SEEK_END)
+        # Part of a line that continues in the block read previously
+        tail = b""
+
+        while position > 0:
+            size = min(_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+
+            lines = (f.read(size) + tail).split(b"\n")
+            # The first line may start in the block before this one
+            tail = lines.pop(0)
+
+            for line in reversed(lines):
+                if line:
+                    yield line.decode("utf-8")
+
+        if tail:
+            yield tail.decode("utf-8")
+
+
+class RingHistory:
+    """
+    History of executed commands, keeping the most recent ``capacity`` of
+    them in a ring buffer.
+
+    The older commands are dropped, or appended to ``spill_path`` if given,
+    one per line. They're still part of the history, read back from the file
+    in blocks when the iteration gets past the ones in memory.
+
+    Parameters
+    ----------
+    capacity
+        Number of commands kept in memory. Unbounded if :obj:`None`.
+
+    spill_path
+        File where commands evicted from memory are appended.
+    """
+
+    __slots__ = ("capacity", "spill_path", "_items", "_next", "_spill_file")
+
+    def __init__(
+        self,
+        capacity: int | None = None,
+        spill_path: str | os.PathLike[str] | None = None,
+    ) -> None:
+        if capacity is not None and capacity < 1:
+            raise ValueError("capacity must be a positive integer")
+
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self._items: list[str] = []
+        # Position of the slot overwritten by the next command, once full
+        self._next = 0
+        self._spill_file: IO[str] | None = None
+
+    def __len__(self) -> int:
+        """Number of commands in memory."""
+        return len(self._items)
+
+    def append(self, command: str) -> None:
+        """Adds ``command`` as the most recent one."""
+        items = self._items
+
+        if self.capacity is None or len(items) < self.capacity:
+            items.append(command)
+            return
+
+        if self.spill_path is not None:
+            if self._spill_file is None:
+                self._spill_file = open(
+                    self.spill_path, "a", encoding="utf-8", newline="\n"
+                )
+            self._spill_file.write(_escape(items[self._next]) + "\n")
+
+        items[self._next] = command
+        self._next = (self._next + 1) % len(items)
+
+    def __iter__(self) -> Iterator[str]:
+        """Yields the commands in memory, from the oldest one."""
+        items = self._items
+        for offset in range(len(items)):
+            yield items[(self._next + offset) % len(items)]
+
+    def __reversed__(self) -> Iterator[str]:
+        """Yields the commands in memory, from the most recent one."""
+        items = self._items
+        for offset in range(1, len(items) + 1):
+            yield items[(self._next - offset) % len(items)]
+
+    def recent(self) -> Iterator[str]:
+        """
+        Yields every command, from the most recent one, including the ones
+        spilled to the file.
+        """
+        yield from reversed(self)
+
+        if self.spill_path is not None:
+            if self._spill_file is not None:
+                self._spill_file.flush()
+
+            for line in _read_lines_backwards(self.spill_path):
+                yield _unescape(line)
+
+    def close(self) -> None:
+        """Closes the spill file. It's opened again if more commands are spilled."""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
@@ -0,0 +1,354 @@
+"""
+Search of the history entries containing a pattern, most recent first, with
+a trigram index for histories too large to be scanned at every keystroke.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import mmap
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator
+
+from prompt_toolkit.buffer import CompletionState
+from prompt_toolkit.completion import Completion
+from prompt_toolkit.history import History
+from prompt_toolkit.key_binding import KeyBindings, KeyPressEvent
+
+from ._index import _trigrams
+from .utils import _atomic_write
+
+__all__ = [
+    "HISTORY_INDEX_VERSION",
+    "TrigramIndex",
+    "history_search_key_bindings",
+    "search_entries",
+    "search_history",
+]
+
+#: Version of the format of saved indexes, bumped on incompatible changes.
+HISTORY_INDEX_VERSION = 2
+
+# Start of the first line of saved indexes
+_MAGIC = b"click-repl-history-index"
+# Trigrams are saved in UTF-32, as 3 code points of 4 bytes
+_TRIGRAM_ENCODING = "utf-32-le"
+_TRIGRAM_SIZE = 12
+
+# Number of bytes before the end of the indexed part of a history file,
+# checked to tell whether the file is still the one that was indexed
+_CHECKED_TAIL = 256
+
+
+def _contains(ids: array[int], entry_id: int) -> bool:
+    i = bisect_left(ids, entry_id)
+    return i < len(ids) and ids[i] == entry_id
+
+
+def search_entries(entries: Iterable[str], pattern: str, limit: int = 10) -> list[str]:
+    """
+    Finds the entries containing ``pattern``, ignoring the case.
+
+    Parameters
+    ----------
+    entries
+        History entries, from the most recent one.
+
+    pattern
+        Text searched in the entries. Every entry matches an empty pattern.
+
+    limit
+        Maximum number of matches.
+
+    Returns
+    -------
+    list[str]
+        The distinct matching entries, from the most recent one.
+    """
+
+    pattern = pattern.lower()
+    matches: dict[str, None] = {}
+
+    for entry in entries:
+        if len(matches) >= limit:
+            break
+
+        if pattern in entry.lower():
+            matches.setdefault(entry, None)
+
+    return list(matches)
+
+
+def search_history(history: History, pattern: str, limit: int = 10) -> list[str]:
+    """
+    Finds the entries of ``history`` containing ``pattern``, like
+    :func:`search_entries`.
+
+    Histories with a ``search`` method, like
+    :class:`~click_repl._file_history.MappedFileHistory`, look them up in
+    their index, the others are scanned.
+    """
+
+    search = getattr(history, "search", None)
+    if search is not None:
+        return search(pattern, limit)  # type: ignore[no-any-return]
+
+    return search_entries(history.load_history_strings(), pattern, limit)
+
+
+def history_search_key_bindings(key: str = "c-r", limit: int = 20) -> KeyBindings:
+    """
+    Key bindings searching the history for the text of the prompt.
+
+    Pressing ``key`` lists the most recent matching entries in the completion
+    menu, and selects the first one. Pressing it again selects the next one.
+
+    Parameters
+    ----------
+    key
+        Key that starts the search, replacing the incremental search of
+        prompt_toolkit when it's ``c-r``.
+
+    limit
+        Maximum number of listed entries.
+    """
+
+    bindings = KeyBindings()
+    # Completion state of the latest search, to tell it from a completion
+    searches: list[CompletionState] = []
+
+    @bindings.add(key)
+    def _(event: KeyPressEvent) -> None:
+        buffer = event.current_buffer
+
+        if buffer.complete_state is not None and buffer.complete_state in searches:
+            buffer.complete_next()
+            return
+
+        text = buffer.text
+        matches = search_history(buffer.history, text, limit)
+        if not matches:
+            return
+
+        buffer.cursor_position = len(text)
+        buffer.complete_state = CompletionState(
+            buffer.document,
+            [Completion(match, -len(text), display_meta="history") for match in matches],
+        )
+        searches[:] = [buffer.complete_state]
+        # Shows the completion menu
+        buffer.on_completions_changed.fire()
+        buffer.go_to_completion(0)
+
+    return bindings
+
+
+class TrigramIndex:
+    """
+    Inverted index of the trigrams of the entries of a history file.
+
+    Entries are numbered from the oldest one, and indexed by the offsets of
+    their lines in the file, which is only ever appended to. The index
+    records how many bytes of the file it covers, so that it's kept up to
+    date by indexing the entries appended since, even by other processes.
+
+    The saved index starts with a line of text, holding the version of the
+    format and what the index covers, checked before reading anything else.
+    The offsets and posting lists follow, as the raw bytes of their arrays.
+
+    Parameters
+    ----------
+    path
+        File where the index is saved.
+    """
+
+    __slots__ = ("path", "size", "_digest", "_postings", "_offsets", "_unsaved")
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = path
+
+        #: Number of bytes of the history file covered by the index.
+        self.size = 0
+        # Digest of the last bytes covered, see _CHECKED_TAIL
+        self._digest = b""
+        # Ids of the entries containing each trigram, in ascending order
+        self._postings: dict[str, array[int]] = {}
+        # Start and end offsets of each entry in the history file
+        self._offsets: array[int] = array("Q")
+        # Number of entries indexed since the index was loaded or saved
+        self._unsaved = 0
+
+    def __len__(self) -> int:
+        return len(self._offsets) // 2
+
+    @staticmethod
+    def _tail_digest(data: mmap.mmap, size: int) -> bytes:
+        return hashlib.sha1(data[max(0, size - _CHECKED_TAIL) : size]).digest()
+
+    def load(self, data: mmap.mmap) -> bool:
+        """
+        Reads the saved index, if it was built for the history file whose
+        content is ``data``.
+
+        Returns
+        -------
+        bool
+            Whether the saved index was read.
+        """
+
+        try:
+            with open(self.path, "rb") as f:
+                magic, version, byteorder, size_, digest_ = f.readline().split()
+                size, digest = int(size_), bytes.fromhex(digest_.decode("ascii"))
+                if (
+                    magic != _MAGIC
+                    or int(version) != HISTORY_INDEX_VERSION
+                    or byteorder.decode("ascii") != sys.byteorder
+                    or size > len(data)
+                    or digest != self._tail_digest(data, size)
+                ):
+                    return False
+
+                offset_count, trigram_count, id_count = map(int, f.readline().split())
+                offsets = array("Q")
+                offsets.fromfile(f, offset_count)
+                trigrams = f.read(trigram_count * _TRIGRAM_SIZE).decode(
+                    _TRIGRAM_ENCODING, "surrogatepass"
+                )
+                lengths = array("Q")
+                lengths.fromfile(f, trigram_count)
+                ids = array("I")
+                ids.fromfile(f, id_count)
+        except Exception:
+            # Missing, unreadable, or written by an incompatible version
+            return False
+
+        postings: dict[str, array[int]] = {}
+        start = 0
+        for i, end in enumerate(itertools.accumulate(lengths)):
+            postings[trigrams[3 * i : 3 * i + 3]] = ids[start:end]
+            start = end
+
+        self.size = size
+        self._digest = digest
+        self._postings = postings
+        self._offsets = offsets
+        self._unsaved = 0
+        return True
+
+    def update(
+        self, entries: Iterable[tuple[int, int, str]], data: mmap.mmap, size: int
+    ) -> int:
+        """
+        Indexes entries appended to the history file.
+
+        Parameters
+        ----------
+        entries
+            Start and end offsets of the entries appended to the history file
+            since :attr:`size` was covered, from the oldest one, with their
+            text.
+
+        data
+            Content of the history file.
+
+        size
+            Number of bytes of the history file covered once ``entries``
+            are indexed.
+
+        Returns
+        -------
+        int
+            Number of entries indexed.
+        """
+
+        postings = self._postings
+        count = 0
+
+        for start, end, text in entries:
+            entry_id = len(self)
+            self._offsets.append(start)
+            self._offsets.append(end)
+
+            for trigram in _trigrams(text.lower(), padded=False):
+                ids = postings.get(trigram, None)
+                if ids is None:
+                    ids = postings[trigram] = array("I")
+                ids.append(entry_id)
+
+            count += 1
+
+        self.size = size
+        self._digest = self._tail_digest(data, size)
+        self._unsaved += count
+        return count
+
+    def candidates(self, pattern: str) -> Iterator[tuple[int, int]]:
+        """
+        Yields the offsets of the entries containing every trigram of
+        ``pattern``, from the most recent one.
+
+        Patterns shorter than a trigram don't narrow the search, so that
+        every entry is yielded.
+        """
+
+        offsets = self._offsets
+        trigrams = _trigrams(pattern.lower(), padded=False)
+
+        if not trigrams:
+            for i in range(len(self) - 1, -1, -1):
+                yield offsets[2 * i], offsets[2 * i + 1]
+            return
+
+        lists = sorted(
+            (self._postings.get(trigram, array("I")) for trigram in trigrams), key=len
+        )
+        # The shortest list is walked, and looked up in the others
+        shortest, others = lists[0], lists[1:]
+
+        for entry_id in reversed(shortest):
+            if all(_contains(ids, entry_id) for ids in others):
+                yield offsets[2 * entry_id], offsets[2 * entry_id + 1]
+
+    def save(self) -> bool:
+        """
+        Writes the index to its file, unless nothing was indexed since it
+        was loaded or saved.
+
+        Returns
+        -------
+        bool
+            Whether the file was written.
+        """
+
+        if not self._unsaved:
+            return False
+
+        postings = self._postings
+        lengths = array("Q", map(len, postings.values()))
+
+        # A REPL starting meanwhile never reads a partial file
+        with _atomic_write(self.path) as f:
+            f.write(
+                b"%s %d %s %d %s\n"
+                % (
+                    _MAGIC,
+                    HISTORY_INDEX_VERSION,
+                    sys.byteorder.encode("ascii"),
+                    self.size,
+                    self._digest.hex().encode("ascii"),
+                )
+            )
+            f.write(b"%d %d %d\n" % (len(self._offsets), len(postings), sum(lengths)))
+            self._offsets.tofile(f)
+            f.write("".join(postings).encode(_TRIGRAM_ENCODING, "surrogatepass"))
+            lengths.tofile(f)
+            for ids in postings.values():
+                ids.tofile(f)
+
+        self._unsaved = 0
+        return True
@@ -0,0 +1,835 @@
+"""
+Precomputed lookup structures used by :class:`~click_repl.ClickCompleter`
+to avoid rescanning the command tree on every keystroke.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import time
+import typing as t
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Iterator, NamedTuple, Sequence
+
+import click
+
+__all__ = [
+    "ChoiceIndex",
+    "CommandEntry",
+    "CommandIndex",
+    "FUZZY_LIMIT",
+    "FuzzyIndex",
+    "OptionTable",
+]
+
+#: Number of matches returned by fuzzy searches when no limit is given, so
+#: that only the best ones are ranked.
+FUZZY_LIMIT = 100
+
+
+class CommandEntry(NamedTuple):
+    """Completion data of a single subcommand, captured at index build time."""
+
+    name: str
+    hidden: bool
+    short_help: str | None
+    #: Position of the command in :meth:`click.MultiCommand.list_commands`,
+    #: used to report matches in the same order as the group lists them.
+    position: int
+
+
+#: Seconds during which a :class:`CommandIndex` whose changes can't be
+#: detected cheaply is trusted, before its group is asked for its commands again.
+STALE_CHECK_INTERVAL = 1.0
+
+
+def _lists_registered_commands(group: click.MultiCommand) -> bool:
+    return (
+        isinstance(group, click.Group)
+        and type(group).list_commands is click.Group.list_commands
+    )
+
+
+def _commands_signature(group: click.MultiCommand) -> tuple[tuple[int, int], ...] | None:
+    """
+    Identity and size of the command dicts that ``group`` lists its commands
+    from, or :obj:`None` if it lists them some other way.
+    """
+
+    if _lists_registered_commands(group):
+        groups: t.Sequence[click.MultiCommand] = [group]
+
+    elif (
+        isinstance(group, click.CommandCollection)
+        and type(group).list_commands is click.CommandCollection.list_commands
+        and all(_lists_registered_commands(source) for source in group.sources)
+    ):
+        groups = group.sources
+
+    else:
+        return None
+
+    return tuple(
+        (id(source.commands), len(source.commands))  # type: ignore[attr-defined]
+        for source in groups
+    )
+
+
+class _TrieNode:
+    __slots__ = ("children", "entries")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.entries: list[CommandEntry] = []
+
+
+class CommandIndex:
+    """
+    Case-insensitive prefix trie over the subcommands of a
+    :class:`click.MultiCommand`.
+
+    The index is built once from :meth:`~click.MultiCommand.list_commands` and
+    :meth:`~click.MultiCommand.get_command`, so a prefix lookup costs
+    ``O(len(prefix) + matches)`` instead of resolving every subcommand.
+
+    Parameters
+    ----------
+    group
+        The group whose subcommands should be indexed.
+
+    ctx
+        The click context the group is resolved in.
+    """
+
+    __slots__ = (
+        "group",
+        "names",
+        "_commands",
+        "_signature",
+        "_checked_at",
+        "_root",
+        "_size",
+        "_entries",
+        "_fuzzy",
+    )
+
+    def __init__(self, group: click.MultiCommand, ctx: click.Context) -> None:
+        self.group = group
+        self._root = _TrieNode()
+        self._size = 0
+        self._entries: dict[str, CommandEntry] = {}
+        self._fuzzy: FuzzyIndex | None = None
+
+        self.names: tuple[str, ...] = tuple(group.list_commands(ctx))
+        """Names of the indexed subcommands, in the order they are listed."""
+
+        self._init_change_detection()
+
+        for position, name in enumerate(self.names):
+            command = group.get_command(ctx, name)
+            self._insert(
+                CommandEntry(
+                    name,
+                    getattr(command, "hidden", False),
+                    getattr(command, "short_help", ""),
+                    position,
+                )
+            )
+
+    @classmethod
+    def from_snapshot(
+        cls, group: click.MultiCommand, ctx: click.Context, snapshot: t.Any
+    ) -> CommandIndex:
+        """
+        Restores an index of ``group`` from the data returned by
+        :meth:`snapshot`, without loading any of its subcommands.
+        """
+
+        names, entries, fuzzy = snapshot
+
+        self = cls.__new__(cls)
+        self.group = group
+        self.names = tuple(names)
+        self._root = _TrieNode()
+        self._size = 0
+        self._entries = {}
+        self._fuzzy = None if fuzzy is None else FuzzyIndex.from_snapshot(fuzzy)
+
+        self._init_change_detection()
+        # Commands may have changed since the snapshot was taken
+        self._checked_at = -float("inf")
+
+        for entry in entries:
+            self._insert(CommandEntry(*entry))
+
+        return self
+
+    def _init_change_detection(self) -> None:
+        group = self.group
+
+        # Snapshot of the registered commands of a click.Group that lists
+        # exactly those, which allows change detection without calling
+        # list_commands() again.
+        self._commands: dict[str, click.Command] | None = None
+        if _lists_registered_commands(group):
+            self._commands = dict(group.commands)  # type: ignore[attr-defined]
+
+        self._signature = _commands_signature(group)
+        self._checked_at = time.monotonic()
+
+    def snapshot(self) -> t.Any:
+        """Plain data of the index, that doesn't refer to any command."""
+        entries = sorted(self._entries.values(), key=lambda entry: entry.position)
+        fuzzy = None if self._fuzzy is None else self._fuzzy.snapshot()
+        return self.names, [tuple(entry) for entry in entries], fuzzy
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _insert(self, entry: CommandEntry) -> None:
+        node = self._root
+        for char in entry.name.lower():
+            node = node.children.setdefault(char, _TrieNode())
+
+        node.entries.append(entry)
+        self._entries.setdefault(entry.name, entry)
+        self._size += 1
+
+    def is_stale(self, ctx: click.Context, thorough: bool = False) -> bool:
+        """
+        Checks whether the command set of the group changed since the
+        index was built.
+
+        This is called on every keystroke, so it only compares the identity
+        and size of the command dicts of :class:`click.Group` objects, and of
+        the sources of :class:`click.CommandCollection` objects. The commands
+        themselves are compared, and other multi commands are asked for their
+        command names again, at most every :data:`STALE_CHECK_INTERVAL`
+        seconds, or when ``thorough`` is true.
+        """
+
+        if (
+            self._signature is not None
+            and _commands_signature(self.group) != self._signature
+        ):
+            return True
+
+        now = time.monotonic()
+        if not thorough and now - self._checked_at < STALE_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+
+        if self._commands is not None:
+            return self._commands != self.group.commands  # type: ignore[attr-defined]
+
+        return self.names != tuple(self.group.list_commands(ctx))
+
+    def _walk(self, node: _TrieNode) -> Iterator[CommandEntry]:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield from node.entries
+            stack.extend(node.children.values())
+
+    def search(self, prefix: str, include_hidden: bool = False) -> list[CommandEntry]:
+        """
+        Returns the entries whose name starts with ``prefix``, ignoring case.
+
+        Parameters
+        ----------
+        prefix
+            The incomplete subcommand name typed by the user.
+
+        include_hidden
+            Whether hidden commands should be part of the result.
+
+        Returns
+        -------
+        list[CommandEntry]
+            Matching entries in the order of the group's command listing.
+        """
+
+        node: _TrieNode | None = self._root
+        for char in prefix.lower():
+            node = t.cast(_TrieNode, node).children.get(char)
+            if node is None:
+                return []
+
+        matches = [
+            entry
+            for entry in self._walk(t.cast(_TrieNode, node))
+            if include_hidden or not entry.hidden
+        ]
+        matches.sort(key=lambda entry: entry.position)
+        return matches
+
+    def fuzzy_search(
+        self, query: str, limit: int | None = FUZZY_LIMIT
+    ) -> list[CommandEntry]:
+        """
+        Returns the visible entries fuzzily matching ``query``, best matches
+        first. See :class:`FuzzyIndex`.
+        """
+
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex(
+                [name for name, entry in self._entries.items() if not entry.hidden]
+            )
+
+        return [self._entries[name] for name in self._fuzzy.search(query, limit)]
+
+
+class OptionTable:
+    """
+    Lookup tables over the parameters of a :class:`click.Command`, used for
+    option completion.
+
+    Parameters
+    ----------
+    command
+        The command whose parameters should be indexed.
+    """
+
+    __slots__ = (
+        "params",
+        "options",
+        "prefixes",
+        "arguments",
+        "visible_options",
+        "opt_positions",
+        "sorted_opts",
+        "nargs_values",
+        "unprocessed_position",
+        "_fuzzy",
+    )
+
+    def __init__(self, command: click.Command) -> None:
+        self.params: list[click.Parameter] = list(command.params)
+        """Snapshot of the command's parameters the table was built from."""
+
+        self.options: dict[str, click.Option] = {}
+        """Every option string of the command, mapped to its option."""
+
+        self.arguments: list[click.Argument] = []
+        """Positional arguments, in the order they are parsed."""
+
+        self.visible_options: list[tuple[int, click.Option, list[str]]] = []
+        """Position, object and option strings of the options that aren't hidden."""
+
+        self.opt_positions: dict[str, tuple[int, int]] = {}
+        """
+        Option strings of the visible options, mapped to the position of the
+        option within the parameters and of the string within the option.
+        """
+
+        self.unprocessed_position: int | None = None
+        """Position of the first parameter that takes unprocessed values."""
+
+        for position, param in enumerate(self.params):
+            if isinstance(param.type, click.types.UnprocessedParamType):
+                if self.unprocessed_position is None:
+                    self.unprocessed_position = position
+
+            if isinstance(param, click.Argument):
+                self.arguments.append(param)
+
+            elif isinstance(param, click.Option):
+                opts = param.opts + param.secondary_opts
+                for opt in opts:
+                    self.options.setdefault(opt, param)
+
+                if getattr(param, "hidden", False):
+                    continue
+
+                self.visible_options.append((position, param, opts))
+                for opt_position, opt in enumerate(opts):
+                    self.opt_positions.setdefault(opt, (position, opt_position))
+
+        self.prefixes = frozenset(opt[:1] for opt in self.options)
+        self.sorted_opts = sorted(self.opt_positions)
+        self.nargs_values = sorted({param.nargs for _, param, _ in self.visible_options})
+        self._fuzzy: FuzzyIndex | None = None
+
+    def is_stale(self, command: click.Command) -> bool:
+        """Checks whether the parameters of the command changed."""
+        return self.params != command.params
+
+    def find_called_option(self, args: list[str]) -> tuple[int, int] | None:
+        """
+        Finds the visible option whose values are being entered, i.e. that
+        occurs within its last ``nargs`` tokens.
+
+        Returns
+        -------
+        tuple[int, int] | None
+            The position of the option within the parameters, and the index of
+            the value being entered. :obj:`None` if no option takes the value.
+        """
+
+        called: tuple[int, int] | None = None
+
+        for nargs in self.nargs_values:
+            current_args = args[-nargs:]
+            for index, token in enumerate(current_args):
+                opt_position = self.opt_positions.get(token, None)
+                if opt_position is None:
+                    continue
+
+                position = opt_position[0]
+                if self.params[position].nargs == nargs and (
+                    called is None or position < called[0]
+                ):
+                    called = (position, len(current_args) - index - 1)
+
+        return called
+
+    def used_positions(self, args: list[str]) -> set[int]:
+        """Positions of the visible options that occur in ``args``."""
+        opt_positions = self.opt_positions
+        return {opt_positions[arg][0] for arg in args if arg in opt_positions}
+
+    def search(self, prefix: str) -> list[str]:
+        """
+        Returns the option strings of the visible options starting with
+        ``prefix``, ordered by their parameter and declaration order.
+        """
+
+        opts = self.sorted_opts
+        matches = []
+
+        for index in range(bisect_left(opts, prefix), len(opts)):
+            if not opts[index].startswith(prefix):
+                break
+            matches.append(opts[index])
+
+        matches.sort(key=self.opt_positions.__getitem__)
+        return matches
+
+    def fuzzy_search(self, query: str, limit: int | None = FUZZY_LIMIT) -> list[str]:
+        """
+        Returns the option strings of the visible options fuzzily matching
+        ``query``, best matches first. See :class:`FuzzyIndex`.
+        """
+
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex(
+                sorted(self.opt_positions, key=self.opt_positions.__getitem__)
+            )
+
+        return self._fuzzy.search(query, limit)
+
+
+def _choices_digest(choices: Sequence[t.Any]) -> str:
+    """Digest of the choices of a :class:`click.Choice`, to tell them apart."""
+    digest = hashlib.sha256()
+    for choice in choices:
+        digest.update(repr(choice).encode("utf-8"))
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+class ChoiceIndex:
+    """
+    Sorted index over the values of a :class:`click.Choice`, answering prefix
+    queries with a binary search instead of scanning every value.
+
+    Parameters
+    ----------
+    param_type
+        The choice type whose values should be indexed.
+    ctx
+        Context used to convert non-string choices to strings, as
+        :meth:`click.Choice.shell_complete` would.
+    """
+
+    __slots__ = (
+        "choices",
+        "size",
+        "case_sensitive",
+        "values",
+        "keys",
+        "order",
+        "_fuzzy",
+    )
+
+    def __init__(
+        self, param_type: click.Choice, ctx: click.Context | None = None
+    ) -> None:
+        self.choices = param_type.choices
+        self.size = len(self.choices)
+        self.case_sensitive = param_type.case_sensitive
+
+        normalize = getattr(param_type, "normalize_choice", None)
+        if normalize is not None:
+            # click >= 8.2 supports non-string choices, like enums
+            self.values = [normalize(choice, ctx) for choice in self.choices]
+        else:
+            self.values = [str(choice) for choice in self.choices]
+
+        keys = self.values
+        if not self.case_sensitive:
+            keys = [value.lower() for value in keys]
+
+        #: Declaration positions of the values, in the order of their keys.
+        self.order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in self.order]
+        self._fuzzy: FuzzyIndex | None = None
+
+    @classmethod
+    def from_snapshot(cls, param_type: click.Choice, snapshot: t.Any) -> ChoiceIndex:
+        """
+        Restores an index of ``param_type`` from the data returned by
+        :meth:`snapshot`.
+
+        Raises
+        ------
+        ValueError
+            If the data was built from other choices, or with another case
+            sensitivity.
+        """
+
+        digest, case_sensitive, values, order, keys, fuzzy = snapshot
+        # Choices of lazily loaded commands aren't covered by the fingerprint
+        # of the CLI, they may have changed since the snapshot was taken.
+        if (
+            case_sensitive != param_type.case_sensitive
+            or len(values) != len(param_type.choices)
+            or digest != _choices_digest(param_type.choices)
+        ):
+            raise ValueError("The snapshot doesn't match the choices")
+
+        self = cls.__new__(cls)
+        self.choices = param_type.choices
+        self.size = len(self.choices)
+        self.case_sensitive = param_type.case_sensitive
+        self.values = values
+        self.order = order
+        self.keys = keys
+        self._fuzzy = None if fuzzy is None else FuzzyIndex.from_snapshot(fuzzy)
+        return self
+
+    def snapshot(self) -> t.Any:
+        """Plain data of the index, that doesn't refer to the choices."""
+        fuzzy = None if self._fuzzy is None else self._fuzzy.snapshot()
+        return (
+            _choices_digest(self.choices),
+            self.case_sensitive,
+            self.values,
+            self.order,
+            self.keys,
+            fuzzy,
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def is_stale(self, param_type: click.Choice) -> bool:
+        return (
+            param_type.choices is not self.choices
+            or len(param_type.choices) != self.size
+            or param_type.case_sensitive != self.case_sensitive
+        )
+
+    def search(self, prefix: str, limit: int | None = None) -> list[str]:
+        """
+        Returns the values starting with ``prefix``.
+
+        Values are returned in declaration order. If there are more than
+        ``limit`` of them, the first ``limit`` values in sorted order are
+        returned instead, so that a query costs O(log n + limit).
+        """
+
+        if not self.case_sensitive:
+            prefix = prefix.lower()
+
+        keys = self.keys
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + "\U0010ffff", start)
+
+        # A value equal to the prefix followed by the highest code point
+        while end < len(keys) and keys[end].startswith(prefix):
+            end += 1
+
+        if start == 0 and end == len(keys) and limit is None:
+            return list(self.values)
+
+        if limit is not None and end - start > limit:
+            positions = self.order[start : start + limit]
+        else:
+            positions = sorted(self.order[start:end])
+
+        values = self.values
+        return [values[i] for i in positions]
+
+    def fuzzy_search(self, query: str, limit: int | None = FUZZY_LIMIT) -> list[str]:
+        """
+        Returns the values fuzzily matching ``query``, best matches first.
+        See :class:`FuzzyIndex`.
+        """
+
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex(self.values)
+
+        return self._fuzzy.search(query, limit)
+
+
+def _trigrams(text: str, padded: bool = True) -> set[str]:
+    # Padded at the start only, so that the beginning of a value is weighted
+    # more, and an incomplete query doesn't require the value to end there.
+    # Substring searches need the trigrams of the text only.
+    if padded:
+        text = " " + text
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _short_grams(text: str) -> set[str]:
+    # Characters and pairs of characters of the text, to look up queries too
+    # short to have inner trigrams, with its first one and two characters
+    # marked as such. Pairs following a space are kept with it, as they share
+    # the padded trigram of such queries.
+    grams = {text[i : i + 2] for i in range(len(text) - 1)}
+    grams.update(text, ("\0" + text[:1], "\0" + text[:2]))
+    if " " in text:
+        grams.update(text[i : i + 3] for i in range(len(text) - 2) if text[i] == " ")
+    return grams
+
+
+def _is_subsequence(query: str, text: str) -> bool:
+    chars = iter(text)
+    return all(char in chars for char in query)
+
+
+class FuzzyIndex:
+    """
+    Trigram index for ranked fuzzy matching of completion candidates.
+
+    Matches are ranked by kind (prefix, substring, subsequence, then trigram
+    overlap only, which tolerates typos), then by the number of the query's
+    trigrams they contain, and by length.
+
+    A query doesn't score every value. Candidates are the values starting with
+    the query, found in a sorted key list, the values containing the query,
+    found in the posting list of one of its trigrams, and the values that can
+    share enough trigrams with the query: as a match must contain more than
+    half of them, it appears in at least one of the posting lists of the
+    rarest trigrams. Abbreviations are looked up among the values starting
+    with the query's first character only if that doesn't provide enough
+    candidates.
+
+    Queries of one or two characters have no inner trigram. They're looked
+    up in posting lists of characters and pairs of characters instead, sorted
+    by rank, so that only the first ``limit`` values of each are scored.
+
+    Parameters
+    ----------
+    values
+        The candidates, in their preferred order for equally ranked matches.
+    """
+
+    __slots__ = (
+        "values",
+        "keys",
+        "postings",
+        "short_postings",
+        "_sorted_keys",
+        "_sorted_positions",
+    )
+
+    def __init__(self, values: Sequence[str]) -> None:
+        self.values = list(values)
+        self.keys = [value.lower() for value in self.values]
+
+        postings: defaultdict[str, list[int]] = defaultdict(list)
+        for position, key in enumerate(self.keys):
+            for trigram in _trigrams(key):
+                postings[trigram].append(position)
+
+        self.postings = dict(postings)
+
+        # Shorter values first, in their order otherwise, as they're ranked
+        # among matches of the same kind.
+        by_rank = sorted(range(len(self.keys)), key=lambda i: len(self.keys[i]))
+        short_postings: defaultdict[str, list[int]] = defaultdict(list)
+        for position in by_rank:
+            for gram in _short_grams(self.keys[position]):
+                short_postings[gram].append(position)
+
+        self.short_postings = dict(short_postings)
+        self._sorted_positions = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self._sorted_keys = [self.keys[i] for i in self._sorted_positions]
+
+    @classmethod
+    def from_snapshot(cls, snapshot: t.Any) -> FuzzyIndex:
+        """Restores an index from the data returned by :meth:`snapshot`."""
+
+        values, postings, short_postings, sorted_positions = snapshot
+
+        self = cls.__new__(cls)
+        self.values = list(values)
+        self.keys = [value.lower() for value in self.values]
+        self.postings = postings
+        self.short_postings = short_postings
+        self._sorted_positions = sorted_positions
+        self._sorted_keys = [self.keys[i] for i in sorted_positions]
+        return self
+
+    def snapshot(self) -> t.Any:
+        """Plain data of the index, like lists of strings and numbers."""
+        return self.values, self.postings, self.short_postings, self._sorted_positions
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _starting_with(self, prefix: str) -> list[int]:
+        sorted_keys = self._sorted_keys
+        start = bisect_left(sorted_keys, prefix)
+        end = start
+        while end < len(sorted_keys) and sorted_keys[end].startswith(prefix):
+            end += 1
+        return self._sorted_positions[start:end]
+
+    def _score(
+        self, position: int, query: str, trigrams: set[str], required: int
+    ) -> tuple[int, int, int, int] | None:
+        key = self.keys[position]
+        shared = len(trigrams & _trigrams(key))
+
+        if key.startswith(query):
+            kind = 3
+        elif query in key:
+            kind = 2
+        elif _is_subsequence(query, key):
+            kind = 1
+        elif shared >= required:
+            kind = 0
+        else:
+            return None
+
+        return kind, shared, -len(key), -position
+
+    def _short_candidates(self, query: str, limit: int | None) -> set[int]:
+        """
+        Positions of the values among which the best ``limit`` matches of a
+        query of one or two characters are.
+        """
+
+        postings = self.short_postings
+        candidates: set[int] = set()
+
+        # Values starting with the query, then containing it. Those
+        # containing it after a space share its padded trigram, and rank
+        # before the other ones.
+        candidates.update(postings.get("\0" + query, [])[:limit])
+        if len(query) == 2:
+            candidates.update(postings.get(" " + query, [])[:limit])
+
+        containing = postings.get(query, [])
+        if limit is None:
+            candidates.update(containing)
+        else:
+            count = 0
+            for position in containing:
+                if position not in candidates:
+                    candidates.add(position)
+                    count += 1
+                    if count >= limit:
+                        break
+
+        if len(query) == 1 or (limit is not None and len(containing) >= limit):
+            return candidates
+
+        # Abbreviations, among the values starting with the first character
+        count = 0
+        for position in postings.get("\0" + query[0], []):
+            key = self.keys[position]
+            if query not in key and _is_subsequence(query, key):
+                candidates.add(position)
+                count += 1
+                if limit is not None and count >= limit:
+                    break
+
+        return candidates
+
+    def search(self, query: str, limit: int | None = FUZZY_LIMIT) -> list[str]:
+        """
+        Returns the values matching ``query``, best matches first, and at
+        most ``limit`` of them, or all of them if ``limit`` is :obj:`None`.
+        """
+
+        query = query.lower()
+        if not query:
+            return self.values[:limit]
+
+        trigrams = _trigrams(query)
+        # Values matching only by trigrams must contain most of them
+        required = len(trigrams) // 2 + 1
+
+        if len(query) <= 2:
+            scored = [
+                score
+                for score in (
+                    self._score(position, query, trigrams, required)
+                    for position in self._short_candidates(query, limit)
+                )
+                if score is not None
+            ]
+
+        else:
+            # Values starting with the query contain all of its trigrams, so
+            # their score is known without looking at their trigrams. If there
+            # are enough of them, nothing else can rank before them.
+            prefixed = self._starting_with(query)
+            scored = [
+                (3, len(trigrams), -len(self.keys[position]), -position)
+                for position in prefixed
+            ]
+
+            if limit is None or len(scored) < limit:
+                candidates: set[int] = set()
+                rarest = sorted(
+                    (self.postings.get(trigram, []) for trigram in trigrams), key=len
+                )
+                for posting in rarest[: len(trigrams) - required + 1]:
+                    candidates.update(posting)
+
+                # Values containing the query contain all its trigrams but the
+                # first one, padded at the start, so any of the others finds
+                # them.
+                inner = [
+                    self.postings.get(query[i : i + 3], [])
+                    for i in range(len(query) - 2)
+                ]
+                shortest = min(inner, key=len)
+                candidates.update(shortest)
+
+                scored_positions = set(prefixed)
+                candidates.difference_update(scored_positions)
+                for position in candidates:
+                    score = self._score(position, query, trigrams, required)
+                    if score is not None:
+                        scored.append(score)
+
+                # Abbreviations, among the values starting with the first
+                # character, rank after the values containing the query only
+                if limit is None or sum(score[0] >= 2 for score in scored) < limit:
+                    scored_positions.update(candidates)
+                    keys = self.keys
+                    for position in self._starting_with(query[0]):
+                        if position in scored_positions or not _is_subsequence(
+                            query, keys[position]
+                        ):
+                            continue
+
+                        score = self._score(position, query, trigrams, required)
+                        if score is not None:
+                            scored.append(score)
+
+        if limit is None:
+            scored.sort(reverse=True)
+        else:
+            scored = heapq.nlargest(limit, scored)
+
+        return [self.values[-score[3]] for score in scored]
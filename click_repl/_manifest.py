@@ -0,0 +1,429 @@
+"""
+Completion manifests: the command tree of a CLI, with its parameters, choices
+and help texts, saved in a JSON file so that it can be completed without
+importing the modules of lazily loaded commands.
+"""
+
+from __future__ import annotations
+
+import enum
+import json
+import os
+from typing import Any, Callable, Mapping
+
+import click
+
+from .utils import AUTO_COMPLETION_PARAM, HAS_CLICK_V8
+
+__all__ = [
+    "MANIFEST_VERSION",
+    "ManifestCommand",
+    "ManifestGroup",
+    "build_manifest",
+    "load_manifest",
+    "manifest_cli",
+    "save_manifest",
+]
+
+#: Version of the manifest format, bumped on incompatible changes.
+MANIFEST_VERSION = 1
+
+# Resolves the real command at the given path of names from the root group
+_Loader = Callable[[click.Context, "tuple[str, ...]"], "click.Command | None"]
+
+# Types completed by ClickCompleter itself, rather than by their shell_complete
+_BUILTIN_TYPES = (click.Path, click.File, click.types.BoolParamType, click.Tuple)
+
+
+def _json_value(value: Any) -> bool:
+    if isinstance(value, (list, tuple)):
+        return all(_json_value(item) for item in value)
+
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def _choice_value(choice: Any) -> str:
+    return choice.name if isinstance(choice, enum.Enum) else str(choice)
+
+
+def _has_custom_completion(param: click.Parameter) -> bool:
+    """Whether the completions of ``param`` depend on code of the CLI."""
+
+    if not HAS_CLICK_V8:
+        return getattr(param, "autocompletion", None) is not None
+
+    if getattr(param, "_custom_shell_complete", None) is not None:
+        return True
+
+    shell_complete = type(param.type).shell_complete
+    if isinstance(param.type, click.Choice):
+        return shell_complete is not click.Choice.shell_complete
+
+    return (
+        not isinstance(param.type, _BUILTIN_TYPES)
+        and shell_complete is not click.ParamType.shell_complete
+    )
+
+
+def _describe_type(param_type: click.ParamType) -> dict[str, Any]:
+    if isinstance(param_type, click.Choice):
+        return {
+            "name": "choice",
+            "choices": [_choice_value(choice) for choice in param_type.choices],
+            "case_sensitive": param_type.case_sensitive,
+        }
+
+    elif isinstance(param_type, click.Path):
+        return {
+            "name": "path",
+            "file_okay": param_type.file_okay,
+            "dir_okay": param_type.dir_okay,
+        }
+
+    elif isinstance(param_type, click.File):
+        return {"name": "file"}
+
+    elif isinstance(param_type, click.types.BoolParamType):
+        return {"name": "bool"}
+
+    elif isinstance(param_type, click.Tuple):
+        return {
+            "name": "tuple",
+            "types": [_describe_type(item) for item in param_type.types],
+        }
+
+    return {"name": param_type.name}
+
+
+def _describe_param(param: click.Parameter) -> dict[str, Any]:
+    return {
+        "param_type": "option" if isinstance(param, click.Option) else "argument",
+        "name": param.name,
+        "opts": list(param.opts),
+        "secondary_opts": list(param.secondary_opts),
+        "nargs": param.nargs,
+        "multiple": param.multiple,
+        "required": param.required,
+        "hidden": getattr(param, "hidden", False),
+        "help": getattr(param, "help", None),
+        "is_flag": getattr(param, "is_flag", False),
+        "count": getattr(param, "count", False),
+        "type": _describe_type(param.type),
+        "dynamic": _has_custom_completion(param),
+    }
+
+
+def _describe_command(
+    command: click.Command, name: str, ctx: click.Context
+) -> dict[str, Any]:
+    node: dict[str, Any] = {
+        "name": name,
+        "short_help": command.short_help,
+        "help": command.help,
+        "hidden": command.hidden,
+        "allow_extra_args": command.allow_extra_args,
+        "allow_interspersed_args": command.allow_interspersed_args,
+        "ignore_unknown_options": command.ignore_unknown_options,
+        "context_settings": {
+            key: value
+            for key, value in command.context_settings.items()
+            if _json_value(value)
+        },
+        "params": [_describe_param(param) for param in command.params],
+    }
+
+    if isinstance(command, click.MultiCommand):
+        node["chain"] = command.chain
+        node["commands"] = []
+
+        for sub_name in command.list_commands(ctx):
+            sub_command = command.get_command(ctx, sub_name)
+            if sub_command is None:
+                continue
+
+            sub_ctx = click.Context(sub_command, info_name=sub_name, parent=ctx)
+            node["commands"].append(_describe_command(sub_command, sub_name, sub_ctx))
+
+    return node
+
+
+def build_manifest(
+    cli: click.MultiCommand, ctx: click.Context | None = None
+) -> dict[str, Any]:
+    """
+    Describes the command tree of ``cli`` as a JSON serializable manifest.
+
+    Every command is loaded, so this is meant to be run when the CLI is built
+    or installed, rather than when it starts.
+
+    Parameters
+    ----------
+    cli
+        The root group of the CLI.
+
+    ctx
+        The context of ``cli``, created if not given.
+
+    Returns
+    -------
+    dict[str, Any]
+        The manifest.
+    """
+
+    if ctx is None:
+        ctx = click.Context(cli, info_name=cli.name)
+
+    return {
+        "version": MANIFEST_VERSION,
+        "root": _describe_command(cli, cli.name or "", ctx),
+    }
+
+
+def save_manifest(
+    cli: click.MultiCommand,
+    path: str | os.PathLike[str],
+    ctx: click.Context | None = None,
+) -> None:
+    """Writes the manifest of ``cli`` to ``path``, as JSON."""
+
+    manifest = build_manifest(cli, ctx)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+
+
+def load_manifest(path: str | os.PathLike[str]) -> dict[str, Any]:
+    """
+    Reads a manifest written by :func:`save_manifest`.
+
+    Raises
+    ------
+    ValueError
+        If the manifest was written in another version of the format.
+    """
+
+    with open(path, encoding="utf-8") as f:
+        manifest: dict[str, Any] = json.load(f)
+
+    version = manifest.get("version", None)
+    if version != MANIFEST_VERSION:
+        raise ValueError(
+            f"Unsupported completion manifest version {version!r} in {path!r}, "
+            f"expected {MANIFEST_VERSION}; regenerate it with save_manifest()"
+        )
+
+    return manifest
+
+
+class _DelegatedCompletion:
+    """
+    Completion callback of a parameter whose completions can't be saved in
+    the manifest. The real command is loaded to complete it.
+    """
+
+    __slots__ = ("loader", "path", "name")
+
+    def __init__(self, loader: _Loader, path: tuple[str, ...], name: str) -> None:
+        self.loader = loader
+        self.path = path
+        self.name = name
+
+    def __call__(self, ctx: click.Context, param_or_args: Any, incomplete: str) -> Any:
+        command = self.loader(ctx, self.path)
+        if command is None:
+            return []
+
+        for param in command.params:
+            if param.name != self.name:
+                continue
+
+            if HAS_CLICK_V8:
+                return param.shell_complete(ctx, incomplete)
+
+            return param.autocompletion(  # type: ignore[attr-defined]
+                ctx, param_or_args, incomplete
+            )
+
+        return []
+
+
+def _build_type(node: Mapping[str, Any]) -> click.ParamType:
+    name = node["name"]
+
+    if name == "choice":
+        return click.Choice(node["choices"], case_sensitive=node["case_sensitive"])
+
+    elif name == "path":
+        return click.Path(file_okay=node["file_okay"], dir_okay=node["dir_okay"])
+
+    elif name == "file":
+        return click.File()
+
+    elif name == "bool":
+        return click.BOOL
+
+    elif name == "tuple":
+        return click.Tuple([_build_type(item) for item in node["types"]])
+
+    # Values are not converted while completing
+    return click.STRING
+
+
+def _option_decls(node: Mapping[str, Any]) -> list[str]:
+    # Secondary options are declared after a "/", with an empty primary option
+    # as in " /-S", except those starting with "/" themselves, which follow a
+    # ";" in a declaration starting with "/", as in "/debug;/no-debug".
+    slashed = iter(opt for opt in node["secondary_opts"] if opt[:1] == "/")
+    decls: list[str] = []
+
+    for opt in node["opts"]:
+        secondary_opt = next(slashed, None) if opt[:1] == "/" else None
+        decls.append(opt if secondary_opt is None else f"{opt};{secondary_opt}")
+
+    decls.extend(f" /{opt}" for opt in node["secondary_opts"] if opt[:1] != "/")
+
+    if node["name"]:
+        decls.append(node["name"])
+
+    return decls
+
+
+def _build_param(
+    node: Mapping[str, Any], path: tuple[str, ...], loader: _Loader
+) -> click.Parameter:
+    attrs: dict[str, Any] = {"required": node["required"]}
+
+    if node["type"]["name"] != "bool" or not node["is_flag"]:
+        attrs["type"] = _build_type(node["type"])
+        if node["type"]["name"] != "tuple":
+            attrs["nargs"] = node["nargs"]
+
+    if node["dynamic"]:
+        attrs[AUTO_COMPLETION_PARAM] = _DelegatedCompletion(loader, path, node["name"])
+
+    param: click.Parameter
+    if node["param_type"] == "option":
+        attrs["multiple"] = node["multiple"]
+        if node["is_flag"]:
+            attrs["is_flag"] = True
+            attrs.pop("nargs", None)
+        if node["count"]:
+            attrs["count"] = True
+            attrs.pop("type", None)
+            attrs.pop("nargs", None)
+
+        param = click.Option(
+            _option_decls(node), hidden=node["hidden"], help=node["help"], **attrs
+        )
+
+    else:
+        param = click.Argument([node["name"]], **attrs)
+        if node["hidden"]:
+            param.hidden = True  # type: ignore[attr-defined]
+
+    return param
+
+
+def _command_attrs(
+    node: Mapping[str, Any], path: tuple[str, ...], loader: _Loader
+) -> dict[str, Any]:
+    return {
+        "name": node["name"],
+        "params": [_build_param(param, path, loader) for param in node["params"]],
+        "help": node["help"],
+        "short_help": node["short_help"],
+        "hidden": node["hidden"],
+        "context_settings": dict(node["context_settings"]),
+    }
+
+
+def _apply_parsing_flags(command: click.Command, node: Mapping[str, Any]) -> None:
+    command.allow_extra_args = node["allow_extra_args"]
+    command.allow_interspersed_args = node["allow_interspersed_args"]
+    command.ignore_unknown_options = node["ignore_unknown_options"]
+
+
+class ManifestCommand(click.Command):
+    """
+    Stand-in for a command described by a completion manifest. It parses and
+    completes like the real command, but doesn't run anything.
+    """
+
+    def __init__(
+        self, node: Mapping[str, Any], path: tuple[str, ...], loader: _Loader
+    ) -> None:
+        super().__init__(**_command_attrs(node, path, loader))
+        _apply_parsing_flags(self, node)
+
+
+class ManifestGroup(click.Group):
+    """
+    Stand-in for a group described by a completion manifest. Its subcommands
+    are created from the manifest when they're first asked for.
+    """
+
+    def __init__(
+        self, node: Mapping[str, Any], path: tuple[str, ...], loader: _Loader
+    ) -> None:
+        super().__init__(chain=node["chain"], **_command_attrs(node, path, loader))
+        _apply_parsing_flags(self, node)
+
+        self._path = path
+        self._loader = loader
+        self._nodes = {child["name"]: child for child in node["commands"]}
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return list(self._nodes)
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        command = self.commands.get(cmd_name, None)
+
+        if command is None and cmd_name in self._nodes:
+            command = _build_command(
+                self._nodes[cmd_name], self._path + (cmd_name,), self._loader
+            )
+            self.commands[cmd_name] = command
+
+        return command
+
+
+def _build_command(
+    node: Mapping[str, Any], path: tuple[str, ...], loader: _Loader
+) -> click.Command:
+    if "commands" in node:
+        return ManifestGroup(node, path, loader)
+
+    return ManifestCommand(node, path, loader)
+
+
+def manifest_cli(
+    manifest: Mapping[str, Any], cli: click.MultiCommand | None = None
+) -> ManifestGroup:
+    """
+    Creates stand-ins of the commands described by ``manifest``.
+
+    Parameters
+    ----------
+    manifest
+        A manifest created by :func:`build_manifest`.
+
+    cli
+        The real root group. Its commands are loaded only to complete the
+        parameters whose completions the manifest can't describe, like the ones
+        with a ``shell_complete`` callback. Without it, those have none.
+
+    Returns
+    -------
+    ManifestGroup
+        The stand-in of the root group.
+    """
+
+    def load(ctx: click.Context, path: tuple[str, ...]) -> click.Command | None:
+        command: click.Command | None = cli
+        for name in path:
+            if not isinstance(command, click.MultiCommand):
+                return None
+            command = command.get_command(ctx, name)
+
+        return command
+
+    return ManifestGroup(manifest["root"], (), load)
@@ -0,0 +1,310 @@
+"""
+Cached directory listings for completing click.Path and click.File values.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import AsyncGenerator, Callable, Iterable, Iterator
+
+from ._cache import LRUCache
+
+__all__ = ["DirectoryCache", "DirectoryListing", "DirectoryScan"]
+
+
+def _entry_items(entries: Iterable[os.DirEntry[str]]) -> Iterator[tuple[str, bool]]:
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+
+        yield entry.name, is_dir
+
+
+def accepts_entry(name: str, is_dir: bool, files: bool, hidden: bool) -> bool:
+    """Tells whether an entry passes the ``files`` and ``hidden`` filters."""
+    if name.startswith(".") and not hidden:
+        return False
+
+    return files or is_dir
+
+
+class DirectoryListing:
+    """
+    The ``(name, is_dir)`` entries of a directory, sorted by name for prefix
+    searches.
+
+    Whether an entry is a directory is taken from the :class:`os.DirEntry`
+    objects produced by :func:`os.scandir`, which usually know it without an
+    extra ``stat`` call.
+    """
+
+    __slots__ = ("keys", "names", "is_dir")
+
+    def __init__(self, entries: Iterable[tuple[str, bool]]) -> None:
+        items = [(os.path.normcase(name), name, is_dir) for name, is_dir in entries]
+        items.sort()
+        self.keys = [item[0] for item in items]
+        self.names = [item[1] for item in items]
+        self.is_dir = [item[2] for item in items]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(
+        self,
+        prefix: str,
+        files: bool = True,
+        hidden: bool = False,
+        limit: int | None = None,
+    ) -> Iterator[tuple[str, bool]]:
+        """
+        Yields the ``(name, is_dir)`` pairs of the entries whose name starts
+        with ``prefix``.
+
+        Parameters
+        ----------
+        prefix
+            Beginning of the entry names. It's compared case insensitively on
+            platforms with case insensitive file systems.
+        files
+            Whether to include entries that are not directories.
+        hidden
+            Whether to include entries whose name starts with a dot.
+        limit
+            Maximum number of entries to yield.
+        """
+
+        key = os.path.normcase(prefix)
+        keys = self.keys
+        count = 0
+
+        for i in range(bisect_left(keys, key), len(keys)):
+            if not keys[i].startswith(key):
+                break
+
+            name = self.names[i]
+            if not accepts_entry(name, self.is_dir[i], files, hidden):
+                continue
+
+            if limit is not None and count >= limit:
+                break
+
+            count += 1
+            yield name, self.is_dir[i]
+
+
+class DirectoryCache:
+    """
+    Keeps the listings of recently completed directories.
+
+    A listing is reused as long as the modification time of its directory
+    doesn't change, so that typing a file name lists the directory only once.
+
+    Parameters
+    ----------
+    maxsize
+        Maximum number of directory listings kept in the cache.
+    """
+
+    __slots__ = ("_listings",)
+
+    def __init__(self, maxsize: int = 64) -> None:
+        self._listings: LRUCache[str, tuple[int, DirectoryListing]] = LRUCache(
+            maxsize
+        )
+
+    def listing(self, directory: str) -> DirectoryListing | None:
+        """
+        Returns the listing of ``directory``, or of the current directory if
+        it's empty. Returns None if the directory can't be listed.
+        """
+
+        path = os.path.abspath(directory or os.curdir)
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self._listings.pop(path)
+            return None
+
+        listing = self.lookup(path, mtime)
+        if listing is not None:
+            return listing
+
+        try:
+            with os.scandir(path) as entries:
+                listing = DirectoryListing(_entry_items(entries))
+        except OSError:
+            return None
+
+        self.store(path, mtime, listing)
+        return listing
+
+    def lookup(self, path: str, mtime: int) -> DirectoryListing | None:
+        """
+        Returns the cached listing of the absolute ``path``, if it was listed
+        at the modification time ``mtime``.
+        """
+        cached = self._listings.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        return None
+
+    def store(self, path: str, mtime: int, listing: DirectoryListing) -> None:
+        self._listings.set(path, (mtime, listing))
+
+    def clear(self) -> None:
+        self._listings.clear()
+
+
+class DirectoryScan:
+    """
+    Lists a directory in a background thread, so that slow file systems
+    don't block the prompt.
+
+    Entries are collected in scandir order as they're produced, and
+    :meth:`stream` hands them over to the event loop. A completed listing is
+    stored in the directory cache, so completing in the same directory again
+    doesn't scan it again.
+
+    Parameters
+    ----------
+    path
+        Absolute path of the directory.
+    cache
+        Cache that provides and receives complete listings.
+    """
+
+    __slots__ = (
+        "path",
+        "entries",
+        "done",
+        "cancelled",
+        "_cache",
+        "_listeners",
+        "_lock",
+        "_thread",
+    )
+
+    #: Minimum time between two wake-ups of the consumers, in seconds.
+    notify_interval = 0.02
+
+    def __init__(self, path: str, cache: DirectoryCache) -> None:
+        self.path = path
+        self.entries: list[tuple[str, bool]] = []
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+        self._cache = cache
+        self._listeners: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="click-repl-scandir", daemon=True
+        )
+        self._thread.start()
+
+    def cancel(self) -> None:
+        """Stops the scan, unless it's already finished."""
+        self.cancelled.set()
+
+    def _notify(self) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            listener()
+
+    def _run(self) -> None:
+        try:
+            self._scan()
+        finally:
+            self.done.set()
+            self._notify()
+
+    def _scan(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+
+        listing = self._cache.lookup(self.path, mtime)
+        if listing is not None:
+            self.entries = list(zip(listing.names, listing.is_dir))
+            return
+
+        last_notify = time.monotonic()
+        try:
+            with os.scandir(self.path) as entries:
+                for item in _entry_items(entries):
+                    if self.cancelled.is_set():
+                        return
+
+                    self.entries.append(item)
+
+                    now = time.monotonic()
+                    if now - last_notify >= self.notify_interval:
+                        last_notify = now
+                        self._notify()
+        except OSError:
+            return
+
+        self._cache.store(self.path, mtime, DirectoryListing(self.entries))
+
+    async def stream(
+        self, deadline: float | None = None
+    ) -> AsyncGenerator[tuple[str, bool], None]:
+        """
+        Yields the entries of the directory as the scan produces them.
+
+        Stops when the scan is done, or after ``deadline`` seconds, in which
+        case :attr:`done` isn't set yet.
+        """
+
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        end = None if deadline is None else loop.time() + deadline
+
+        def listener() -> None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # The event loop is closed
+                pass
+
+        with self._lock:
+            self._listeners.append(listener)
+
+        try:
+            position = 0
+            while True:
+                wakeup.clear()
+                finished = self.done.is_set()
+
+                entries = self.entries
+                while position < len(entries):
+                    yield entries[position]
+                    position += 1
+
+                if finished:
+                    return
+
+                timeout = None if end is None else end - loop.time()
+                if timeout is not None and timeout <= 0:
+                    return
+
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._lock:
+                self._listeners.remove(listener)
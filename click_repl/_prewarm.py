@@ -0,0 +1,200 @@
+"""
+Background pre-warming of the completion structures of a ClickCompleter.
+"""
+
+from __future__ import annotations
+
+import threading
+import typing as t
+from collections import deque
+from time import perf_counter_ns
+
+import click
+
+from .utils import _resolve_leaf_context
+
+if t.TYPE_CHECKING:
+    from ._completer import ClickCompleter
+
+__all__ = ["Prewarmer"]
+
+
+class Prewarmer:
+    """
+    Walks the command tree of a :class:`~click_repl._completer.ClickCompleter`
+    in a daemon thread, while the user is still reading the first prompt.
+
+    Every visible command is loaded, which imports the modules of lazily
+    loaded commands, and the structures used to complete it are built: the
+    subcommand indexes of groups, the option tables of commands, the indexes
+    of their choices, and the resolved contexts of the command names, as long
+    as the context cache has room for them.
+
+    Thread safety: the completer's structures are only built or looked up
+    while holding its build lock, which the prompt thread takes too. The
+    lock is held for one step of the walk at a time (a group, or a command),
+    so a keystroke waits for at most one step rather than the whole walk.
+    Commands are loaded outside of it, since loading may import slow modules.
+    The walk stops between steps once cancelled.
+
+    Errors of the CLI's code are ignored, as completing would raise them
+    again where they can be reported.
+
+    Parameters
+    ----------
+    completer
+        The completer to warm up.
+    """
+
+    __slots__ = ("completer", "steps", "_thread", "_done", "_cancelled", "_duration")
+
+    def __init__(self, completer: ClickCompleter) -> None:
+        self.completer = completer
+
+        self.steps = 0
+        """Number of groups and commands warmed so far."""
+
+        self._thread: threading.Thread | None = None
+        self._done = threading.Event()
+        self._cancelled = threading.Event()
+        self._duration: int | None = None
+
+    @property
+    def done(self) -> bool:
+        """Whether the walk has finished, or stopped after being cancelled."""
+        return self._done.is_set()
+
+    @property
+    def duration(self) -> float | None:
+        """
+        Time to warm, in seconds, or :obj:`None` while the walk is running.
+
+        It's also recorded as the ``"prewarm"`` phase of the completer's
+        :attr:`~click_repl._completer.ClickCompleter.stats`, when enabled.
+        """
+        if self._duration is None:
+            return None
+
+        return self._duration / 1e9
+
+    def start(self) -> Prewarmer:
+        """Starts the walk, unless it has already been started."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="click-repl-prewarm", daemon=True
+            )
+            self._thread.start()
+
+        return self
+
+    def cancel(self) -> None:
+        """Stops the walk before its next step."""
+        self._cancelled.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Waits for the walk to finish, for at most ``timeout`` seconds.
+
+        Returns
+        -------
+        bool
+            Whether the walk has finished.
+        """
+        return self._done.wait(timeout)
+
+    def _run(self) -> None:
+        start = perf_counter_ns()
+        try:
+            self._walk()
+        finally:
+            self._duration = perf_counter_ns() - start
+            self.completer.stats.add("prewarm", self._duration)
+            self._done.set()
+
+    def _walk(self) -> None:
+        completer = self.completer
+        lock = completer._build_lock
+        cache = completer.context_cache
+
+        groups: deque[tuple[tuple[str, ...], click.Context]] = deque()
+        groups.append(((), completer.ctx))
+
+        while groups:
+            path, ctx = groups.popleft()
+            group = t.cast(click.MultiCommand, ctx.command)
+
+            if self._cancelled.is_set():
+                return
+
+            try:
+                with lock:
+                    if completer.use_command_index or completer.fuzzy:
+                        index = completer._get_command_index(group, ctx)
+                        if completer.fuzzy:
+                            # Builds the fuzzy index, without searching it
+                            index.fuzzy_search("", 0)
+
+                names = group.list_commands(ctx)
+            except Exception:
+                # Raised by the group's list_commands or get_command
+                continue
+            finally:
+                self.steps += 1
+
+            for name in names:
+                if self._cancelled.is_set():
+                    return
+
+                try:
+                    command = group.get_command(ctx, name)
+                except Exception:
+                    continue
+
+                if command is None or getattr(command, "hidden", False):
+                    continue
+
+                with lock:
+                    table = completer._get_option_table(command)
+                    if completer.fuzzy:
+                        table.fuzzy_search("", 0)
+
+                    # Beyond the room left in the cache, warming up more
+                    # contexts would evict the others.
+                    if cache is not None and len(cache) >= cache.maxsize:
+                        cache = None
+
+                    try:
+                        sub_ctx, _ = _resolve_leaf_context(
+                            list(path + (name,)), completer.ctx, cache=cache
+                        )
+                    except Exception:
+                        self.steps += 1
+                        continue
+
+                    if sub_ctx.command is command:
+                        try:
+                            self._warm_choices(command, sub_ctx)
+                        except Exception:
+                            # Raised by the normalization of a choice
+                            pass
+
+                self.steps += 1
+
+                if (
+                    sub_ctx.command is command
+                    and isinstance(command, click.MultiCommand)
+                    and not command.chain
+                ):
+                    groups.append((path + (name,), sub_ctx))
+
+    def _warm_choices(self, command: click.Command, ctx: click.Context) -> None:
+        completer = self.completer
+
+        for param in command.params:
+            param_type = param.type
+            if isinstance(param_type, click.Choice) and completer._can_index_choice(
+                param, param_type, ctx
+            ):
+                index = completer._get_choice_index(param_type, ctx)
+                if completer.fuzzy:
+                    index.fuzzy_search("", 0)
@@ -1,21 +1,21 @@
 from __future__ import annotations
 
+import os
 import sys
 from typing import Any, MutableMapping, cast
 
 import click
 from prompt_toolkit.history import InMemoryHistory
+from prompt_toolkit.key_binding import KeyBindingsBase, merge_key_bindings
 
+from ._batch import BATCH_HISTORY_SIZE, iter_commands, run_batch
 from ._completer import ClickCompleter
+from ._history_search import history_search_key_bindings
 from .core import ReplContext
 from .exceptions import ClickExit  # type: ignore[attr-defined]
 from .exceptions import CommandLineParserError, ExitReplException, InvalidGroupFormat
 from .globals_ import ISATTY, get_current_repl_ctx
-from .utils import (
-    _execute_internal_and_sys_cmds,
-    _get_protected_args,
-    _set_protected_args,
-)
+from .utils import _dispatch
 
 __all__ = ["bootstrap_prompt", "register_repl", "repl"]
 
@@ -24,12 +24,20 @@ def bootstrap_prompt(
     group: click.MultiCommand,
     prompt_kwargs: dict[str, Any],
     ctx: click.Context,
+    prewarm: bool = False,
+    history_search: bool = False,
 ) -> dict[str, Any]:
     """
     Bootstrap prompt_toolkit kwargs or use user defined values.
 
     :param group: click.MultiCommand object
     :param prompt_kwargs: The user specified prompt kwargs.
+    :param prewarm: Whether the completer, if it's a
+        :class:`~click_repl._completer.ClickCompleter`, starts building its
+        completion structures in a background thread.
+    :param history_search: Whether Ctrl-R searches the history, see
+        :func:`~click_repl._history_search.history_search_key_bindings`. The
+        user specified ``key_bindings`` take precedence over it.
     """
 
     defaults = {
@@ -39,6 +47,20 @@ def bootstrap_prompt(
     }
 
     defaults.update(prompt_kwargs)
+
+    if history_search:
+        key_bindings: KeyBindingsBase = history_search_key_bindings()
+        own_key_bindings = defaults.get("key_bindings", None)
+        if own_key_bindings is not None:
+            key_bindings = merge_key_bindings(
+                [key_bindings, cast(KeyBindingsBase, own_key_bindings)]
+            )
+        defaults["key_bindings"] = key_bindings
+
+    completer = defaults["completer"]
+    if prewarm and isinstance(completer, ClickCompleter):
+        completer.prewarm()
+
     return defaults
 
 
@@ -47,6 +69,12 @@ def repl(
     prompt_kwargs: dict[str, Any] = {},
     allow_system_commands: bool = True,
     allow_internal_commands: bool = True,
+    prewarm_completions: bool = False,
+    batch_mode: bool = False,
+    fail_fast: bool = False,
+    history_size: int | None = None,
+    history_file: str | os.PathLike[str] | None = None,
+    history_search: bool = False,
 ) -> None:
     """
     Start an interactive shell. All subcommands are available in it.
@@ -54,6 +82,25 @@ def repl(
     :param old_ctx: The current Click context.
     :param prompt_kwargs: Parameters passed to
         :py:func:`prompt_toolkit.PromptSession`.
+    :param prewarm_completions: Whether the subcommands are loaded and their
+        completion structures built in a background thread, while the first
+        prompt is shown. See :class:`~click_repl._prewarm.Prewarmer`.
+    :param batch_mode: Whether the commands are run in batch mode, when stdin
+        is not a TTY. Stdin is then read in chunks, blank lines and comments
+        starting with ``#`` are skipped, and the number of commands run per
+        second is reported on stderr at the end. The CLI exits with status 1
+        if any command failed.
+    :param fail_fast: Whether batch mode, and the scripts run with
+        ``:source``, stop at the first failed command, instead of continuing
+        with the next one.
+    :param history_size: Number of commands kept in memory in the history,
+        when stdin is not a TTY. If :obj:`None`, the default, it's unbounded,
+        except in batch mode, where it's ``BATCH_HISTORY_SIZE``.
+    :param history_file: File where the older commands of the history are
+        appended, when stdin is not a TTY. They're dropped if :obj:`None`.
+    :param history_search: Whether Ctrl-R lists the most recent commands of
+        the history containing the text of the prompt, instead of starting
+        prompt_toolkit's incremental search.
 
     If stdin is not a TTY, no prompt will be printed, but only commands read
     from stdin.
@@ -103,12 +150,50 @@ def repl(
 
     original_command = available_commands.pop(repl_command_name, None)  # type: ignore
 
+    # Without a prompt there's no idle time to warm up completions in
+    prompt_kwargs = bootstrap_prompt(
+        group,
+        prompt_kwargs,
+        group_ctx,
+        prewarm=prewarm_completions and ISATTY,
+        history_search=history_search,
+    )
+
+    batch_mode = batch_mode and not ISATTY
+    if batch_mode and history_size is None:
+        history_size = BATCH_HISTORY_SIZE
+
     repl_ctx = ReplContext(
         group_ctx,
-        bootstrap_prompt(group, prompt_kwargs, group_ctx),
+        prompt_kwargs,
         get_current_repl_ctx(silent=True),
+        history_size=history_size,
+        history_file=history_file,
+        allow_system_commands=allow_system_commands,
+        fail_fast=fail_fast,
     )
 
+    def dispatch(command: str) -> bool:
+        return _dispatch(
+            command, group, group_ctx, allow_internal_commands, allow_system_commands
+        )
+
+    if batch_mode:
+        try:
+            with repl_ctx:
+                report = run_batch(
+                    iter_commands(sys.stdin), dispatch, repl_ctx._history, fail_fast
+                )
+        finally:
+            if original_command is not None:
+                available_commands[repl_command_name] = original_command  # type: ignore
+
+        click.echo(str(report), err=True)
+        if report.failures:
+            raise ClickExit(1)
+
+        return
+
     if ISATTY:
         # If stdin is a TTY, prompt the user for input using PromptSession.
         def get_command() -> str:
@@ -118,55 +203,52 @@ def repl(
         # If stdin is not a TTY, read input from stdin directly.
         def get_command() -> str:
             inp = sys.stdin.readline().strip()
-            repl_ctx._history.append(inp)
+            if inp:
+                repl_ctx._history.append(inp)
             return inp
 
-    with repl_ctx:
-        while True:
-            try:
-                command = get_command()
-            except KeyboardInterrupt:
-                continue
-            except EOFError:
-                break
-
-            if not command:
-                if ISATTY:
+    try:
+        with repl_ctx:
+            while True:
+                try:
+                    command = get_command()
+                except KeyboardInterrupt:
                     continue
-                else:
+                except EOFError:
                     break
 
-            try:
-                args = _execute_internal_and_sys_cmds(
-                    command, allow_internal_commands, allow_system_commands
-                )
-                if args is None:
+                if not command:
+                    if ISATTY:
+                        continue
+                    else:
+                        break
+
+                try:
+                    dispatch(command)
+
+                except CommandLineParserError:
                     continue
 
-            except CommandLineParserError:
-                continue
+                except ExitReplException:
+                    break
 
-            except ExitReplException:
-                break
+    finally:
+        # Also when a command raised, so that worker threads don't outlive the
+        # REPL, and the indexes built in it are saved
+        completer = prompt_kwargs["completer"]
+        if isinstance(completer, ClickCompleter):
+            if completer._prewarmer is not None:
+                completer._prewarmer.cancel()
 
-            try:
-                # The group command will dispatch based on args.
-                old_protected_args = _get_protected_args(group_ctx)
-                try:
-                    _set_protected_args(group_ctx, args)
-                    group.invoke(group_ctx)
-                finally:
-                    _set_protected_args(group_ctx, old_protected_args)
-            except click.ClickException as e:
-                e.show()
-            except (ClickExit, SystemExit):
-                pass
-
-            except ExitReplException:
-                break
-
-    if original_command is not None:
-        available_commands[repl_command_name] = original_command  # type: ignore[index]
+            # Callbacks still running must not delay leaving the REPL
+            if completer._callback_runner is not None:
+                completer._callback_runner.shutdown()
+
+            # Lets the next REPL reuse the completion indexes built in this one
+            completer.save_index_cache()
+
+        if original_command is not None:
+            available_commands[repl_command_name] = original_command  # type: ignore
 
 
 def register_repl(group: click.Group, name="repl") -> None:
@@ -0,0 +1,287 @@
+"""
+On-disk snapshots of the completion indexes of a CLI, so that they aren't
+rebuilt every time the REPL starts while the CLI stays the same.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.metadata
+import marshal
+import os
+import sys
+import typing as t
+from typing import Any, Hashable, Union
+
+import click
+
+from ._index import ChoiceIndex, CommandIndex
+from .utils import _atomic_write
+
+__all__ = ["SNAPSHOT_VERSION", "IndexSnapshot", "cli_fingerprint"]
+
+#: Version of the snapshot format, bumped on incompatible changes.
+SNAPSHOT_VERSION = 3
+
+# Start of the first line of snapshot files, followed by the fingerprint
+_MAGIC = b"click-repl-index"
+
+# Names of the commands leading from the root group to an indexed command
+_CommandPath = t.Tuple[str, ...]
+_Index = Union[CommandIndex, ChoiceIndex]
+
+
+def _header(fingerprint: str) -> bytes:
+    return b"%s %d %s\n" % (_MAGIC, SNAPSHOT_VERSION, fingerprint.encode("ascii"))
+
+
+def _version(distribution: str) -> str | None:
+    try:
+        return importlib.metadata.version(distribution)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def _package_state(cli: click.Command) -> tuple[Any, ...]:
+    """Version of the package defining ``cli``, and the mtime of its module."""
+
+    module_name = getattr(cli.callback, "__module__", None) or type(cli).__module__
+    package = module_name.partition(".")[0]
+
+    version = getattr(sys.modules.get(package, None), "__version__", None)
+    if version is None:
+        version = _version(package)
+
+    mtime = None
+    path = getattr(sys.modules.get(module_name, None), "__file__", None)
+    if path is not None:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+
+    return package, version, mtime
+
+
+def _describe(
+    command: click.Command, name: str, ctx: click.Context
+) -> t.Iterator[tuple[Any, ...]]:
+    yield name, getattr(command, "hidden", False), command.short_help
+
+    for param in command.params:
+        param_type = param.type
+        yield (
+            type(param).__name__,
+            param.name,
+            tuple(param.opts),
+            tuple(param.secondary_opts),
+            param.nargs,
+            getattr(param, "hidden", False),
+            param_type.name,
+        )
+
+        if isinstance(param_type, click.Choice):
+            yield param_type.case_sensitive, tuple(map(str, param_type.choices))
+
+    if not isinstance(command, click.MultiCommand):
+        return
+
+    names = command.list_commands(ctx)
+    yield tuple(names)
+
+    # The commands of other multi commands might be loaded lazily, their
+    # changes are only noticed through the version of their package.
+    if (
+        isinstance(command, click.Group)
+        and type(command).list_commands is click.Group.list_commands
+    ):
+        for sub_name in names:
+            sub_command = command.commands[sub_name]
+            sub_ctx = click.Context(sub_command, info_name=sub_name, parent=ctx)
+            yield from _describe(sub_command, sub_name, sub_ctx)
+
+
+def cli_fingerprint(cli: click.MultiCommand, ctx: click.Context, *extra: Any) -> str:
+    """
+    Hash of what the completion indexes of ``cli`` are built from: the names,
+    help and parameters of its commands, and the versions of Python, click and
+    the package that defines ``cli``.
+
+    Only the commands that are already registered in a :class:`click.Group`
+    are described, so that computing it doesn't load any command.
+
+    Parameters
+    ----------
+    cli
+        The root group of the CLI.
+
+    ctx
+        The context of ``cli``.
+
+    extra
+        Other values the indexes depend on.
+    """
+
+    digest = hashlib.sha256()
+    header = (
+        SNAPSHOT_VERSION,
+        sys.version_info[:2],
+        _version("click"),
+        _package_state(cli),
+        extra,
+    )
+
+    for item in (header, *_describe(cli, ctx.info_name or "", ctx)):
+        digest.update(repr(item).encode("utf-8"))
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+class IndexSnapshot:
+    """
+    Completion indexes of a CLI, saved to ``path`` and restored from it as
+    long as the fingerprint of the CLI stays the same.
+
+    The file starts with a line of text holding the version of its format
+    and the fingerprint, so that a stale file is dismissed without reading
+    the rest. It's followed by the data of each index, serialized separately
+    with :mod:`marshal`, which reads values without running any code, unlike
+    :mod:`pickle`. Its format depends on the version of Python, which is part
+    of the fingerprint. Indexes are keyed by the names of the commands leading
+    to them, and their data is only read when they're first asked for.
+
+    Parameters
+    ----------
+    path
+        Location of the cache file.
+
+    fingerprint
+        Fingerprint of the CLI, see :func:`cli_fingerprint`.
+    """
+
+    __slots__ = ("path", "fingerprint", "_data", "_indexes", "_built")
+
+    def __init__(self, path: str | os.PathLike[str], fingerprint: str) -> None:
+        self.path = path
+        self.fingerprint = fingerprint
+        # Serialized data of the indexes, and whether it includes a fuzzy index
+        self._data: dict[Hashable, tuple[bytes, bool]] = {}
+        # Indexes of the running REPL, saved by the next call to save()
+        self._indexes: dict[Hashable, _Index] = {}
+        # Keys of the indexes built since the file was read
+        self._built: set[Hashable] = set()
+
+    def load(self) -> bool:
+        """
+        Reads the cache file.
+
+        Returns
+        -------
+        bool
+            Whether the file exists, and was written for the same fingerprint.
+        """
+
+        try:
+            with open(self.path, "rb") as f:
+                if f.readline() != _header(self.fingerprint):
+                    return False
+
+                data = marshal.load(f)
+        except Exception:
+            # Missing, unreadable, or written by an incompatible version
+            return False
+
+        if not isinstance(data, dict):
+            return False
+
+        self._data = data
+        return True
+
+    def _parse(self, key: Hashable) -> Any:
+        saved = self._data.get(key, None)
+        if saved is None:
+            return None
+
+        try:
+            return marshal.loads(saved[0])
+        except Exception:
+            return None
+
+    def command_index(
+        self, key: _CommandPath, group: click.MultiCommand, ctx: click.Context
+    ) -> CommandIndex | None:
+        """Restores the saved index of the subcommands of ``group``, if any."""
+        data = self._parse(("command", key))
+        if data is None:
+            return None
+
+        try:
+            index = CommandIndex.from_snapshot(group, ctx, data)
+        except Exception:
+            return None
+
+        self._indexes[("command", key)] = index
+        return index
+
+    def choice_index(
+        self, key: _CommandPath, name: str, param_type: click.Choice
+    ) -> ChoiceIndex | None:
+        """Restores the saved index of the choices of parameter ``name``, if any."""
+        data = self._parse(("choice", key, name))
+        if data is None:
+            return None
+
+        try:
+            index = ChoiceIndex.from_snapshot(param_type, data)
+        except Exception:
+            return None
+
+        self._indexes[("choice", key, name)] = index
+        return index
+
+    def add_command_index(self, key: _CommandPath, index: CommandIndex) -> None:
+        """Adds a newly built index of subcommands to the snapshot."""
+        self._indexes[("command", key)] = index
+        self._built.add(("command", key))
+
+    def add_choice_index(self, key: _CommandPath, name: str, index: ChoiceIndex) -> None:
+        """Adds a newly built index of choices to the snapshot."""
+        self._indexes[("choice", key, name)] = index
+        self._built.add(("choice", key, name))
+
+    def save(self) -> bool:
+        """
+        Writes the indexes to the cache file, unless none of them changed
+        since it was loaded.
+
+        Returns
+        -------
+        bool
+            Whether the file was written.
+        """
+
+        data = dict(self._data)
+        changed = False
+
+        for key, index in self._indexes.items():
+            saved = self._data.get(key, None)
+            # Fuzzy indexes are built on first use, after the index itself
+            has_fuzzy = index._fuzzy is not None
+            if key in self._built or saved is None or (has_fuzzy and not saved[1]):
+                changed = True
+                data[key] = (marshal.dumps(index.snapshot()), has_fuzzy)
+
+        if not changed:
+            return False
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        # A REPL starting meanwhile never reads a partial file
+        with _atomic_write(self.path) as f:
+            f.write(_header(self.fingerprint))
+            marshal.dump(data, f)
+
+        self._data = data
+        self._built.clear()
+        return True
@@ -0,0 +1,217 @@
+"""
+Timing of the phases of completion, for finding out where the time goes.
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+from time import perf_counter_ns
+from types import TracebackType
+from typing import ContextManager, Iterable, Iterator, NamedTuple, TypeVar
+
+__all__ = ["CompletionStats", "Histogram", "PhaseStats"]
+
+#: Phases of ClickCompleter.get_completions, in the order they're reported.
+#: The time of "callbacks" and "paths" is also part of "params".
+PHASES = (
+    "tokenize",
+    "resolve",
+    "params",
+    "callbacks",
+    "paths",
+    "subcommands",
+    "total",
+    "prewarm",
+)
+
+# Upper bounds of the histogram buckets, in nanoseconds: 1µs, 2µs, 4µs, ..., ~8.6s
+_BUCKET_BOUNDS = tuple(1000 << i for i in range(24))
+
+_NULL_TIMER: ContextManager[None] = nullcontext()
+
+T = TypeVar("T")
+
+
+class PhaseStats(NamedTuple):
+    """Summary of the durations of a phase, in seconds."""
+
+    samples: int
+    total: float
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+
+class Histogram:
+    """
+    Durations counted in buckets of exponentially growing size.
+
+    Percentiles are estimated as the upper bound of the bucket they fall in,
+    so they're accurate within a factor of two.
+    """
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * (len(_BUCKET_BOUNDS) + 1)
+
+    def add(self, duration: int) -> None:
+        """Adds a duration, in nanoseconds."""
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.buckets[bisect_left(_BUCKET_BOUNDS, duration)] += 1
+
+    def percentile(self, fraction: float) -> int:
+        """Estimated duration below which ``fraction`` of the durations are."""
+        if not self.count:
+            return 0
+
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                if index == len(_BUCKET_BOUNDS):
+                    return self.max
+                return min(_BUCKET_BOUNDS[index], self.max)
+
+        return self.max
+
+    def summary(self) -> PhaseStats:
+        return PhaseStats(
+            self.count,
+            self.total / 1e9,
+            self.total / self.count / 1e9 if self.count else 0.0,
+            self.percentile(0.5) / 1e9,
+            self.percentile(0.9) / 1e9,
+            self.percentile(0.99) / 1e9,
+            self.max / 1e9,
+        )
+
+
+class _Timer:
+    __slots__ = ("stats", "phase", "start")
+
+    def __init__(self, stats: CompletionStats, phase: str) -> None:
+        self.stats = stats
+        self.phase = phase
+        self.start = 0
+
+    def __enter__(self) -> None:
+        self.start = perf_counter_ns()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.stats.add(self.phase, perf_counter_ns() - self.start)
+
+
+class CompletionStats:
+    """
+    Histograms of the time spent in each phase of completion.
+
+    While disabled, :meth:`timer` returns a shared no-op context manager, so
+    that the instrumentation costs next to nothing.
+
+    Parameters
+    ----------
+    enabled
+        Whether the durations are recorded.
+    """
+
+    __slots__ = ("enabled", "_histograms", "_lock")
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._histograms: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def timer(self, phase: str) -> ContextManager[None]:
+        """Returns a context manager that records the duration of its block."""
+        if not self.enabled:
+            return _NULL_TIMER
+
+        return _Timer(self, phase)
+
+    def timed(self, phase: str, iterable: Iterable[T]) -> Iterator[T]:
+        """
+        Iterates over ``iterable``, recording the time spent producing its
+        items as a single duration of ``phase``, once it's exhausted or closed.
+        The time the consumer spends between items isn't part of it.
+        """
+        if not self.enabled:
+            return iter(iterable)
+
+        return self._timed(phase, iter(iterable))
+
+    def _timed(self, phase: str, iterator: Iterator[T]) -> Iterator[T]:
+        duration = 0
+        try:
+            while True:
+                start = perf_counter_ns()
+                try:
+                    item = next(iterator)
+                finally:
+                    duration += perf_counter_ns() - start
+
+                yield item
+        except StopIteration:
+            return
+        finally:
+            self.add(phase, duration)
+
+    def add(self, phase: str, duration: int) -> None:
+        """Records a duration of ``phase``, in nanoseconds."""
+        with self._lock:
+            histogram = self._histograms.get(phase, None)
+            if histogram is None:
+                histogram = self._histograms[phase] = Histogram()
+
+            histogram.add(duration)
+
+    def reset(self) -> None:
+        """Discards all the recorded durations."""
+        with self._lock:
+            self._histograms.clear()
+
+    def summary(self) -> dict[str, PhaseStats]:
+        """Returns the summary of every phase that has recorded durations."""
+        with self._lock:
+            histograms = dict(self._histograms)
+
+        order = {phase: index for index, phase in enumerate(PHASES)}
+        return {
+            phase: histograms[phase].summary()
+            for phase in sorted(histograms, key=lambda p: order.get(p, len(order)))
+        }
+
+    def format(self) -> str:
+        """Returns the summary as a table, with durations in milliseconds."""
+        summary = self.summary()
+        if not summary:
+            return "No completion statistics recorded"
+
+        lines = [
+            f"{'phase':<12}{'count':>8}{'mean':>10}{'p50':>10}"
+            f"{'p90':>10}{'p99':>10}{'max':>10}"
+        ]
+        for phase, s in summary.items():
+            lines.append(
+                f"{phase:<12}{s.samples:>8}{s.mean * 1e3:>10.3f}{s.p50 * 1e3:>10.3f}"
+                f"{s.p90 * 1e3:>10.3f}{s.p99 * 1e3:>10.3f}{s.max * 1e3:>10.3f}"
+            )
+
+        lines.append("(durations in milliseconds)")
+        return "\n".join(lines)
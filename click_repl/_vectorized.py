@@ -0,0 +1,123 @@
+"""
+Optional NumPy backend for filtering large sets of completion candidates.
+
+NumPy is not a dependency of click-repl. Without it, candidates are filtered
+in pure Python, with the same results.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+__all__ = [
+    "CandidateArray",
+    "FIXED_WIDTH_BUDGET",
+    "HAS_NUMPY",
+    "VECTORIZE_THRESHOLD",
+    "match_candidates",
+]
+
+HAS_NUMPY = np is not None
+
+#: Number of candidates from which filtering is vectorized, if NumPy is installed.
+VECTORIZE_THRESHOLD = 50_000
+
+#: Maximum size in bytes of a fixed-width array of candidates. Every candidate
+#: takes as much room as the longest one in such an array.
+FIXED_WIDTH_BUDGET = 256 << 20
+
+# Variable-width strings, available from NumPy 2.0
+_StringDType = getattr(getattr(np, "dtypes", None), "StringDType", None)
+
+
+class CandidateArray:
+    """
+    Candidate strings stored in a NumPy array, so that prefix and substring
+    matches are computed in a single vectorized pass.
+
+    The array is fixed-width, which is the fastest to match, unless it would
+    take more than :data:`FIXED_WIDTH_BUDGET` bytes because of a few long
+    candidates. NumPy's variable-width strings are used then, if available.
+
+    Parameters
+    ----------
+    values
+        The candidate strings.
+
+    Raises
+    ------
+    MemoryError
+        If the candidates don't fit in memory, in either form.
+    """
+
+    __slots__ = ("_array",)
+
+    def __init__(self, values: Sequence[str] | Any) -> None:
+        if np is None:
+            raise RuntimeError("CandidateArray requires NumPy")
+
+        if isinstance(values, np.ndarray):
+            self._array = values
+            return
+
+        width = max(map(len, values), default=0)
+        # NumPy stores unicode characters as UCS-4
+        if width * len(values) * 4 <= FIXED_WIDTH_BUDGET:
+            self._array = np.array(values, dtype=f"<U{max(width, 1)}")
+
+        elif _StringDType is not None:
+            self._array = np.array(values, dtype=_StringDType())
+
+        else:
+            raise MemoryError(
+                f"{len(values)} candidates of up to {width} characters exceed "
+                "the fixed-width array budget"
+            )
+
+    def __len__(self) -> int:
+        return len(self._array)
+
+    def match(self, text: str, substring: bool = False) -> list[int]:
+        """Returns the indices of the candidates that start with, or contain ``text``."""
+        strings = getattr(np, "strings", np.char)
+
+        if substring:
+            mask = strings.find(self._array, text) >= 0
+        else:
+            mask = strings.startswith(self._array, text)
+
+        return list(np.flatnonzero(mask).tolist())
+
+    def take(self, indices: list[int]) -> CandidateArray:
+        """Returns the candidates at ``indices``, as another array."""
+        return CandidateArray(self._array[indices])
+
+
+def match_candidates(
+    values: Sequence[str],
+    text: str,
+    substring: bool = False,
+    threshold: int | None = VECTORIZE_THRESHOLD,
+) -> list[int]:
+    """
+    Returns the indices of the ``values`` that start with, or contain ``text``.
+
+    The matching is vectorized with NumPy if it's installed and there are at
+    least ``threshold`` values. :obj:`None` disables vectorization.
+    """
+
+    if HAS_NUMPY and threshold is not None and len(values) >= threshold:
+        try:
+            return CandidateArray(values).match(text, substring)
+        except MemoryError:
+            pass
+
+    if substring:
+        return [i for i, value in enumerate(values) if text in value]
+
+    return [i for i, value in enumerate(values) if value.startswith(text)]
@@ -0,0 +1,256 @@
+"""
+Worker pool for running user-provided completion callbacks off the prompt thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import typing as t
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Coroutine, Hashable, Iterable, TypeVar
+
+__all__ = ["CallbackRunner", "run_coroutine"]
+
+T = TypeVar("T")
+
+
+class _DaemonPool:
+    """
+    Minimal thread pool running functions in daemon threads.
+
+    Threads of :class:`~concurrent.futures.ThreadPoolExecutor` are joined when
+    the interpreter exits, even after a shutdown, so a callback that hangs
+    would keep the process alive after leaving the REPL.
+    """
+
+    __slots__ = ("max_workers", "_queue", "_threads", "_idle", "_lock", "_shutdown")
+
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self._queue: queue.SimpleQueue[
+            tuple[Future[None], Callable[[], None]] | None
+        ] = queue.SimpleQueue()
+        self._threads: list[threading.Thread] = []
+        # Released by each thread waiting for work
+        self._idle = threading.Semaphore(0)
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn: Callable[[], None]) -> Future[None]:
+        future: Future[None] = Future()
+
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new callbacks after shutdown")
+
+            self._queue.put((future, fn))
+
+            if (
+                not self._idle.acquire(blocking=False)
+                and len(self._threads) < self.max_workers
+            ):
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f"click-repl-completion-{len(self._threads)}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+        return future
+
+    def _work(self) -> None:
+        while True:
+            work = self._queue.get()
+            if work is None:
+                return
+
+            future, fn = work
+            if future.set_running_or_notify_cancel():
+                try:
+                    fn()
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(None)
+
+            self._idle.release()
+
+    def shutdown(self) -> None:
+        """Cancels the queued functions, and stops the threads once idle."""
+        with self._lock:
+            self._shutdown = True
+
+            while True:
+                try:
+                    work = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if work is not None:
+                    work[0].cancel()
+
+            for _ in self._threads:
+                self._queue.put(None)
+
+
+class _CallbackJob:
+    __slots__ = ("callback", "items", "cancelled", "future", "generation")
+
+    def __init__(self, callback: Callable[[], Iterable[Any]], generation: int) -> None:
+        self.callback = callback
+        self.items: list[Any] = []
+        self.cancelled = threading.Event()
+        self.future: Future[None] | None = None
+        self.generation = generation
+
+    def run(self) -> None:
+        if self.cancelled.is_set():
+            return
+
+        # Collect the items one by one, so that a timed out request can still
+        # show what has been produced so far.
+        for item in self.callback():
+            if self.cancelled.is_set():
+                return
+            self.items.append(item)
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class CallbackRunner:
+    """
+    Runs completion callbacks in a pool of daemon threads, and waits for them
+    only up to a timeout.
+
+    Requests are identified by a key. Asking again for a key that is still
+    running (or already finished) reuses that request, so pressing Tab again
+    shows the results of a slow callback once they're available. Requests that
+    weren't asked for in the latest round of completions are cancelled: they
+    won't start if they're still queued, and stop collecting items otherwise.
+
+    Parameters
+    ----------
+    max_workers
+        Number of threads that run callbacks concurrently.
+    """
+
+    __slots__ = ("max_workers", "_executor", "_jobs", "_generation", "_lock")
+
+    def __init__(self, max_workers: int = 4) -> None:
+        self.max_workers = max_workers
+        self._executor: _DaemonPool | None = None
+        self._jobs: dict[Hashable, _CallbackJob] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def start_round(self) -> int:
+        """
+        Marks the beginning of a new round of completions (a keystroke).
+
+        Returns
+        -------
+        int
+            Identifier of the round, to be passed to :meth:`finish_round`.
+        """
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    def finish_round(self, generation: int | None = None) -> None:
+        """
+        Cancels the requests that were not asked for in the current round.
+
+        Nothing is cancelled if ``generation``, as returned by
+        :meth:`start_round`, is no longer the current round: the round that
+        started since then is still asking for its requests.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            for key, job in list(self._jobs.items()):
+                if job.generation != self._generation:
+                    job.cancel()
+                    del self._jobs[key]
+
+    def run(
+        self,
+        key: Hashable,
+        callback: Callable[[], Iterable[Any]],
+        timeout: float,
+    ) -> tuple[list[Any], bool]:
+        """
+        Runs ``callback`` in the pool, unless a request for ``key`` exists,
+        and waits for it to finish for at most ``timeout`` seconds.
+
+        Returns
+        -------
+        tuple[list[Any], bool]
+            The items produced so far, and whether the callback has finished.
+
+        Raises
+        ------
+        Exception
+            Any exception raised by the callback.
+        """
+
+        with self._lock:
+            job = self._jobs.get(key, None)
+
+            if job is None or job.cancelled.is_set():
+                if self._executor is None:
+                    self._executor = _DaemonPool(self.max_workers)
+
+                job = _CallbackJob(callback, self._generation)
+                job.future = self._executor.submit(job.run)
+                self._jobs[key] = job
+
+            job.generation = self._generation
+
+        future = t.cast("Future[None]", job.future)
+
+        try:
+            future.result(timeout)
+        except FutureTimeoutError:
+            return list(job.items), False
+        except BaseException:
+            with self._lock:
+                if self._jobs.get(key, None) is job:
+                    del self._jobs[key]
+            raise
+
+        return job.items, True
+
+    def shutdown(self) -> None:
+        """Cancels all requests, and stops the worker threads."""
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+
+            self._jobs.clear()
+
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+def run_coroutine(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Runs ``coroutine`` to completion from synchronous code, in a thread of its
+    own if an event loop is already running in the current one.
+    """
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    with ThreadPoolExecutor(1, thread_name_prefix="click-repl-completion") as executor:
+        return executor.submit(asyncio.run, coroutine).result()
@@ -4,6 +4,7 @@ Core functionalities for managing context of the click_repl app.
 
 from __future__ import annotations
 
+import os
 from functools import wraps
 from typing import TYPE_CHECKING, Any, Callable, Dict, Generator, TypeVar
 
@@ -12,6 +13,10 @@ from prompt_toolkit import PromptSession
 from typing_extensions import Concatenate, Final, ParamSpec, TypeAlias, TypedDict
 
 from ._ctx_stack import _pop_context, _push_context
+from ._file_history import MappedFileHistory
+from ._history import RingHistory
+from ._history_search import search_entries, search_history
+from ._stats import CompletionStats
 from .globals_ import ISATTY, get_current_repl_ctx
 
 if TYPE_CHECKING:
@@ -34,7 +39,7 @@ class ReplContextInfoDict(TypedDict):
     prompt_kwargs: dict[str, Any]
     session: _PromptSession | None
     parent: ReplContext | None
-    _history: list[str]
+    _history: RingHistory
 
 
 class ReplContext:
@@ -61,6 +66,22 @@ class ReplContext:
 
     parent
         REPL Context object of the parent REPL session, if exists. Otherwise, :obj:`None`.
+
+    history_size
+        Number of commands kept in memory in the history when
+        :func:`~sys.stdin.isatty` is :obj:`False`. Unbounded if :obj:`None`.
+
+    history_file
+        File where the commands evicted from the history in memory are
+        appended. They're dropped if :obj:`None`.
+
+    allow_system_commands
+        Whether commands starting with ``!`` are run by the shell, including
+        in the scripts run with ``:source``.
+
+    fail_fast
+        Whether the scripts run with ``:source`` stop at their first failed
+        command.
     """
 
     __slots__ = (
@@ -68,6 +89,8 @@ class ReplContext:
         "prompt_kwargs",
         "parent",
         "session",
+        "allow_system_commands",
+        "fail_fast",
         "_history",
     )
 
@@ -76,6 +99,10 @@ class ReplContext:
         group_ctx: Context,
         prompt_kwargs: dict[str, Any] = {},
         parent: ReplContext | None = None,
+        history_size: int | None = None,
+        history_file: str | os.PathLike[str] | None = None,
+        allow_system_commands: bool = True,
+        fail_fast: bool = False,
     ) -> None:
         """
         Initializes the `ReplContext` class.
@@ -94,9 +121,10 @@ class ReplContext:
         self.session = session
         """Object that's responsible for managing and executing the REPL."""
 
-        self._history: list[str] = []
+        self._history = RingHistory(history_size, history_file)
         """
-        History of past executed commands.
+        History of past executed commands. Once it holds ``history_size`` of
+        them, the oldest ones are moved to ``history_file``, or dropped.
 
         Used only when :func:`~sys.stdin.isatty` is :obj:`False`.
         """
@@ -113,12 +141,24 @@ class ReplContext:
         Otherwise, :obj:`None`.
         """
 
+        self.allow_system_commands = allow_system_commands
+        """Whether commands starting with ``!`` are run by the shell."""
+
+        self.fail_fast = fail_fast
+        """Whether the scripts run with ``:source`` stop at their first failure."""
+
     def __enter__(self) -> ReplContext:
         _push_context(self)
         return self
 
     def __exit__(self, *_: Any) -> None:
         _pop_context()
+        self._history.close()
+
+        if self.session is not None and isinstance(
+            self.session.history, MappedFileHistory
+        ):
+            self.session.history.save_search_index()
 
     @property
     def prompt(self) -> AnyFormattedText:
@@ -140,6 +180,31 @@ class ReplContext:
         if ISATTY and self.session is not None:
             self.session.message = value
 
+    @property
+    def completion_stats(self) -> CompletionStats | None:
+        """
+        Timing statistics of the phases of completion in this REPL.
+
+        Recording is switched on and off through the
+        :attr:`~click_repl._stats.CompletionStats.enabled` attribute of the
+        returned object, and is off by default.
+
+        Returns
+        -------
+        click_repl._stats.CompletionStats | None
+            The statistics of the REPL's completer, or :obj:`None` if the
+            completer is not a :class:`~click_repl._completer.ClickCompleter`.
+        """
+        if ISATTY and self.session is not None:
+            completer = self.session.completer
+        else:
+            completer = self.prompt_kwargs.get("completer", None)
+
+        stats = getattr(completer, "stats", None)
+        if isinstance(stats, CompletionStats):
+            return stats
+        return None
+
     def to_info_dict(self) -> ReplContextInfoDict:
         """
         Provides a dictionary with minimal info about the current REPL.
@@ -185,7 +250,34 @@ class ReplContext:
             yield from self.session.history.load_history_strings()
 
         else:
-            yield from reversed(self._history)
+            yield from self._history.recent()
+
+    def search_history(self, pattern: str, limit: int = 10) -> list[str]:
+        """
+        Finds the past executed commands containing ``pattern``, ignoring
+        the case.
+
+        With a :class:`~click_repl._file_history.MappedFileHistory`, they're
+        looked up in its index, instead of scanning :meth:`history`.
+
+        Parameters
+        ----------
+        pattern
+            Text searched in the commands.
+
+        limit
+            Maximum number of returned commands.
+
+        Returns
+        -------
+        list[str]
+            The distinct matching commands, from the most recent one.
+        """
+
+        if ISATTY and self.session is not None:
+            return search_history(self.session.history, pattern, limit)
+
+        return search_entries(self._history.recent(), pattern, limit)
 
 
 def pass_context(
@@ -2,26 +2,55 @@ from __future__ import annotations
 
 import os
 import shlex
+import tempfile
 import typing as t
+from bisect import bisect_right
 from collections import defaultdict
+from contextlib import contextmanager
 from typing import Callable, Generator, Iterator, NoReturn, Sequence
 
 import click
 from typing_extensions import TypeAlias
 
+from ._cache import ContextCache
+from .exceptions import ClickExit  # type: ignore[attr-defined]
 from .exceptions import CommandLineParserError, ExitReplException
+from .globals_ import get_current_repl_ctx
+
+
+# Handle backwards compatibility between Click<=7.0 and >=8.0
+try:
+    import click.shell_completion
+
+    HAS_CLICK_V8 = True
+    AUTO_COMPLETION_PARAM = "shell_complete"
+except (ImportError, ModuleNotFoundError):
+    import click._bashcomplete  # type: ignore[import]
+
+    HAS_CLICK_V8 = False
+    AUTO_COMPLETION_PARAM = "autocompletion"
+
+
+#: Number of commands listed by the ``:history`` internal command.
+HISTORY_LISTED = 20
 
 T = t.TypeVar("T")
-InternalCommandCallback: TypeAlias = Callable[[], None]
+InternalCommandCallback: TypeAlias = Callable[..., None]
 
 
 __all__ = [
+    "AUTO_COMPLETION_PARAM",
+    "HAS_CLICK_V8",
+    "HISTORY_LISTED",
+    "_atomic_write",
+    "_dispatch",
     "_execute_internal_and_sys_cmds",
     "_exit_internal",
     "_get_registered_target",
     "_help_internal",
     "_resolve_context",
     "_register_internal_command",
+    "IncrementalTokenizer",
     "dispatch_repl_commands",
     "handle_internal_commands",
     "split_arg_string",
@@ -43,15 +72,45 @@ def _set_protected_args(ctx: click.Context, args: list[str]) -> None:
         ctx.protected_args = args
 
 
-def _resolve_context(args: list[str], ctx: click.Context) -> click.Context:
+def _resolve_context(
+    args: list[str], ctx: click.Context, cache: ContextCache | None = None
+) -> click.Context:
     """Produce the context hierarchy starting with the command and
     traversing the complete arguments. This only follows the commands,
     it doesn't trigger input prompts or callbacks.
 
     :param args: List of complete args before the incomplete value.
     :param cli_ctx: `click.Context` object of the CLI group
+    :param cache: Cache of previously resolved contexts of `cli_ctx`. Lookups
+        resume from the deepest cached group context whose tokens prefix `args`.
+    """
+
+    return _resolve_leaf_context(args, ctx, cache)[0]
+
+
+def _resolve_leaf_context(
+    args: list[str], ctx: click.Context, cache: ContextCache | None = None
+) -> tuple[click.Context, int]:
+    """Same as :func:`_resolve_context`, but also returns the index of the
+    first token in `args` that was passed to the resolved context's command.
     """
 
+    total = len(args)
+    offset = 0
+    key: tuple[str, ...] = ()
+
+    if cache is not None and args:
+        key = tuple(args)
+        resolved = cache.get_resolved(key)
+        if resolved is not None:
+            return resolved
+
+        ancestor = cache.get_ancestor(key)
+        if ancestor is not None:
+            # Resume at the subcommand name that ends the prefix
+            length, (ctx, offset) = ancestor
+            args = args[length - 1 :]
+
     while args:
         command = ctx.command
 
@@ -60,17 +119,28 @@ def _resolve_context(args: list[str], ctx: click.Context) -> click.Context:
                 name, cmd, args = command.resolve_command(ctx, args)
 
                 if cmd is None:
-                    return ctx
+                    return ctx, offset
 
+                offset = total - len(args)
                 ctx = cmd.make_context(name, args, parent=ctx, resilient_parsing=True)
                 args = _get_protected_args(ctx) + ctx.args
+
+                # A group that stopped parsing at a subcommand name is fully
+                # determined by the tokens up to and including that name.
+                consumed = total - len(args)
+                if key and args and key[consumed:] == tuple(args):
+                    if isinstance(ctx.command, click.MultiCommand):
+                        t.cast(ContextCache, cache).set_ancestor(
+                            key[: consumed + 1], (ctx, offset)
+                        )
             else:
                 while args:
                     name, cmd, args = command.resolve_command(ctx, args)
 
                     if cmd is None:
-                        return ctx
+                        return ctx, offset
 
+                    offset = total - len(args)
                     sub_ctx = cmd.make_context(
                         name,
                         args,
@@ -86,10 +156,35 @@ def _resolve_context(args: list[str], ctx: click.Context) -> click.Context:
         else:
             break
 
-    return ctx
+    if key:
+        t.cast(ContextCache, cache).set_resolved(key, (ctx, offset))
+
+    return ctx, offset
+
+
+@contextmanager
+def _atomic_write(path: str | os.PathLike[str]) -> Iterator[t.BinaryIO]:
+    """
+    Opens a temporary file, in binary mode, that replaces ``path`` once it's
+    written, so that readers never see a partial file.
+
+    The temporary file is created next to ``path``, for the move to be
+    atomic, and deleted if writing it fails.
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
 
 
-_internal_commands: dict[str, tuple[InternalCommandCallback, str | None]] = {}
+# Callback, description, and whether the callback takes the rest of the line
+_internal_commands: dict[str, tuple[InternalCommandCallback, str | None, bool]] = {}
 
 
 def split_arg_string(string: str, posix: bool = True) -> list[str]:
@@ -121,10 +216,102 @@ def split_arg_string(string: str, posix: bool = True) -> list[str]:
     return out
 
 
+def _terminated_token_end(lex: shlex.shlex) -> int | None:
+    """Position in the input of ``lex`` where the token it just returned ends,
+    if whatever gets appended to the input can't change that token anymore.
+
+    :class:`shlex.shlex` has no public API for this, so it relies on two of
+    its private attributes: ``state`` only goes back to the whitespace state
+    once a token is complete, and ``instream`` is the
+    :class:`~io.StringIO` the string is read from.
+    """
+    if lex.state != " ":  # type: ignore[attr-defined]
+        return None
+    return lex.instream.tell()  # type: ignore[attr-defined, no-any-return]
+
+
+def _lex_arg_string(
+    string: str, posix: bool, offset: int = 0
+) -> tuple[list[str], list[int]]:
+    """Tokenize ``string`` like :func:`split_arg_string`, and report where each
+    terminated token ends.
+
+    :param offset: Position of ``string`` within the whole command line.
+    :return: The tokens, and the end positions (relative to the whole line)
+        of the terminated tokens.
+    """
+
+    lex = shlex.shlex(string, posix=posix)
+    lex.whitespace_split = True
+    lex.commenters = ""
+    tokens: list[str] = []
+    ends: list[int] = []
+
+    try:
+        for token in lex:
+            tokens.append(token)
+            end = _terminated_token_end(lex)
+            if end is not None:
+                ends.append(offset + end)
+    except ValueError:
+        tokens.append(lex.token)
+
+    return tokens, ends
+
+
+class IncrementalTokenizer:
+    """Splits successive versions of a command line like
+    :func:`split_arg_string`, but only re-lexes the part that changed.
+
+    Tokens that were terminated (followed by whitespace or a closing quote)
+    within the unchanged prefix of the line are reused. When text is only
+    appended or removed at the end of the line, lexing restarts from the last
+    stable token. Arbitrary edits fall back to lexing the whole line.
+
+    :param posix: Passed on to :class:`shlex.shlex`.
+    """
+
+    __slots__ = ("posix", "_text", "_tokens", "_ends")
+
+    def __init__(self, posix: bool = True) -> None:
+        self.posix = posix
+        self._text = ""
+        self._tokens: list[str] = []
+        # End positions of the terminated tokens, these always are the
+        # leading tokens of self._tokens.
+        self._ends: list[int] = []
+
+    def split(self, string: str) -> list[str]:
+        old_text = self._text
+
+        if string.startswith(old_text):
+            stable = len(old_text)
+        elif old_text.startswith(string):
+            stable = len(string)
+        else:
+            stable = 0
+
+        keep = bisect_right(self._ends, stable)
+        start = self._ends[keep - 1] if keep else 0
+
+        tokens, ends = _lex_arg_string(string[start:], self.posix, start)
+
+        self._text = string
+        self._tokens = self._tokens[:keep] + tokens
+        self._ends = self._ends[:keep] + ends
+        return list(self._tokens)
+
+    def reset(self) -> None:
+        self._text = ""
+        self._tokens = []
+        self._ends = []
+
+
 def _register_internal_command(
     names: str | Sequence[str] | Generator[str, None, None] | Iterator[str],
     target: InternalCommandCallback,
     description: str | None = None,
+    takes_argument: bool = False,
 ) -> None:
     if not hasattr(target, "__call__"):
         raise ValueError("Internal command must be a callable")
@@ -140,7 +327,7 @@ def _register_internal_command(
         )
 
     for name in names:
-        _internal_commands[name] = (target, description)
+        _internal_commands[name] = (target, description, takes_argument)
 
 
 def _get_registered_target(
@@ -182,10 +369,53 @@ def _help_internal() -> None:
     print(formatter.getvalue())
 
 
+def _stats_internal() -> None:
+    repl_ctx = get_current_repl_ctx(silent=True)
+    stats = repl_ctx.completion_stats if repl_ctx is not None else None
+
+    if stats is None:
+        print("No completion statistics available")
+        return
+
+    if not stats.enabled:
+        print("Recording of completion statistics is disabled")
+
+    print(stats.format())
+
+
+def _history_internal(pattern: str) -> None:
+    repl_ctx = get_current_repl_ctx(silent=True)
+    if repl_ctx is None:
+        print("No history available")
+        return
+
+    # Searches themselves are part of the history, and are left out of the
+    # listed commands. More matches are asked for until enough remain.
+    limit = HISTORY_LISTED
+    while True:
+        matches = repl_ctx.search_history(pattern, limit)
+        commands = [match for match in matches if not match.startswith(":history")]
+        if len(commands) >= HISTORY_LISTED or len(matches) < limit:
+            break
+        limit *= 2
+
+    for command in commands[:HISTORY_LISTED]:
+        print(command)
+
+
 _register_internal_command(["q", "quit", "exit"], _exit_internal, "exits the repl")
 _register_internal_command(
     ["?", "h", "help"], _help_internal, "displays general help information"
 )
+_register_internal_command(
+    "stats", _stats_internal, "displays completion timing statistics"
+)
+_register_internal_command(
+    "history",
+    _history_internal,
+    "lists the past commands containing a pattern",
+    takes_argument=True,
+)
 
 
 def _execute_internal_and_sys_cmds(
@@ -209,6 +439,48 @@ def _execute_internal_and_sys_cmds(
         raise CommandLineParserError("{}".format(e))
 
 
+def _dispatch(
+    command: str,
+    group: click.MultiCommand,
+    group_ctx: click.Context,
+    allow_internal_commands: bool,
+    allow_system_commands: bool,
+) -> bool:
+    """
+    Runs a line of input of the REPL, and tells whether it succeeded.
+
+    Internal commands fail by raising a :class:`~click.ClickException`,
+    shown like the errors of the group's commands.
+
+    :raises CommandLineParserError: If the line can't be parsed.
+    :raises ExitReplException: If the REPL should stop.
+    """
+
+    try:
+        args = _execute_internal_and_sys_cmds(
+            command, allow_internal_commands, allow_system_commands
+        )
+        if args is None:
+            return True
+
+        # The group command will dispatch based on args.
+        old_protected_args = _get_protected_args(group_ctx)
+        try:
+            _set_protected_args(group_ctx, args)
+            group.invoke(group_ctx)
+        finally:
+            _set_protected_args(group_ctx, old_protected_args)
+    except click.ClickException as e:
+        e.show()
+        return False
+    except ClickExit as e:
+        return not getattr(e, "exit_code", 0)
+    except SystemExit as e:
+        return not e.code
+
+    return True
+
+
 def exit() -> NoReturn:
     """Exit the repl"""
     _exit_internal()
@@ -231,8 +503,16 @@ def handle_internal_commands(command: str) -> None:
     """
     Run repl-internal commands.
 
-    Repl-internal commands are all commands starting with ":".
+    Repl-internal commands are all commands starting with ":". Those that
+    take an argument receive the rest of the line, after their name.
     """
-    target = _get_registered_target(command[1:], default=None)
-    if target:
+    name, _, argument = command[1:].partition(" ")
+    target_info = _internal_commands.get(name, None)
+    if target_info is None:
+        return
+
+    target, _, takes_argument = target_info
+    if takes_argument:
+        target(argument.strip())
+    elif not argument:
         target()
@@ -0,0 +1,126 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+import click
+import pytest
+
+import click_repl
+from click_repl._batch import BatchReport, iter_commands
+from tests import mock_stdin
+
+
+def make_cli(**repl_kwargs):
+    @click.group(invoke_without_command=True)
+    @click.pass_context
+    def cli(ctx):
+        if ctx.invoked_subcommand is None:
+            click_repl.repl(ctx, batch_mode=True, **repl_kwargs)
+
+    @cli.command()
+    @click.argument("name")
+    def hello(name):
+        print(f"Hello {name}!")
+
+    @cli.command()
+    def fail():
+        raise click.ClickException("failed")
+
+    @cli.command()
+    def crash():
+        raise RuntimeError("crashed")
+
+    @cli.command()
+    @click.pass_context
+    def stop(ctx):
+        ctx.exit(3)
+
+    @cli.command()
+    @click_repl.pass_context
+    def history(repl_ctx):
+        print(list(repl_ctx.history()))
+
+    return cli
+
+
+def run(stdin, **repl_kwargs):
+    with mock_stdin(stdin):
+        with pytest.raises(SystemExit) as exc_info:
+            make_cli(**repl_kwargs)(args=[], prog_name="test_batch")
+
+    return exc_info.value.code
+
+
+def test_blank_lines_and_comments_are_skipped(capsys):
+    assert run("hello a\n\n# comment\n   \nhello b\n") == 0
+
+    captured = capsys.readouterr()
+    assert captured.out == "Hello a!\nHello b!\n"
+    assert "2 commands in" in captured.err
+    assert "0 failed" in captured.err
+
+
+def test_continue_on_error(capsys):
+    stdin = "hello a\nfail\ncrash\nstop\nhello c\n"
+    assert run(stdin) == 1
+
+    captured = capsys.readouterr()
+    assert captured.out == "Hello a!\nHello c!\n"
+    assert "Error: failed" in captured.err
+    assert "Error: line 3: RuntimeError: crashed" in captured.err
+    assert "5 commands in" in captured.err
+    assert "3 failed" in captured.err
+
+
+def test_fail_fast(capsys):
+    assert run("hello a\nfail\nhello b\n", fail_fast=True) == 1
+
+    captured = capsys.readouterr()
+    assert captured.out == "Hello a!\n"
+    assert "2 commands in" in captured.err
+
+
+def test_exit_command(capsys):
+    assert run("hello a\n:exit\nhello b\n") == 0
+    assert capsys.readouterr().out == "Hello a!\n"
+
+
+def test_bounded_history(capsys):
+    assert run("hello a\nhello b\nhello c\nhistory\n", history_size=2) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "['history', 'hello c']"
+
+
+def test_iter_commands_reads_chunks():
+    lines = [f"cmd {i}" if i % 3 else "# comment" for i in range(1_000)]
+    stream = StringIO("\n".join(lines) + "\n")
+
+    commands = list(iter_commands(stream, chunk_size=64))
+    assert commands == [(i + 1, f"cmd {i}") for i in range(1_000) if i % 3]
+
+
+def test_iter_commands_reads_pipes_a_line_at_a_time():
+    read_fd, write_fd = os.pipe()
+    with open(read_fd, encoding="utf-8") as reader:
+        with open(write_fd, "w", encoding="utf-8") as writer:
+            commands = iter_commands(reader)
+            read = ThreadPoolExecutor(1)
+
+            # The writer is still open, the command is read without waiting
+            # for a chunk, or the end of the stream
+            writer.write("hello a\n")
+            writer.flush()
+            assert read.submit(next, commands).result(5) == (1, "hello a")
+
+            writer.write("# comment\nhello b\n")
+            writer.flush()
+            assert read.submit(next, commands).result(5) == (3, "hello b")
+
+        assert list(commands) == []
+        read.shutdown()
+
+
+def test_report():
+    report = BatchReport(commands=500, failures=2, elapsed=0.25)
+    assert report.rate == 2000
+    assert str(report) == "500 commands in 0.25s (2000 commands/s), 2 failed"
+    assert BatchReport(0, 0, 0.0).rate == 0.0
@@ -0,0 +1,106 @@
+import click
+from click_repl import ClickCompleter
+from prompt_toolkit.document import Document
+
+try:
+    import click.shell_completion  # noqa: F401
+
+    AUTOCOMPLETION_KWARG = "shell_complete"
+except ImportError:
+    AUTOCOMPLETION_KWARG = "autocompletion"
+
+
+@click.group()
+def root_command():
+    pass
+
+
+c = ClickCompleter(root_command, click.Context(root_command))
+
+
+def completion_texts(text):
+    return [x.text for x in c.get_completions(Document(text))]
+
+
+def test_only_argument_under_cursor_is_completed():
+    @root_command.command()
+    @click.argument("src", type=click.Choice(("src-a", "src-b")))
+    @click.argument("dst", type=click.Choice(("dst-a", "dst-b")))
+    @click.option("--mode", type=click.Choice(("fast", "slow")))
+    @click.option("--force", is_flag=True)
+    def copy(src, dst, mode, force):
+        pass
+
+    assert completion_texts("copy ") == ["src-a", "src-b", "--mode", "--force"]
+    assert completion_texts("copy src") == ["src-a", "src-b"]
+    assert completion_texts("copy src-a ") == ["dst-a", "dst-b", "--mode", "--force"]
+    assert completion_texts("copy src-a d") == ["dst-a", "dst-b"]
+    assert completion_texts("copy src-a dst-b ") == ["--mode", "--force"]
+
+    # Option values and flags are not positional values.
+    assert completion_texts("copy --mode fast src-a d") == ["dst-a", "dst-b"]
+    assert completion_texts("copy --force src-a d") == ["dst-a", "dst-b"]
+    assert completion_texts("copy --mode=fast src-a d") == ["dst-a", "dst-b"]
+
+    # Values after "--" are always positional.
+    assert completion_texts("copy -- -src d") == ["dst-a", "dst-b"]
+
+
+def test_position_after_group_options():
+    @root_command.group()
+    @click.option("--region", type=click.Choice(("eu", "us")))
+    def cloud(region):
+        pass
+
+    @cloud.command()
+    @click.argument("first", type=click.Choice(("one",)))
+    @click.argument("second", type=click.Choice(("two",)))
+    def pair(first, second):
+        pass
+
+    assert completion_texts("cloud --region eu pair ") == ["one"]
+    assert completion_texts("cloud --region eu pair one ") == ["two"]
+
+
+def test_tuple_argument_slots():
+    @root_command.command()
+    @click.argument(
+        "point",
+        type=click.Tuple([click.Choice(("x1", "x2")), click.Choice(("y1", "y2"))]),
+    )
+    def tuple_arg(point):
+        pass
+
+    assert completion_texts("tuple-arg ") == ["x1", "x2"]
+    assert completion_texts("tuple-arg x1 ") == ["y1", "y2"]
+    assert completion_texts("tuple-arg x1 y1 ") == []
+
+
+def test_variadic_argument():
+    @root_command.command()
+    @click.argument("names", nargs=-1, type=click.Choice(("foo", "bar")))
+    def variadic(names):
+        pass
+
+    assert completion_texts("variadic ") == ["foo", "bar"]
+    assert completion_texts("variadic foo bar f") == ["foo"]
+
+
+def test_other_argument_providers_are_not_called():
+    calls = []
+
+    def expensive(name):
+        def provider(*args):
+            calls.append(name)
+            return [name + "-value"]
+
+        return provider
+
+    @root_command.command()
+    @click.argument("first", **{AUTOCOMPLETION_KWARG: expensive("first")})
+    @click.argument("second", **{AUTOCOMPLETION_KWARG: expensive("second")})
+    def lookup(first, second):
+        pass
+
+    assert completion_texts("lookup a ") == ["second-value"]
+    assert calls == ["second"]
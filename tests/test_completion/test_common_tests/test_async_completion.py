@@ -0,0 +1,192 @@
+import asyncio
+import threading
+from contextlib import suppress
+
+import click
+from click_repl import ClickCompleter
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+
+try:
+    import click.shell_completion  # noqa: F401
+
+    AUTOCOMPLETION_KWARG = "shell_complete"
+except ImportError:
+    AUTOCOMPLETION_KWARG = "autocompletion"
+
+
+events = []
+
+
+async def async_hosts(ctx, param_or_args, incomplete):
+    await asyncio.sleep(0)
+    return [h for h in ("alpha", "beta", "alpine") if h.startswith(incomplete)]
+
+
+async def async_regions(ctx, param_or_args, incomplete):
+    for region in ("eu", "us"):
+        await asyncio.sleep(0)
+        yield (region, "region")
+
+
+async def waiting(ctx, param_or_args, incomplete):
+    events.append("started")
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        events.append("cancelled")
+        raise
+    return ["never"]
+
+
+def sync_users(ctx, param_or_args, incomplete):
+    events.append(threading.current_thread() is threading.main_thread())
+    return ["root", "admin"]
+
+
+def failing(ctx, param_or_args, incomplete):
+    raise RuntimeError("broken")
+
+
+@click.group()
+def root_command():
+    pass
+
+
+@root_command.command()
+@click.option("--port", type=int, help="port")
+@click.argument("host", **{AUTOCOMPLETION_KWARG: async_hosts})
+def connect(port, host):
+    pass
+
+
+@root_command.command()
+@click.argument("region", **{AUTOCOMPLETION_KWARG: async_regions})
+def deploy(region):
+    pass
+
+
+@root_command.command()
+@click.option("--verbose", is_flag=True)
+@click.argument("value", **{AUTOCOMPLETION_KWARG: waiting})
+def wait(verbose, value):
+    pass
+
+
+@root_command.command()
+@click.argument("host", **{AUTOCOMPLETION_KWARG: async_hosts})
+@click.option("--count", type=int)
+def ping(host, count):
+    pass
+
+
+@root_command.command()
+@click.argument("user", **{AUTOCOMPLETION_KWARG: sync_users})
+def login(user):
+    pass
+
+
+@root_command.command()
+@click.argument("value", **{AUTOCOMPLETION_KWARG: failing})
+def fail(value):
+    pass
+
+
+c = ClickCompleter(root_command, click.Context(root_command))
+
+
+async def collect(text, limit=None):
+    completions = []
+    generator = c.get_completions_async(Document(text), CompleteEvent())
+    try:
+        async for completion in generator:
+            completions.append(completion)
+            if limit is not None and len(completions) >= limit:
+                break
+    finally:
+        await generator.aclose()
+
+    return completions
+
+
+def completion_texts(text, limit=None):
+    return [x.text for x in asyncio.run(collect(text, limit))]
+
+
+def test_async_callbacks():
+    assert completion_texts("connect al") == ["alpha", "alpine"]
+
+    completions = asyncio.run(collect("deploy "))
+    assert [(x.text, x.display_meta_text) for x in completions] == [
+        ("eu", "region"),
+        ("us", "region"),
+    ]
+
+
+def test_async_callbacks_in_sync_completion():
+    assert [x.text for x in c.get_completions(Document("connect al"))] == [
+        "alpha",
+        "alpine",
+    ]
+
+    async def within_event_loop():
+        return [x.text for x in c.get_completions(Document("deploy "))]
+
+    assert asyncio.run(within_event_loop()) == ["eu", "us"]
+
+
+def test_sync_callbacks_run_in_executor():
+    events.clear()
+    assert completion_texts("login ") == ["root", "admin"]
+    assert events == [False]
+
+    events.clear()
+    assert [x.text for x in c.get_completions(Document("login "))] == [
+        "root",
+        "admin",
+    ]
+    assert events == [True]
+
+
+def test_other_completions_are_not_delayed():
+    events.clear()
+    # The option is yielded without waiting for the callback
+    assert completion_texts("wait ", limit=1) == ["--verbose"]
+    assert events == []
+
+
+def test_abandoned_callbacks_are_discarded():
+    # The callback of the argument is set aside before the option is yielded
+    assert completion_texts("ping ", limit=1) == ["--count"]
+    assert completion_texts("connect al") == ["alpha", "alpine"]
+
+
+def test_pending_callbacks_are_cancelled():
+    events.clear()
+
+    async def main():
+        generator = c.get_completions_async(Document("wait x"), CompleteEvent())
+        task = asyncio.ensure_future(generator.__anext__())
+        while "started" not in events:
+            await asyncio.sleep(0)
+
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        await generator.aclose()
+
+    asyncio.run(main())
+    assert events == ["started", "cancelled"]
+
+
+def test_max_completions():
+    c.max_completions = 2
+    try:
+        assert completion_texts("connect ") == ["--port", "alpha"]
+    finally:
+        c.max_completions = None
+
+
+def test_callback_errors(capsys):
+    assert completion_texts("fail ") == []
+    assert "RuntimeError: broken" in capsys.readouterr().out
@@ -0,0 +1,131 @@
+import click
+import pytest
+from click_repl import ClickCompleter, cached_completion, clear_completion_caches
+from click_repl import _cache
+from prompt_toolkit.document import Document
+
+try:
+    import click.shell_completion  # noqa: F401
+
+    AUTOCOMPLETION_KWARG = "shell_complete"
+except ImportError:
+    AUTOCOMPLETION_KWARG = "autocompletion"
+
+
+calls = []
+HOSTS = ["alpha", "apex", "beta"]
+
+
+def hosts(ctx, param_or_args, incomplete):
+    calls.append(incomplete)
+    return [host for host in HOSTS if host.startswith(incomplete)]
+
+
+cached_hosts = cached_completion(ttl=10)(hosts)
+uncached_prefix_hosts = cached_completion(prefix_filter=False)(hosts)
+
+
+@click.group()
+def root_command():
+    pass
+
+
+@root_command.group()
+@click.option("--site")
+def site(site):
+    pass
+
+
+@site.command()
+@click.argument("host", **{AUTOCOMPLETION_KWARG: cached_hosts})
+def ping(host):
+    pass
+
+
+@site.command()
+@click.argument("host", **{AUTOCOMPLETION_KWARG: uncached_prefix_hosts})
+def trace(host):
+    pass
+
+
+c = ClickCompleter(root_command, click.Context(root_command))
+
+
+def completion_texts(text):
+    return [x.text for x in c.get_completions(Document(text))]
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    calls.clear()
+    clear_completion_caches()
+
+
+def test_results_are_cached():
+    assert completion_texts("site ping ") == ["alpha", "apex", "beta"]
+    assert completion_texts("site ping ") == ["alpha", "apex", "beta"]
+    assert calls == [""]
+    assert cached_hosts.cache_info().hits == 1
+
+
+def test_longer_prefix_filters_cached_superset():
+    assert completion_texts("site ping ") == ["alpha", "apex", "beta"]
+    assert completion_texts("site ping a") == ["alpha", "apex"]
+    assert completion_texts("site ping ap") == ["apex"]
+    assert completion_texts("site ping b") == ["beta"]
+    assert calls == [""]
+
+
+def test_prefix_filter_can_be_disabled():
+    assert completion_texts("site trace ") == ["alpha", "apex", "beta"]
+    assert completion_texts("site trace a") == ["alpha", "apex"]
+    assert calls == ["", "a"]
+
+
+def test_parent_params_are_part_of_the_key():
+    completion_texts("site --site eu ping ")
+    completion_texts("site --site us ping ")
+    completion_texts("site --site eu ping ")
+    assert calls == ["", ""]
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(_cache.time, "monotonic", lambda: now[0])
+
+    completion_texts("site ping ")
+    now[0] += 5
+    completion_texts("site ping ")
+    assert calls == [""]
+
+    now[0] += 6
+    completion_texts("site ping a")
+    assert calls == ["", "a"]
+
+
+def test_invalidation():
+    completion_texts("site ping ")
+    HOSTS.append("gamma")
+    try:
+        assert completion_texts("site ping ") == ["alpha", "apex", "beta"]
+
+        cached_hosts.cache_clear()
+        assert completion_texts("site ping ") == ["alpha", "apex", "beta", "gamma"]
+
+        HOSTS.remove("gamma")
+        clear_completion_caches()
+        assert completion_texts("site ping ") == ["alpha", "apex", "beta"]
+    finally:
+        if "gamma" in HOSTS:
+            HOSTS.remove("gamma")
+
+
+def test_size_bound():
+    cache = _cache.CompletionCache(maxsize=2)
+    cache.store("scope", "a", ["a1"])
+    cache.store("scope", "b", ["b1"])
+    cache.store("scope", "c", ["c1"])
+
+    assert cache.lookup("scope", "a") is None
+    assert cache.lookup("scope", "c") == ["c1"]
+    assert cache.info().currsize == 2
@@ -0,0 +1,190 @@
+import asyncio
+import subprocess
+import sys
+import threading
+import time
+from importlib.metadata import version as _get_version
+
+import click
+import pytest
+from click_repl import ClickCompleter
+from click_repl._completer import LOADING_COMPLETION
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+
+try:
+    import click.shell_completion  # noqa: F401
+
+    AUTOCOMPLETION_KWARG = "shell_complete"
+except ImportError:
+    AUTOCOMPLETION_KWARG = "autocompletion"
+
+_click_major = int(_get_version("click").split(".")[0])
+
+
+@click.group()
+def root_command():
+    pass
+
+
+release = threading.Event()
+started = threading.Event()
+
+
+def slow_inventory(*args):
+    started.set()
+    release.wait(5)
+    return ["host-1", "host-2"]
+
+
+def fast_inventory(*args):
+    return ["region-1"]
+
+
+@root_command.command()
+@click.argument("host", **{AUTOCOMPLETION_KWARG: slow_inventory})
+@click.argument("region", **{AUTOCOMPLETION_KWARG: fast_inventory})
+def deploy(host, region):
+    pass
+
+
+@pytest.fixture
+def completer():
+    release.clear()
+    started.clear()
+    c = ClickCompleter(
+        root_command, click.Context(root_command), callback_timeout=0.05
+    )
+    yield c
+
+    release.set()
+    c._callback_runner.shutdown()
+
+
+def test_slow_callback_shows_loading(completer):
+    completions = list(completer.get_completions(Document("deploy ")))
+    assert completions == [LOADING_COMPLETION]
+
+    release.set()
+    (job,) = completer._callback_runner._jobs.values()
+    job.future.result(5)
+
+    # The finished request is reused for the same input.
+    completions = list(completer.get_completions(Document("deploy ")))
+    assert [x.text for x in completions] == ["host-1", "host-2"]
+
+
+def test_slow_callback_shows_loading_async(completer):
+    async def complete(text):
+        return [
+            x
+            async for x in completer.get_completions_async(
+                Document(text), CompleteEvent()
+            )
+        ]
+
+    assert asyncio.run(complete("deploy ")) == [LOADING_COMPLETION]
+    assert started.wait(5)
+    (job,) = completer._callback_runner._jobs.values()
+
+    # The request of the previous keystroke is still running
+    assert asyncio.run(complete("deploy ")) == [LOADING_COMPLETION]
+    assert list(completer._callback_runner._jobs.values()) == [job]
+
+    release.set()
+    job.future.result(5)
+    completions = asyncio.run(complete("deploy "))
+    assert [x.text for x in completions] == ["host-1", "host-2"]
+
+
+def test_fast_callback_finishes_within_timeout(completer):
+    completions = list(completer.get_completions(Document("deploy host-1 ")))
+    assert [x.text for x in completions] == ["region-1"]
+
+
+def test_new_keystroke_cancels_stale_request(completer):
+    list(completer.get_completions(Document("deploy ")))
+    assert started.wait(5)
+    jobs = completer._callback_runner._jobs
+    (stale_job,) = jobs.values()
+
+    list(completer.get_completions(Document("deploy host-1 ")))
+    assert stale_job.cancelled.is_set()
+    assert stale_job not in jobs.values()
+
+    release.set()
+    stale_job.future.result(5)
+    assert stale_job.items == []
+
+
+def test_per_param_timeout():
+    release.clear()
+    c = ClickCompleter(root_command, click.Context(root_command))
+
+    param = deploy.params[0]
+    param.completion_timeout = 0.01
+    try:
+        assert list(c.get_completions(Document("deploy "))) == [LOADING_COMPLETION]
+    finally:
+        del param.completion_timeout
+        release.set()
+        c._callback_runner.shutdown()
+
+
+@pytest.mark.skipif(
+    _click_major < 8,
+    reason="click-v8 built-in shell complete is not available, so skipped",
+)
+def test_partial_results_of_timed_out_callback():
+    from click.shell_completion import CompletionItem
+
+    partial_release = threading.Event()
+
+    class StreamingType(click.ParamType):
+        name = "streaming"
+
+        def shell_complete(self, ctx, param, incomplete):
+            yield CompletionItem("first")
+            partial_release.wait(5)
+            yield CompletionItem("second")
+
+    @root_command.command()
+    @click.argument("item", type=StreamingType())
+    def stream(item):
+        pass
+
+    c = ClickCompleter(root_command, click.Context(root_command), callback_timeout=0.05)
+    try:
+        completions = list(c.get_completions(Document("stream ")))
+        assert [x.text for x in completions] == ["first", ""]
+        assert completions[-1] is LOADING_COMPLETION
+    finally:
+        partial_release.set()
+        c._callback_runner.shutdown()
+
+
+HANGING_SCRIPT = f"""
+import time
+import click
+from click_repl import ClickCompleter
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+
+@click.group()
+def cli():
+    pass
+
+@cli.command()
+@click.argument("host", {AUTOCOMPLETION_KWARG}=lambda *args: time.sleep(30) or [])
+def ssh(host):
+    pass
+
+c = ClickCompleter(cli, click.Context(cli), callback_timeout=0.05)
+list(c.get_completions(Document("ssh ")))
+"""
+
+
+def test_hanging_callback_does_not_delay_exit():
+    start = time.monotonic()
+    subprocess.run([sys.executable, "-c", HANGING_SCRIPT], check=True, timeout=20)
+    assert time.monotonic() - start < 10
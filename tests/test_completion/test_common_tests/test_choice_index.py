@@ -0,0 +1,115 @@
+from importlib.metadata import version as _get_version
+
+import click
+import pytest
+from click_repl import ClickCompleter
+from click_repl._index import ChoiceIndex
+from prompt_toolkit.document import Document
+
+_click_major = int(_get_version("click").split(".")[0])
+
+SKUS = [f"sku-{i:06}" for i in range(50_000)]
+
+
+@click.group()
+def root_command():
+    pass
+
+
+@root_command.command()
+@click.argument("sku", type=click.Choice(SKUS))
+@click.option("--level", type=click.Choice(["low", "medium", "high", "Mid"]))
+@click.option(
+    "--region", type=click.Choice(["EU-West", "eu-north"], case_sensitive=False)
+)
+def order(sku, level, region):
+    pass
+
+
+c = ClickCompleter(root_command, click.Context(root_command))
+
+
+def completion_texts(text):
+    return [x.text for x in c.get_completions(Document(text))]
+
+
+def test_choice_index_search():
+    index = ChoiceIndex(click.Choice(["beta", "alpha", "alpine", "Alps"]))
+
+    assert index.search("al") == ["alpha", "alpine"]
+    assert index.search("") == ["beta", "alpha", "alpine", "Alps"]
+    assert index.search("alpha") == ["alpha"]
+    assert index.search("b", limit=0) == []
+    assert index.search("x") == []
+
+
+def test_case_insensitive_search():
+    index = ChoiceIndex(click.Choice(["Beta", "alpha", "ALPINE"], case_sensitive=False))
+
+    # click >= 8.2 completes the case folded choices
+    assert [value.lower() for value in index.search("AL")] == ["alpha", "alpine"]
+
+
+def test_limited_results_are_sorted():
+    index = ChoiceIndex(click.Choice(["c2", "c3", "c1", "b1"]))
+    assert index.search("c", limit=2) == ["c1", "c2"]
+    assert index.search("c", limit=3) == ["c2", "c3", "c1"]
+
+
+def test_large_choice_completion():
+    assert completion_texts("order sku-04999") == [f"sku-04999{i}" for i in range(10)]
+    assert completion_texts("order sku-1") == []
+    assert len(completion_texts("order ")) == 50_000 + 2
+
+
+def test_declaration_order_and_case():
+    assert completion_texts("order sku-000000 --level ") == [
+        "low",
+        "medium",
+        "high",
+        "Mid",
+    ]
+    assert completion_texts("order sku-000000 --level m") == ["medium"]
+    assert len(completion_texts("order sku-000000 --region eu")) == 2
+
+
+def test_max_completions():
+    c.max_completions = 5
+    try:
+        assert completion_texts("order sku-01") == [f"sku-01000{i}" for i in range(5)]
+    finally:
+        c.max_completions = None
+
+
+def test_index_is_cached_and_rebuilt():
+    completion_texts("order sku-00000")
+    sku_type = order.params[0].type
+    index = c._choice_indexes[sku_type]
+
+    completion_texts("order sku-00001")
+    assert c._choice_indexes[sku_type] is index
+
+    level_type = order.params[1].type
+    old_choices = level_type.choices
+    level_type.choices = ["low", "lower"]
+    try:
+        assert completion_texts("order sku-000000 --level lo") == ["low", "lower"]
+    finally:
+        level_type.choices = old_choices
+
+
+@pytest.mark.skipif(
+    _click_major < 8,
+    reason="click-v8 built-in shell complete is not available, so skipped",
+)
+def test_overridden_shell_complete_is_not_indexed():
+    class Reversed(click.Choice):
+        def shell_complete(self, ctx, param, incomplete):
+            return reversed(super().shell_complete(ctx, param, incomplete))
+
+    @root_command.command()
+    @click.argument("value", type=Reversed(["a1", "a2"]))
+    def reverse(value):
+        pass
+
+    assert completion_texts("reverse a") == ["a2", "a1"]
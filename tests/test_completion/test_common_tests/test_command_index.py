@@ -0,0 +1,194 @@
+import click
+from click_repl import ClickCompleter
+from click_repl import _index
+from click_repl._index import CommandIndex
+from prompt_toolkit.document import Document
+
+
+@click.group()
+def root_command():
+    pass
+
+
+@root_command.command(short_help="first command")
+def alpha():
+    pass
+
+
+@root_command.command()
+def alpine():
+    pass
+
+
+@root_command.command(name="Alps")
+def alps():
+    pass
+
+
+@root_command.command(hidden=True)
+def alpha_hidden():
+    pass
+
+
+@root_command.command()
+def beta():
+    pass
+
+
+c = ClickCompleter(root_command, click.Context(root_command), use_command_index=True)
+
+
+def test_index_matches_unindexed_completions():
+    unindexed = ClickCompleter(root_command, click.Context(root_command))
+
+    for text in ("", "al", "AL", "alp", "b", "x"):
+        indexed_res = list(c.get_completions(Document(text)))
+        unindexed_res = list(unindexed.get_completions(Document(text)))
+
+        assert [i.text for i in indexed_res] == [i.text for i in unindexed_res]
+        assert [i.display_meta for i in indexed_res] == [
+            i.display_meta for i in unindexed_res
+        ]
+
+
+def test_index_prefix_search():
+    completions = list(c.get_completions(Document("alp")))
+    assert [x.text for x in completions] == ["Alps", "alpha", "alpine"]
+    assert completions[1].display_meta_text == "first command"
+
+
+def test_index_search_hidden():
+    index = CommandIndex(root_command, click.Context(root_command))
+
+    assert len(index) == 5
+    assert [e.name for e in index.search("alpha")] == ["alpha"]
+    assert [e.name for e in index.search("alpha", include_hidden=True)] == [
+        "alpha",
+        "alpha-hidden",
+    ]
+
+
+def test_index_rebuilt_on_new_command():
+    @click.group()
+    def group():
+        pass
+
+    @group.command()
+    def gamma():
+        pass
+
+    completer = ClickCompleter(group, click.Context(group), use_command_index=True)
+    assert [x.text for x in completer.get_completions(Document("g"))] == ["gamma"]
+    index = completer._command_indexes[group]
+
+    @group.command()
+    def gemini():
+        pass
+
+    assert [x.text for x in completer.get_completions(Document("g"))] == [
+        "gamma",
+        "gemini",
+    ]
+    assert completer._command_indexes[group] is not index
+
+
+def test_index_reused_while_unchanged():
+    list(c.get_completions(Document("b")))
+    index = c._command_indexes[root_command]
+    list(c.get_completions(Document("a")))
+    assert c._command_indexes[root_command] is index
+
+
+def test_index_for_command_collection():
+    @click.group()
+    def source_a():
+        pass
+
+    @source_a.command()
+    def delta():
+        pass
+
+    @click.group()
+    def source_b():
+        pass
+
+    @source_b.command()
+    def dune():
+        pass
+
+    collection = click.CommandCollection(sources=[source_a, source_b])
+    completer = ClickCompleter(
+        collection, click.Context(collection), use_command_index=True
+    )
+
+    assert [x.text for x in completer.get_completions(Document("d"))] == [
+        "delta",
+        "dune",
+    ]
+
+    @source_b.command()
+    def dusk():
+        pass
+
+    assert [x.text for x in completer.get_completions(Document("du"))] == [
+        "dune",
+        "dusk",
+    ]
+
+
+def test_index_checks_lazy_groups_only_on_a_miss_or_after_an_interval(monkeypatch):
+    class LazyGroup(click.Group):
+        listed = 0
+
+        def list_commands(self, ctx):
+            LazyGroup.listed += 1
+            return sorted(self.commands)
+
+    @click.group(cls=LazyGroup)
+    def group():
+        pass
+
+    @group.command()
+    def gamma():
+        pass
+
+    completer = ClickCompleter(group, click.Context(group), use_command_index=True)
+    assert [x.text for x in completer.get_completions(Document("g"))] == ["gamma"]
+    listed = LazyGroup.listed
+
+    for text in ("g", "ga", "gam"):
+        list(completer.get_completions(Document(text)))
+    assert LazyGroup.listed == listed
+
+    # A miss checks for new commands right away
+    group.command("delta")(lambda: None)
+    assert [x.text for x in completer.get_completions(Document("d"))] == ["delta"]
+
+    # Other changes are picked up once the index is checked again
+    group.command("gemini")(lambda: None)
+    assert [x.text for x in completer.get_completions(Document("g"))] == ["gamma"]
+
+    monkeypatch.setattr(_index, "STALE_CHECK_INTERVAL", 0.0)
+    assert [x.text for x in completer.get_completions(Document("g"))] == [
+        "gamma",
+        "gemini",
+    ]
+
+
+def test_index_detects_replaced_commands(monkeypatch):
+    @click.group()
+    def group():
+        pass
+
+    group.command("gamma", short_help="old")(lambda: None)
+
+    completer = ClickCompleter(group, click.Context(group), use_command_index=True)
+    assert [x.display_meta_text for x in completer.get_completions(Document("g"))] == [
+        "old"
+    ]
+
+    group.command("gamma", short_help="new")(lambda: None)
+    monkeypatch.setattr(_index, "STALE_CHECK_INTERVAL", 0.0)
+    assert [x.display_meta_text for x in completer.get_completions(Document("g"))] == [
+        "new"
+    ]
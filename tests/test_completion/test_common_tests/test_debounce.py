@@ -0,0 +1,95 @@
+import asyncio
+import types
+
+import click
+from click_repl import ClickCompleter, _completer
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+
+
+@click.group()
+def root_command():
+    pass
+
+
+@root_command.command()
+@click.option("--region", type=click.Choice(["eu", "us"]))
+@click.option("--replicas", type=int)
+def deploy(region, replicas):
+    pass
+
+
+LINE = "deploy --re"
+
+
+def make_completer(**kwargs):
+    return ClickCompleter(
+        root_command, click.Context(root_command), collect_stats=True, **kwargs
+    )
+
+
+def computed(c):
+    # Every computed completion request records a "total" duration
+    return c.stats.summary()["total"].samples
+
+
+async def collect(c, document):
+    return [
+        x.text async for x in c.get_completions_async(document, CompleteEvent())
+    ]
+
+
+async def paste(c, delay=0.0):
+    tasks = []
+    for end in range(1, len(LINE) + 1):
+        tasks.append(asyncio.ensure_future(collect(c, Document(LINE[:end]))))
+        await asyncio.sleep(delay)
+
+    return await asyncio.gather(*tasks)
+
+
+def test_bursts_compute_only_the_latest_document():
+    c = make_completer(debounce_interval=0.01)
+    results = asyncio.run(paste(c))
+
+    assert results[-1] == ["--region", "--replicas"]
+    # The first request is answered right away, the rest are coalesced
+    assert all(texts == [] for texts in results[1:-1])
+    assert computed(c) == 2
+
+
+def test_slow_input_is_not_delayed():
+    c = make_completer(debounce_interval=0.001)
+    results = asyncio.run(paste(c, delay=0.01))
+
+    assert results[0] == ["deploy"]
+    assert results[-1] == ["--region", "--replicas"]
+    assert computed(c) == len(LINE)
+
+
+def test_without_debounce_interval():
+    c = make_completer()
+    asyncio.run(paste(c))
+
+    assert computed(c) == len(LINE)
+
+
+def test_documents_superseded_in_the_prompt(monkeypatch):
+    buffer = types.SimpleNamespace(document=Document("deploy --r"))
+    app = types.SimpleNamespace(is_running=True, current_buffer=buffer)
+    monkeypatch.setattr(_completer, "get_app_or_none", lambda: app)
+
+    c = make_completer(debounce_interval=0.01)
+
+    async def main():
+        # The prompt asks again only once the previous request is done
+        first = await collect(c, Document("deploy --r"))
+        buffer.document = Document("deploy --re")
+        second = await collect(c, Document("deploy --r"))
+        third = await collect(c, Document("deploy --re"))
+        return first, second, third
+
+    first, second, third = asyncio.run(main())
+    assert first == ["--region", "--replicas"]
+    assert second == []
+    assert third == ["--region", "--replicas"]
@@ -0,0 +1,157 @@
+import click
+import pytest
+from click_repl import ClickCompleter
+from click_repl import _completer, _index
+from click_repl._index import FuzzyIndex
+from prompt_toolkit.document import Document
+
+
+@click.group()
+def root_command():
+    pass
+
+
+@root_command.command(help="Deploy the application")
+@click.option("--verbose", is_flag=True)
+@click.option("--version-tag")
+@click.option("--dry-run", is_flag=True)
+def deploy(verbose, version_tag, dry_run):
+    pass
+
+
+@root_command.command()
+@click.argument("region", type=click.Choice(["eu-west", "eu-north", "us-east"]))
+def describe(region):
+    pass
+
+
+@root_command.command()
+def logs():
+    pass
+
+
+@root_command.command(hidden=True)
+def debug():
+    pass
+
+
+c = ClickCompleter(root_command, click.Context(root_command), fuzzy=True)
+prefix = ClickCompleter(root_command, click.Context(root_command))
+
+
+def completion_texts(text, completer=c):
+    return [x.text for x in completer.get_completions(Document(text))]
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("dep", ["deploy", "deployment-status"]),
+        ("status", ["deployment-status"]),
+        ("dpl", ["deploy", "deployment-status"]),
+        ("logz", ["logs"]),
+        ("dploymnt-stats", ["deployment-status"]),
+        ("", ["deploy", "delete", "logs", "deployment-status"]),
+        ("xyz", []),
+    ],
+)
+def test_fuzzy_index_search(query, expected):
+    index = FuzzyIndex(["deploy", "delete", "logs", "deployment-status"])
+    assert index.search(query) == expected
+
+
+def test_ranking_and_limit():
+    # prefix, then substring, then subsequence, then typos
+    index = FuzzyIndex(["xabc", "abcd", "axbxc", "abd", "abc"])
+
+    assert index.search("abc") == ["abc", "abcd", "xabc", "axbxc"]
+    assert index.search("abc", limit=2) == ["abc", "abcd"]
+    assert index.search("abc", limit=0) == []
+
+
+def test_abbreviations_fill_the_limit():
+    index = FuzzyIndex(["xdpa1", "xdpa2", "dpx", "deploy-app"])
+    ranked = index.search("dpa", limit=None)
+
+    assert ranked == ["xdpa1", "xdpa2", "deploy-app"]
+    for limit in range(len(ranked) + 2):
+        assert index.search("dpa", limit) == ranked[:limit]
+
+
+def test_large_index():
+    index = FuzzyIndex([f"sku-{i:06}" for i in range(20_000)])
+
+    assert index.search("sku-01234", limit=3) == [f"sku-01234{i}" for i in range(3)]
+    assert index.search("sku-01234x", limit=1) == ["sku-012340"]
+
+
+@pytest.mark.parametrize("query", ["a", "b", "ab", "ba", " b", "a ", "z", "k7"])
+def test_short_queries_are_ranked_from_their_index(query):
+    values = ["b a", "ab", "bab", "a-b", "xab", "a b", "ba", "b", "aab", "bxa"]
+    values += [f"k{i}" for i in range(100)]
+    index = FuzzyIndex(values)
+    ranked = index.search(query, limit=None)
+
+    assert ranked == [value for value in ranked if _index._is_subsequence(query, value)]
+    for limit in range(len(ranked) + 1):
+        assert index.search(query, limit) == ranked[:limit]
+
+    assert index.search("a", limit=None)[:3] == ["ab", "a-b", "a b"]
+    assert index.search("ab", limit=None) == ["ab", "bab", "xab", "aab", "a-b", "a b"]
+
+
+def test_short_queries_only_score_the_best_candidates(monkeypatch):
+    index = FuzzyIndex([f"sku-{i:06}" for i in range(20_000)])
+    scored = []
+    score = FuzzyIndex._score
+
+    def spy(self, position, *args):
+        scored.append(position)
+        return score(self, position, *args)
+
+    monkeypatch.setattr(FuzzyIndex, "_score", spy)
+    assert index.search("s", limit=3) == ["sku-000000", "sku-000001", "sku-000002"]
+    assert index.search("u-", limit=2) == ["sku-000000", "sku-000001"]
+    assert len(scored) <= 10
+
+
+def test_fuzzy_subcommands():
+    assert completion_texts("dpl") == ["deploy"]
+    assert completion_texts("lgs") == ["logs"]
+    assert completion_texts("scrib") == ["describe"]
+
+    # hidden commands are never suggested
+    assert "debug" not in completion_texts("dbg")
+    assert "debug" not in completion_texts("de")
+
+
+def test_fuzzy_options():
+    assert completion_texts("deploy --vrbose") == ["--verbose"]
+    assert completion_texts("deploy --dry") == ["--dry-run"]
+    assert completion_texts("deploy --ver") == ["--verbose", "--version-tag"]
+
+
+def test_fuzzy_choices():
+    assert completion_texts("describe north") == ["eu-north"]
+    assert completion_texts("describe eu") == ["eu-west", "eu-north"]
+
+
+def test_fuzzy_matches_are_limited_by_default(monkeypatch):
+    monkeypatch.setattr(_completer, "FUZZY_LIMIT", 1)
+    assert c.max_completions is None
+    assert completion_texts("describe eu") == ["eu-west"]
+
+
+def test_max_completions_limits_fuzzy_matches():
+    c.max_completions = 1
+    try:
+        assert completion_texts("describe eu") == ["eu-west"]
+    finally:
+        c.max_completions = None
+
+
+def test_prefix_matching_by_default():
+    assert completion_texts("dpl", prefix) == []
+    assert completion_texts("de", prefix) == ["deploy", "describe"]
+    assert completion_texts("deploy --vrbose", prefix) == []
+    assert completion_texts("describe north", prefix) == []
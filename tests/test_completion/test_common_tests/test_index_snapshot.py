@@ -0,0 +1,170 @@
+import pickle
+
+import click
+import pytest
+from click_repl import ClickCompleter
+from click_repl._snapshot import IndexSnapshot, cli_fingerprint
+from prompt_toolkit.document import Document
+
+REGIONS = [f"region-{i:04}" for i in range(500)]
+
+
+class LazyGroup(click.Group):
+    loaded: list = []
+
+    def list_commands(self, ctx):
+        return sorted(self.commands)
+
+    def get_command(self, ctx, name):
+        self.loaded.append(name)
+        return super().get_command(ctx, name)
+
+
+def make_cli(regions=REGIONS, short_help="Deploy", cls=LazyGroup):
+    @click.group(cls=cls)
+    def cli():
+        pass
+
+    @cli.command(short_help=short_help)
+    @click.option("--region", type=click.Choice(regions))
+    def deploy(region):
+        pass
+
+    @cli.group()
+    def db():
+        pass
+
+    @db.command()
+    def migrate():
+        pass
+
+    return cli
+
+
+def make_completer(cli, path, **kwargs):
+    return ClickCompleter(
+        cli, click.Context(cli), use_command_index=True, index_cache=path, **kwargs
+    )
+
+
+def completion_texts(c, text):
+    return [x.text for x in c.get_completions(Document(text))]
+
+
+def test_indexes_are_restored(tmp_path):
+    path = tmp_path / "index.cache"
+
+    c = make_completer(make_cli(), path, fuzzy=True)
+    texts = ["d", "dpl", "db ", "deploy --region region-001", "deploy --region 0042"]
+    expected = {text: completion_texts(c, text) for text in texts}
+    assert c.save_index_cache()
+    assert path.exists()
+    assert not c.save_index_cache()
+
+    cli = make_cli()
+    c = make_completer(cli, path, fuzzy=True)
+    LazyGroup.loaded.clear()
+
+    # The index of the root group is restored without loading its commands
+    assert completion_texts(c, "d") == expected["d"]
+    assert completion_texts(c, "dpl") == expected["dpl"]
+    assert LazyGroup.loaded == []
+
+    for text, texts in expected.items():
+        assert completion_texts(c, text) == texts
+
+    assert not c.save_index_cache()
+
+
+def test_fingerprint():
+    def fingerprint(cli):
+        return cli_fingerprint(cli, click.Context(cli))
+
+    cli = make_cli(cls=click.Group)
+    assert fingerprint(cli) == fingerprint(make_cli(cls=click.Group))
+    assert fingerprint(cli) != fingerprint(make_cli(["eu"], cls=click.Group))
+    assert fingerprint(cli) != fingerprint(make_cli(short_help="Other", cls=click.Group))
+
+    # Commands of lazy groups aren't loaded, only their names are part of it
+    LazyGroup.loaded.clear()
+    assert fingerprint(make_cli()) == fingerprint(make_cli(short_help="Other"))
+    assert LazyGroup.loaded == []
+
+
+def test_changed_cli_invalidates_the_snapshot(tmp_path):
+    path = tmp_path / "index.cache"
+
+    c = make_completer(make_cli(cls=click.Group), path)
+    assert completion_texts(c, "deploy --region region-000") == [
+        f"region-000{i}" for i in range(10)
+    ]
+    assert c.save_index_cache()
+
+    c = make_completer(make_cli(["eu", "us"], cls=click.Group), path)
+    assert not c._snapshot.load()
+    assert completion_texts(c, "deploy --region ") == ["eu", "us"]
+
+    # Saved choices that don't match the current ones aren't restored
+    c = make_completer(make_cli(), path)
+    assert completion_texts(c, "deploy --region region-000")
+    c.save_index_cache()
+
+    c = make_completer(make_cli(["eu", "us"]), path)
+    assert c._snapshot.load()
+    assert completion_texts(c, "deploy --region ") == ["eu", "us"]
+
+    # Even when there are as many of them
+    c.save_index_cache()
+    c = make_completer(make_cli(["eu", "ap"]), path)
+    assert c._snapshot.load()
+    assert completion_texts(c, "deploy --region ") == ["eu", "ap"]
+
+
+def test_commands_added_at_runtime(tmp_path):
+    path = tmp_path / "index.cache"
+
+    c = make_completer(make_cli(), path)
+    completion_texts(c, "d")
+    c.save_index_cache()
+
+    cli = make_cli()
+    c = make_completer(cli, path)
+    cli.command("dump")(lambda: None)
+    assert completion_texts(c, "d") == ["db", "deploy", "dump"]
+
+
+class Payload:
+    ran = False
+
+    def __reduce__(self):
+        return setattr, (Payload, "ran", True)
+
+
+def test_snapshot_files_are_not_unpickled(tmp_path):
+    path = tmp_path / "index.cache"
+    c = make_completer(make_cli(), path)
+    completion_texts(c, "d")
+    assert c.save_index_cache()
+
+    header = path.read_bytes().partition(b"\n")[0]
+    assert header.decode("ascii").endswith(c._snapshot.fingerprint)
+
+    path.write_bytes(header + b"\n" + pickle.dumps({("command", ()): Payload()}))
+    assert not IndexSnapshot(path, c._snapshot.fingerprint).load()
+    assert not Payload.ran
+
+
+@pytest.mark.parametrize(
+    "content", [b"", b"garbage", b"\x80\x05N.", pickle.dumps((2, "fingerprint"))]
+)
+def test_unreadable_snapshot(tmp_path, content):
+    path = tmp_path / "index.cache"
+    path.write_bytes(content)
+
+    snapshot = IndexSnapshot(path, "fingerprint")
+    assert not snapshot.load()
+
+    c = make_completer(make_cli(), path)
+    assert completion_texts(c, "db ") == ["migrate"]
+    assert c.save_index_cache()
+    assert IndexSnapshot(path, c._snapshot.fingerprint).load()
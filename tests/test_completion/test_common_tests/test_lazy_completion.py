@@ -0,0 +1,111 @@
+import types
+from itertools import islice
+
+import click
+import pytest
+from click_repl import ClickCompleter, _completer
+from prompt_toolkit.completion import Completion
+from prompt_toolkit.document import Document
+
+try:
+    import click.shell_completion  # noqa: F401
+
+    AUTOCOMPLETION_KWARG = "shell_complete"
+except ImportError:
+    AUTOCOMPLETION_KWARG = "autocompletion"
+
+
+def many(ctx, param_or_args, incomplete):
+    return [f"{incomplete}{i}" for i in range(1_000)]
+
+
+class CountingGroup(click.Group):
+    loaded: list = []
+
+    def get_command(self, ctx, name):
+        self.loaded.append(name)
+        return super().get_command(ctx, name)
+
+
+@click.group(cls=CountingGroup)
+def root_command():
+    pass
+
+
+@root_command.command()
+@click.option("--alpha", help="first")
+@click.option("--beta", help="second")
+@click.argument("value", **{AUTOCOMPLETION_KWARG: many})
+@click.option("--gamma", help="third")
+def run(alpha, beta, value, gamma):
+    pass
+
+
+for i in range(100):
+    root_command.command(f"cmd-{i:03}")(lambda: None)
+
+
+c = ClickCompleter(root_command, click.Context(root_command))
+
+
+@pytest.fixture
+def built(monkeypatch):
+    built = []
+
+    def counting_completion(*args, **kwargs):
+        built.append(args[0])
+        return Completion(*args, **kwargs)
+
+    monkeypatch.setattr(_completer, "Completion", counting_completion)
+    return built
+
+
+def test_completions_are_built_lazily(built):
+    completions = c.get_completions(Document("run x"))
+    assert isinstance(completions, types.GeneratorType)
+    assert built == []
+
+    assert [x.text for x in islice(completions, 3)] == ["x0", "x1", "x2"]
+    assert built == ["x0", "x1", "x2"]
+    completions.close()
+
+
+def test_max_completions_caps_the_total(built):
+    c.max_completions = 5
+    try:
+        completions = list(c.get_completions(Document("run ")))
+    finally:
+        c.max_completions = None
+
+    # Options around the argument, then the argument's values
+    assert [x.text for x in completions] == ["--alpha", "--beta", "0", "1", "2"]
+    assert completions[0].display_meta_text == "first"
+    assert built == [x.text for x in completions]
+
+
+def test_only_matching_subcommands_are_loaded():
+    CountingGroup.loaded.clear()
+    texts = [x.text for x in c.get_completions(Document("cmd-05"))]
+
+    assert texts == [f"cmd-05{i}" for i in range(10)]
+    assert CountingGroup.loaded == texts
+
+
+def test_errors_end_the_completions(capsys):
+    class Broken:
+        def __str__(self):
+            raise RuntimeError("broken")
+
+    def failing(ctx, param_or_args, incomplete):
+        return [("ok", "fine"), Broken()]
+
+    @root_command.command()
+    @click.argument("value", **{AUTOCOMPLETION_KWARG: failing})
+    def fail(value):
+        pass
+
+    try:
+        assert [x.text for x in c.get_completions(Document("fail "))] == ["ok"]
+        assert "RuntimeError: broken" in capsys.readouterr().out
+    finally:
+        root_command.commands.pop("fail")
@@ -0,0 +1,189 @@
+import json
+
+import click
+import pytest
+from click_repl import ClickCompleter, build_manifest, load_manifest, save_manifest
+from click_repl._manifest import manifest_cli
+from prompt_toolkit.document import Document
+
+try:
+    import click.shell_completion  # noqa: F401
+
+    AUTOCOMPLETION_KWARG = "shell_complete"
+except ImportError:
+    AUTOCOMPLETION_KWARG = "autocompletion"
+
+
+loaded = []
+
+
+class LazyGroup(click.Group):
+    """Loads its subcommands on demand, like CLIs importing them lazily."""
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted(self.lazy_commands)
+
+    def get_command(self, ctx, cmd_name):
+        factory = self.lazy_commands.get(cmd_name, None)
+        if factory is None:
+            return None
+
+        loaded.append(cmd_name)
+        return factory()
+
+
+def users(ctx, param_or_args, incomplete):
+    return [u for u in ("root", "admin") if u.startswith(incomplete)]
+
+
+def deploy():
+    @click.command(short_help="Deploy the app")
+    @click.argument("env", type=click.Choice(["dev", "staging", "prod"]))
+    @click.option("--force/--no-force", help="skip checks")
+    @click.option("-v", "--verbose", count=True)
+    @click.option("--config", type=click.Path(dir_okay=False))
+    @click.option("--user", **{AUTOCOMPLETION_KWARG: users})
+    @click.option("--secret", hidden=True)
+    def command(env, force, verbose, config, user, secret):
+        pass
+
+    return command
+
+
+def db():
+    group = click.Group("db", short_help="Database tasks")
+
+    @group.command()
+    @click.argument("tables", nargs=-1, type=click.Choice(["users", "orders"]))
+    def migrate(tables):
+        pass
+
+    @group.command(hidden=True)
+    def reset():
+        pass
+
+    return group
+
+
+cli = LazyGroup("cli", lazy_commands={"deploy": deploy, "db": db})
+
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    path = tmp_path / "manifest.json"
+    save_manifest(cli, path)
+    loaded.clear()
+    return path
+
+
+def completions(completer, text):
+    return [
+        (x.text, x.display_meta_text) for x in completer.get_completions(Document(text))
+    ]
+
+
+LINES = [
+    "",
+    "d",
+    "deploy ",
+    "deploy st",
+    "deploy prod --",
+    "deploy prod --f",
+    "deploy prod --no",
+    "deploy prod -v -",
+    "db ",
+    "db migrate ",
+    "db migrate users o",
+]
+
+
+def test_completions_match_the_real_commands(manifest_path):
+    live = ClickCompleter(cli, click.Context(cli))
+    from_manifest = ClickCompleter(cli, click.Context(cli), manifest=manifest_path)
+
+    for line in LINES:
+        assert completions(from_manifest, line) == completions(live, line), line
+
+
+def test_commands_are_not_loaded(manifest_path):
+    c = ClickCompleter(cli, click.Context(cli), manifest=manifest_path)
+
+    for line in LINES:
+        list(c.get_completions(Document(line)))
+
+    assert loaded == []
+
+
+def test_dynamic_completions_load_the_command(manifest_path):
+    c = ClickCompleter(cli, click.Context(cli), manifest=manifest_path)
+
+    assert completions(c, "deploy prod --user r") == [("root", "")]
+    assert loaded == ["deploy"]
+
+
+def test_path_completion(manifest_path, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    c = ClickCompleter(cli, click.Context(cli), manifest=manifest_path)
+
+    assert completions(c, "deploy prod --config man") == [("manifest.json", "")]
+
+
+def test_manifest_contents():
+    manifest = build_manifest(cli)
+    assert manifest["version"] == 1
+
+    deploy_node = manifest["root"]["commands"][1]
+    assert deploy_node["name"] == "deploy"
+    assert deploy_node["short_help"] == "Deploy the app"
+
+    params = {param["name"]: param for param in deploy_node["params"]}
+    assert params["env"]["type"]["choices"] == ["dev", "staging", "prod"]
+    assert params["force"]["secondary_opts"] == ["--no-force"]
+    assert params["user"]["dynamic"]
+    assert not params["env"]["dynamic"]
+
+    # JSON serializable
+    assert json.loads(json.dumps(manifest)) == manifest
+
+
+def test_option_declarations_are_rebuilt():
+    @click.group()
+    def group():
+        pass
+
+    @group.command()
+    @click.option("--shout/--no-shout", " /-S")
+    @click.option("-q", "--quiet/--loud")
+    @click.option("/debug;/no-debug")
+    @click.option("--name", "-n")
+    def command(**kwargs):
+        pass
+
+    stand_in_group = manifest_cli(build_manifest(group), group)
+    stand_in = stand_in_group.get_command(click.Context(stand_in_group), "command")
+    for param, rebuilt in zip(command.params, stand_in.params):
+        assert (rebuilt.name, rebuilt.opts, rebuilt.secondary_opts) == (
+            param.name,
+            param.opts,
+            param.secondary_opts,
+        )
+
+
+def test_manifest_mapping():
+    c = ClickCompleter(cli, click.Context(cli), manifest=build_manifest(cli))
+    loaded.clear()
+
+    assert completions(c, "db m") == [("migrate", "")]
+    assert loaded == []
+
+
+def test_version_mismatch(tmp_path):
+    path = tmp_path / "old.json"
+    path.write_text(json.dumps({"version": 0, "root": {}}))
+
+    with pytest.raises(ValueError, match="manifest version"):
+        load_manifest(path)
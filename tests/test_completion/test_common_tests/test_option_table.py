@@ -0,0 +1,124 @@
+import click
+from click_repl import ClickCompleter
+from click_repl._index import OptionTable
+from prompt_toolkit.document import Document
+
+
+@click.group()
+def root_command():
+    pass
+
+
+@root_command.command()
+@click.argument("target", type=click.Choice(("alpha", "beta")))
+@click.option("--count", "-c", type=click.Choice(("1", "2")), help="how many")
+@click.option("--color", type=click.Choice(("red", "blue")))
+@click.option("--colour", hidden=True)
+@click.option("--tag", multiple=True, type=click.Choice(("x", "y")))
+@click.option("--point", type=(click.Choice(("p1",)), click.Choice(("p2",))))
+def cmd(target, count, color, colour, tag, point):
+    pass
+
+
+def many_options_command():
+    @root_command.command()
+    @click.argument("value", type=click.Choice(("v1", "v2")))
+    def wide(**kwargs):
+        pass
+
+    for i in range(250):
+        click.option(f"--opt-{i:03}", type=click.Choice(("a", "b")))(wide)
+
+    return wide
+
+
+c = ClickCompleter(root_command, click.Context(root_command))
+
+
+def completion_texts(text):
+    return [x.text for x in c.get_completions(Document(text))]
+
+
+def test_option_table_lookups():
+    table = OptionTable(cmd)
+
+    assert table.search("--co") == ["--count", "--color"]
+    assert table.search("-") == [
+        "--count",
+        "-c",
+        "--color",
+        "--tag",
+        "--point",
+    ]
+    assert "--colour" in table.options and "--colour" not in table.opt_positions
+    assert table.used_positions(["cmd", "-c", "1", "--tag"]) == {1, 4}
+    assert table.find_called_option(["cmd", "--count"]) == (1, 0)
+    assert table.find_called_option(["cmd", "--point", "p1"]) == (5, 1)
+    assert table.find_called_option(["cmd", "--count", "1"]) is None
+
+
+def test_option_completion_through_table():
+    assert completion_texts("cmd --co") == ["--count", "--color"]
+    assert [x.display_meta_text for x in c.get_completions(Document("cmd --cou"))] == [
+        "how many"
+    ]
+    assert completion_texts("cmd -c ") == ["1", "2"]
+    assert completion_texts("cmd --point ") == ["p1"]
+    assert completion_texts("cmd --point p1 ") == ["p2"]
+    assert completion_texts("cmd ") == [
+        "alpha",
+        "beta",
+        "--count",
+        "-c",
+        "--color",
+        "--tag",
+        "--point",
+    ]
+
+
+def test_only_unused_through_table():
+    c.show_only_unused = True
+    try:
+        assert completion_texts("cmd alpha -c 1 --tag x --") == [
+            "--color",
+            "--tag",
+            "--point",
+        ]
+    finally:
+        c.show_only_unused = False
+
+
+def test_table_is_cached_per_command():
+    list(c.get_completions(Document("cmd --c")))
+    table = c._option_tables[cmd]
+
+    list(c.get_completions(Document("cmd --t")))
+    assert c._option_tables[cmd] is table
+
+
+def test_table_is_rebuilt_when_params_change():
+    @root_command.command()
+    @click.option("--first")
+    def changing(first):
+        pass
+
+    assert completion_texts("changing --") == ["--first"]
+
+    click.option("--second")(changing)
+    assert completion_texts("changing --") == ["--first", "--second"]
+
+
+def test_many_options():
+    wide = many_options_command()
+
+    assert completion_texts("wide --opt-24") == [
+        f"--opt-{i}" for i in range(240, 250)
+    ]
+    assert completion_texts("wide " + "--opt-001 a " * 100 + "--opt-249 ") == [
+        "a",
+        "b",
+    ]
+    assert len(completion_texts("wide v1 ")) == 250
+
+    table = c._option_tables[wide]
+    assert len(table.sorted_opts) == 250
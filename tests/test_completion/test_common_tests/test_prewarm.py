@@ -0,0 +1,146 @@
+import threading
+
+import click
+from click_repl import ClickCompleter
+from click_repl._repl import bootstrap_prompt
+from prompt_toolkit.document import Document
+
+
+class LazyGroup(click.Group):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loaded = []
+        self.gate = None
+
+    def get_command(self, ctx, name):
+        if self.gate is not None:
+            self.gate.wait()
+        self.loaded.append(name)
+        return super().get_command(ctx, name)
+
+
+def make_cli():
+    @click.group(cls=LazyGroup)
+    def cli():
+        pass
+
+    @cli.command()
+    @click.option("--env", type=click.Choice(["dev", "staging", "prod"]))
+    def deploy(env):
+        pass
+
+    @cli.group()
+    def db():
+        pass
+
+    @db.command()
+    @click.option("--force", is_flag=True)
+    def migrate(force):
+        pass
+
+    @cli.command(hidden=True)
+    def debug():
+        pass
+
+    return cli
+
+
+def test_prewarm_builds_completion_structures():
+    cli = make_cli()
+    c = ClickCompleter(cli, click.Context(cli), use_command_index=True)
+
+    prewarmer = c.prewarm()
+    assert prewarmer.wait(5)
+    assert prewarmer.done
+    assert c.prewarm() is prewarmer
+
+    assert {"deploy", "db", "debug"} <= set(cli.loaded)
+    assert cli in c._command_indexes
+    assert cli.commands["db"] in c._command_indexes
+    assert cli.commands["deploy"] in c._option_tables
+    assert cli.commands["db"].commands["migrate"] in c._option_tables
+    assert cli.commands["debug"] not in c._option_tables
+    assert len(c._choice_indexes) == 1
+
+    assert c.context_cache.get_resolved(("deploy",)) is not None
+    assert c.context_cache.get_resolved(("db", "migrate")) is not None
+
+    # Completing doesn't need to load or build anything else
+    cli.loaded.clear()
+    info = c.context_cache.info()
+    texts = [x.text for x in c.get_completions(Document("deploy "))]
+    assert texts == ["--env"]
+    assert cli.loaded == []
+    assert c.context_cache.info().hits == info.hits + 1
+    assert c.context_cache.info().misses == info.misses
+
+
+def test_prewarm_skips_failing_groups():
+    class BrokenGroup(click.Group):
+        def list_commands(self, ctx):
+            raise RuntimeError("broken")
+
+    cli = make_cli()
+    cli.add_command(BrokenGroup("broken"))
+    c = ClickCompleter(cli, click.Context(cli), use_command_index=True)
+
+    prewarmer = c.prewarm()
+    assert prewarmer.wait(5)
+    assert cli.commands["db"].commands["migrate"] in c._option_tables
+    assert len(c._choice_indexes) == 1
+
+
+def test_completions_while_prewarming():
+    cli = make_cli()
+    expected = [
+        x.text
+        for x in ClickCompleter(cli, click.Context(cli)).get_completions(
+            Document("db migrate --")
+        )
+    ]
+
+    c = ClickCompleter(cli, click.Context(cli), fuzzy=True)
+    prewarmer = c.prewarm()
+    for _ in range(50):
+        texts = [x.text for x in c.get_completions(Document("db migrate --"))]
+        assert texts == expected
+
+    assert prewarmer.wait(5)
+
+
+def test_time_to_warm():
+    cli = make_cli()
+    c = ClickCompleter(cli, click.Context(cli), collect_stats=True)
+
+    prewarmer = c.prewarm()
+    assert prewarmer.wait(5)
+
+    assert prewarmer.duration is not None and prewarmer.duration > 0
+    assert c.stats.summary()["prewarm"].samples == 1
+
+
+def test_cancel():
+    cli = make_cli()
+    cli.gate = threading.Event()
+    c = ClickCompleter(cli, click.Context(cli))
+
+    prewarmer = c.prewarm()
+    assert prewarmer.duration is None
+
+    prewarmer.cancel()
+    cli.gate.set()
+    assert prewarmer.wait(5)
+    # Only the command being loaded when cancelled
+    assert set(cli.loaded) == {"db"}
+
+
+def test_bootstrap_prompt():
+    cli = make_cli()
+    ctx = click.Context(cli)
+
+    completer = bootstrap_prompt(cli, {}, ctx, prewarm=True)["completer"]
+    assert completer._prewarmer is not None
+    assert completer._prewarmer.wait(5)
+
+    completer = bootstrap_prompt(cli, {}, ctx)["completer"]
+    assert completer._prewarmer is None
@@ -0,0 +1,132 @@
+import click
+import pytest
+from click_repl import ClickCompleter, cached_completion, match_candidates
+from click_repl import _cache, _vectorized
+from prompt_toolkit.document import Document
+
+try:
+    import click.shell_completion  # noqa: F401
+
+    AUTOCOMPLETION_KWARG = "shell_complete"
+except ImportError:
+    AUTOCOMPLETION_KWARG = "autocompletion"
+
+
+VALUES = [f"host-{i:05}" for i in range(2_000)] + ["other", "hostname"]
+
+
+def hosts(ctx, param_or_args, incomplete):
+    return [(value, "meta") for value in VALUES if value.startswith(incomplete)]
+
+
+vectorized_hosts = cached_completion(vectorize_threshold=100)(hosts)
+python_hosts = cached_completion(vectorize_threshold=None)(hosts)
+
+
+@click.group()
+def root_command():
+    pass
+
+
+@root_command.command()
+@click.argument("host", **{AUTOCOMPLETION_KWARG: vectorized_hosts})
+def fast(host):
+    pass
+
+
+@root_command.command()
+@click.argument("host", **{AUTOCOMPLETION_KWARG: python_hosts})
+def slow(host):
+    pass
+
+
+c = ClickCompleter(root_command, click.Context(root_command))
+
+
+def completions(text):
+    return [
+        (x.text, x.start_position, x.display_meta_text)
+        for x in c.get_completions(Document(text))
+    ]
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    vectorized_hosts.cache_clear()
+    python_hosts.cache_clear()
+
+
+@pytest.mark.parametrize("substring", [False, True])
+def test_backends_match_the_same_candidates(substring):
+    pytest.importorskip("numpy")
+
+    for text in ["host-01", "name", "", "x", "host-019"]:
+        expected = match_candidates(VALUES, text, substring, threshold=None)
+        assert match_candidates(VALUES, text, substring, threshold=1) == expected
+
+
+def test_candidate_array():
+    pytest.importorskip("numpy")
+
+    array = _vectorized.CandidateArray(["alpha", "beta", "alps"])
+    assert array.match("al") == [0, 2]
+    assert array.match("ta", substring=True) == [1]
+
+    narrowed = array.take([0, 2])
+    assert len(narrowed) == 2
+    assert narrowed.match("alp") == [0, 1]
+
+
+def test_cached_results_are_filtered_vectorized():
+    pytest.importorskip("numpy")
+
+    for text in ["", "host-01", "host-019", "host-0199"]:
+        assert completions("fast " + text) == completions("slow " + text)
+
+    cache = vectorized_hosts.cache_clear.__self__
+    assert cache.info().hits == 3
+    assert any(entry.array is not None for entry in cache._cache._data.values())
+
+
+def test_fallback_without_numpy(monkeypatch):
+    monkeypatch.setattr(_vectorized, "HAS_NUMPY", False)
+    monkeypatch.setattr(_cache, "HAS_NUMPY", False)
+
+    assert match_candidates(VALUES, "host-0199", threshold=1) == [
+        VALUES.index(f"host-0199{i}") for i in range(10)
+    ]
+
+    for text in ["", "host-01", "host-019"]:
+        assert completions("fast " + text) == completions("slow " + text)
+
+
+def test_long_outliers_dont_widen_the_array(monkeypatch):
+    pytest.importorskip("numpy")
+
+    values = VALUES + ["host-" + "x" * 2_000]
+    expected = match_candidates(values, "host-01", threshold=None)
+    monkeypatch.setattr(_vectorized, "FIXED_WIDTH_BUDGET", 1_000)
+
+    if _vectorized._StringDType is not None:
+        array = _vectorized.CandidateArray(values)
+        assert array._array.dtype.kind != "U"
+        assert array.match("host-01") == expected
+        assert array.take([0, len(values) - 1]).match("host-x") == [1]
+
+    monkeypatch.setattr(_vectorized, "_StringDType", None)
+    with pytest.raises(MemoryError):
+        _vectorized.CandidateArray(values)
+
+    assert match_candidates(values, "host-01", threshold=1) == expected
+
+
+def test_cache_falls_back_when_the_array_does_not_fit(monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(_vectorized, "FIXED_WIDTH_BUDGET", 1_000)
+    monkeypatch.setattr(_vectorized, "_StringDType", None)
+
+    for text in ["", "host-01", "host-019"]:
+        assert completions("fast " + text) == completions("slow " + text)
+
+    cache = vectorized_hosts.cache_clear.__self__
+    assert all(entry.array is None for entry in cache._cache._data.values())
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import threading
+import time
+
+import click
+import pytest
+from click_repl import ClickCompleter
+from click_repl import _paths
+from click_repl._completer import TRUNCATED_COMPLETION
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+
+
+@click.group()
+def root_command():
+    pass
+
+
+@root_command.command()
+@click.argument("path", type=click.Path())
+@click.option("--verbose", is_flag=True)
+def show(path, verbose):
+    pass
+
+
+NAMES = [f"file-{i}.txt" for i in range(10)]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in NAMES:
+        (tmp_path / name).write_text("")
+    (tmp_path / "sub").mkdir()
+    return tmp_path
+
+
+class SlowMount:
+    """Replaces os.scandir with a version that waits before each entry."""
+
+    def __init__(self, monkeypatch):
+        self.delay = 0.0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.calls = []
+        scandir = os.scandir
+
+        def slow_scandir(path):
+            self.calls.append(path)
+            return _SlowIterator(scandir(path), self)
+
+        monkeypatch.setattr(_paths.os, "scandir", slow_scandir)
+
+
+class _SlowIterator:
+    def __init__(self, iterator, mount):
+        self.iterator = iterator
+        self.mount = mount
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.iterator.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.mount.gate.wait(5)
+        time.sleep(self.mount.delay)
+        return next(self.iterator)
+
+
+@pytest.fixture
+def mount(monkeypatch):
+    mount = SlowMount(monkeypatch)
+    yield mount
+    mount.gate.set()
+
+
+def complete(completer, text):
+    async def collect():
+        return [
+            x
+            async for x in completer.get_completions_async(
+                Document(text), CompleteEvent()
+            )
+        ]
+
+    return asyncio.run(collect())
+
+
+def completer_for(**kwargs):
+    return ClickCompleter(
+        root_command, click.Context(root_command), async_path_completion=True, **kwargs
+    )
+
+
+def test_entries_are_streamed(tree, mount):
+    c = completer_for()
+    completions = complete(c, f"show {tree}{os.sep}file-1")
+
+    assert [x.text for x in completions] == [os.path.join(str(tree), "file-1.txt")]
+    assert c._path_scan.done.is_set()
+
+    # The finished listing is cached
+    completions = complete(c, f"show {tree}{os.sep}")
+    assert len(completions) == len(NAMES) + 1
+    assert len(mount.calls) == 1
+
+
+def test_deadline_truncates_slow_scan(tree, mount):
+    mount.delay = 0.03
+    c = completer_for(path_scan_deadline=0.1)
+
+    completions = complete(c, f"show {tree}{os.sep}")
+    assert 0 < len(completions) < len(NAMES) + 1
+    assert completions[-1] is TRUNCATED_COMPLETION
+
+    # The scan goes on in the background, and is reused once it's done
+    assert c._path_scan.done.wait(5)
+    completions = complete(c, f"show {tree}{os.sep}")
+    assert TRUNCATED_COMPLETION not in completions
+    assert len(completions) == len(NAMES) + 1
+    assert len(mount.calls) == 1
+
+
+def test_hanging_mount_does_not_block(tree, mount):
+    mount.gate.clear()
+    c = completer_for(path_scan_deadline=0.05)
+
+    start = time.monotonic()
+    assert complete(c, f"show {tree}{os.sep}") == [TRUNCATED_COMPLETION]
+    assert time.monotonic() - start < 1
+
+    completions = complete(c, f"show {tree}{os.sep}file-1.txt ")
+    assert [x.text for x in completions] == ["--verbose"]
+
+
+def test_typing_elsewhere_cancels_scan(tree, mount):
+    mount.gate.clear()
+    c = completer_for(path_scan_deadline=0.01)
+
+    complete(c, f"show {tree}{os.sep}")
+    scan = c._path_scan
+    assert not scan.cancelled.is_set()
+
+    # Same directory: the running scan is reused
+    complete(c, f"show {tree}{os.sep}f")
+    assert c._path_scan is scan
+
+    complete(c, f"show {tree}{os.sep}sub{os.sep}")
+    assert scan.cancelled.is_set()
+
+    new_scan = c._path_scan
+    complete(c, "sh")
+    assert new_scan.cancelled.is_set()
+    assert c._path_scan is None
+
+    mount.gate.set()
+    assert scan.done.wait(5)
+    assert len(scan.entries) < len(NAMES) + 1
+
+
+def test_synchronous_completion_is_unchanged(tree, mount):
+    c = completer_for()
+    texts = [x.text for x in c.get_completions(Document(f"show {tree}{os.sep}file-1"))]
+
+    assert texts == [os.path.join(str(tree), "file-1.txt")]
+    assert c._path_scan is None
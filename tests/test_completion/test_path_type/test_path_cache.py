@@ -0,0 +1,101 @@
+import os
+
+import click
+import pytest
+from click_repl import ClickCompleter
+from click_repl import _paths
+from prompt_toolkit.document import Document
+
+
+@click.group()
+def root_command():
+    pass
+
+
+@root_command.command()
+@click.argument("path", type=click.Path())
+def any_path(path):
+    pass
+
+
+@root_command.command()
+@click.argument("path", type=click.Path(file_okay=False))
+def dir_path(path):
+    pass
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ("alpha.txt", "apex.txt", "beta.txt", ".hidden"):
+        (tmp_path / name).write_text("")
+    (tmp_path / "archive").mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def completer():
+    return ClickCompleter(root_command, click.Context(root_command))
+
+
+@pytest.fixture
+def scandir_calls(monkeypatch):
+    calls = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        calls.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(_paths.os, "scandir", counting_scandir)
+    return calls
+
+
+def displays(completer, text):
+    return [x.display[0][1] for x in completer.get_completions(Document(text))]
+
+
+def test_prefix_search(completer, tree):
+    prefix = f"any-path {tree}{os.sep}"
+
+    assert displays(completer, prefix + "a") == ["alpha.txt", "apex.txt", "archive"]
+    assert displays(completer, prefix + "ap") == ["apex.txt"]
+    assert displays(completer, prefix + "x") == []
+
+    completion = next(completer.get_completions(Document(prefix + "ap")))
+    assert completion.text == os.path.join(str(tree), "apex.txt")
+
+
+def test_hidden_entries(completer, tree):
+    prefix = f"any-path {tree}{os.sep}"
+
+    assert ".hidden" not in displays(completer, prefix)
+    assert displays(completer, prefix + ".") == [".hidden"]
+
+
+def test_file_okay(completer, tree):
+    assert displays(completer, f"dir-path {tree}{os.sep}a") == ["archive"]
+
+
+def test_max_completions(completer, tree):
+    completer.max_completions = 2
+    assert displays(completer, f"any-path {tree}{os.sep}") == ["alpha.txt", "apex.txt"]
+
+
+def test_listing_is_cached_until_modified(completer, tree, scandir_calls):
+    prefix = f"any-path {tree}{os.sep}"
+
+    displays(completer, prefix + "a")
+    displays(completer, prefix + "al")
+    displays(completer, prefix + "b")
+    assert len(scandir_calls) == 1
+
+    (tree / "beta-2.txt").write_text("")
+    mtime = os.stat(tree).st_mtime_ns
+    os.utime(tree, ns=(mtime, mtime + 10**9))
+
+    assert displays(completer, prefix + "b") == ["beta-2.txt", "beta.txt"]
+    assert len(scandir_calls) == 2
+
+
+def test_missing_directory(completer, tree):
+    assert displays(completer, f"any-path {tree}{os.sep}missing{os.sep}") == []
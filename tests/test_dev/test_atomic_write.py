@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from click_repl.utils import _atomic_write
+
+
+def test_atomic_write(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(b"old")
+
+    with _atomic_write(path) as f:
+        f.write(b"new")
+        assert path.read_bytes() == b"old"
+
+    assert path.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == ["data"]
+
+
+def test_failed_write_keeps_the_file(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(b"old")
+
+    with pytest.raises(RuntimeError):
+        with _atomic_write(path) as f:
+            f.write(b"partial")
+            raise RuntimeError()
+
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["data"]
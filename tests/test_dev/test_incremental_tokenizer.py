@@ -0,0 +1,93 @@
+import random
+import shlex
+
+import pytest
+
+from click_repl import utils
+from click_repl.utils import IncrementalTokenizer, split_arg_string
+
+
+LINES = [
+    "",
+    "cmd",
+    "cmd sub --opt value",
+    "cmd   sub  ",
+    "cmd 'my file",
+    'cmd "quoted arg" next',
+    "cmd 'a'b c",
+    'cmd a"b c"d',
+    "cmd my\\",
+    "cmd my\\ file other",
+    "cmd '' x",
+    "cmd\tsub\nother",
+]
+
+
+def typed_prefixes(line):
+    return [line[:i] for i in range(len(line) + 1)]
+
+
+@pytest.mark.parametrize("posix", [False, True])
+@pytest.mark.parametrize("line", LINES)
+def test_typing_matches_split_arg_string(line, posix):
+    tokenizer = IncrementalTokenizer(posix=posix)
+
+    for text in typed_prefixes(line):
+        assert tokenizer.split(text) == split_arg_string(text, posix=posix)
+
+    # Deleting characters from the end again.
+    for text in reversed(typed_prefixes(line)):
+        assert tokenizer.split(text) == split_arg_string(text, posix=posix)
+
+
+@pytest.mark.parametrize("posix", [False, True])
+def test_random_edits_match_split_arg_string(posix):
+    rng = random.Random(0)
+    alphabet = "ab -'\"\\"
+    tokenizer = IncrementalTokenizer(posix=posix)
+    text = ""
+
+    for _ in range(500):
+        action = rng.random()
+        if action < 0.6:
+            text += rng.choice(alphabet)
+        elif action < 0.8:
+            text = text[:-1]
+        else:
+            pos = rng.randint(0, len(text))
+            text = text[:pos] + rng.choice(alphabet) + text[pos + 1 :]
+
+        assert tokenizer.split(text) == split_arg_string(text, posix=posix)
+
+
+def test_only_the_tail_is_relexed(monkeypatch):
+    lexed = []
+
+    class RecordingShlex(shlex.shlex):
+        def __init__(self, instream, *args, **kwargs):
+            lexed.append(instream)
+            super().__init__(instream, *args, **kwargs)
+
+    monkeypatch.setattr(utils.shlex, "shlex", RecordingShlex)
+
+    tokenizer = IncrementalTokenizer(posix=False)
+    ids = " ".join(str(i) for i in range(300))
+
+    assert len(tokenizer.split("bulk " + ids)) == 301
+    assert tokenizer.split("bulk " + ids + "0")[-2:] == ["298", "2990"]
+    assert lexed[-1] == "2990"
+
+    assert tokenizer.split("bulk " + ids + "0 '")[-2:] == ["2990", "'"]
+    assert lexed[-1] == "2990 '"
+
+    # Arbitrary edits lex the whole line again.
+    tokenizer.split("x" + ids)
+    assert lexed[-1] == "x" + ids
+
+
+def test_split_returns_a_copy():
+    tokenizer = IncrementalTokenizer()
+    tokenizer.split("cmd sub ")
+    tokenizer.split("cmd sub ").pop()
+
+    assert tokenizer.split("cmd sub ") == ["cmd", "sub"]
@@ -21,6 +21,9 @@ def test_internal_help_commands(capsys, test_input):
     prefix internal commands with ":"
     :exit, :q, :quit  exits the repl
     :?, :h, :help     displays general help information
+    :stats            displays completion timing statistics
+    :history          lists the past commands containing a pattern
+    :source           runs the commands of a file, one per line
 
 """
     )
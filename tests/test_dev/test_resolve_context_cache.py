@@ -0,0 +1,137 @@
+import click
+import pytest
+
+from click_repl._cache import ContextCache, LRUCache
+from click_repl.utils import _resolve_context
+
+
+resolved_names = []
+
+
+class CountingGroup(click.Group):
+    def resolve_command(self, ctx, args):
+        resolved_names.append(args[0])
+        return super().resolve_command(ctx, args)
+
+
+@click.group(cls=CountingGroup)
+def root_command():
+    pass
+
+
+@root_command.group(cls=CountingGroup)
+@click.option("--region")
+def cloud(region):
+    pass
+
+
+@cloud.group(cls=CountingGroup)
+def vm():
+    pass
+
+
+@vm.command()
+@click.argument("names", nargs=-1)
+@click.option("--size")
+def create(names, size):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def reset_resolved_names():
+    resolved_names.clear()
+
+
+def command_path(ctx):
+    return ctx.command_path
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["cloud"],
+        ["cloud", "--region", "eu", "vm"],
+        ["cloud", "vm", "create", "a", "--size", "1"],
+        ["cloud", "unknown", "create"],
+    ],
+)
+def test_cached_context_matches_uncached(args):
+    cache = ContextCache()
+    root_ctx = click.Context(root_command, info_name="root")
+
+    uncached = _resolve_context(args, root_ctx)
+    cached = _resolve_context(args, root_ctx, cache=cache)
+    assert command_path(cached) == command_path(uncached)
+    assert cached.params == uncached.params
+
+    # Second lookup is served from the cache.
+    assert _resolve_context(args, root_ctx, cache=cache) is cached
+
+
+def test_resume_from_cached_ancestor():
+    cache = ContextCache()
+    root_ctx = click.Context(root_command, info_name="root")
+
+    ctx = _resolve_context(["cloud", "--region", "eu", "vm", "create"], root_ctx, cache)
+    assert resolved_names == ["cloud", "vm", "create"]
+    assert ctx.parent.parent.params == {"region": "eu"}
+
+    resolved_names.clear()
+    ctx = _resolve_context(
+        ["cloud", "--region", "eu", "vm", "create", "a", "b"], root_ctx, cache
+    )
+    # "cloud" and "vm" were not resolved again.
+    assert resolved_names == ["create"]
+    assert ctx.params["names"] == ("a", "b")
+    assert ctx.parent.parent.params == {"region": "eu"}
+
+    info = cache.info()
+    assert (info.hits, info.partial_hits, info.misses) == (0, 1, 1)
+
+
+def test_unresolved_commands_are_not_cached():
+    cache = ContextCache()
+    root_ctx = click.Context(root_command, info_name="root", resilient_parsing=True)
+
+    assert _resolve_context(["later"], root_ctx, cache) is root_ctx
+    assert len(cache) == 0
+
+
+def test_context_cache_is_bounded():
+    cache = ContextCache(maxsize=2)
+    root_ctx = click.Context(root_command, info_name="root")
+
+    for size in range(5):
+        _resolve_context(
+            ["cloud", "vm", "create", "--size", str(size)], root_ctx, cache
+        )
+
+    assert len(cache) == 2
+    cache.clear()
+    assert cache.info() == (0, 0, 0, 2, 0)
+
+
+def test_lru_cache_eviction_order():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.info() == (1, 1, 2, 2)
+
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=0)
+
+
+def test_ancestor_requires_same_subcommand_token():
+    cache = ContextCache()
+    root_ctx = click.Context(root_command, info_name="root")
+
+    _resolve_context(["cloud", "vm"], root_ctx, cache)
+    ctx = _resolve_context(["cloud", "--region", "us", "vm", "create"], root_ctx, cache)
+
+    assert ctx.command is create
+    assert ctx.parent.parent.params == {"region": "us"}
@@ -0,0 +1,121 @@
+import click
+import pytest
+from prompt_toolkit.document import Document
+
+import click_repl
+from click_repl import ClickCompleter
+from click_repl._stats import CompletionStats, Histogram
+from tests import mock_stdin
+
+try:
+    import click.shell_completion  # noqa: F401
+
+    AUTOCOMPLETION_KWARG = "shell_complete"
+except ImportError:
+    AUTOCOMPLETION_KWARG = "autocompletion"
+
+
+@click.group(invoke_without_command=True)
+@click.pass_context
+def cli(ctx):
+    if ctx.invoked_subcommand is None:
+        click_repl.repl(ctx, prompt_kwargs={"completer": completer})
+
+
+@cli.command()
+@click.argument("name", **{AUTOCOMPLETION_KWARG: lambda *args: ["alpha", "beta"]})
+def greet(name):
+    pass
+
+
+@cli.command()
+@click_repl.pass_context
+def show_stats(repl_ctx):
+    stats = repl_ctx.completion_stats
+    print(stats is completer.stats, sorted(stats.summary()))
+
+
+completer = ClickCompleter(cli, click.Context(cli))
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    completer.stats.enabled = False
+    completer.stats.reset()
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for duration in [1_500] * 90 + [300_000] * 10:
+        histogram.add(duration)
+
+    summary = histogram.summary()
+    assert summary.samples == 100
+    assert summary.p50 == 2e-6
+    assert summary.p99 == 3e-4
+    assert summary.max == 3e-4
+    assert summary.mean == pytest.approx((1_500 * 90 + 300_000 * 10) / 100 / 1e9)
+
+
+def test_disabled_stats_record_nothing():
+    stats = CompletionStats()
+    assert stats.timer("total") is stats.timer("resolve")
+
+    list(completer.get_completions(Document("greet ")))
+    assert completer.stats.summary() == {}
+
+
+def test_phases_are_recorded():
+    completer.stats.enabled = True
+    list(completer.get_completions(Document("gr")))
+    list(completer.get_completions(Document("greet ")))
+
+    summary = completer.stats.summary()
+    assert list(summary) == [
+        "tokenize",
+        "resolve",
+        "params",
+        "callbacks",
+        "subcommands",
+        "total",
+    ]
+    assert summary["total"].samples == 2
+    assert summary["callbacks"].samples == 1
+
+    completer.stats.reset()
+    assert completer.stats.summary() == {}
+
+
+def test_repl_ctx_stats_and_internal_command(capsys):
+    completer.stats.enabled = True
+    list(completer.get_completions(Document("gr")))
+    list(completer.get_completions(Document("greet ")))
+
+    with mock_stdin("show-stats\n:stats\n"):
+        with pytest.raises(SystemExit):
+            cli(args=[], prog_name="test_stats")
+
+    lines = capsys.readouterr().out.replace("\r\n", "\n").splitlines()
+    assert lines[0] == (
+        "True ['callbacks', 'params', 'resolve', 'subcommands', 'tokenize', 'total']"
+    )
+    assert lines[1].split() == ["phase", "count", "mean", "p50", "p90", "p99", "max"]
+    assert [line.split()[0] for line in lines[2:8]] == [
+        "tokenize",
+        "resolve",
+        "params",
+        "callbacks",
+        "subcommands",
+        "total",
+    ]
+
+
+def test_internal_command_when_disabled(capsys):
+    with mock_stdin(":stats\n"):
+        with pytest.raises(SystemExit):
+            cli(args=[], prog_name="test_stats")
+
+    assert capsys.readouterr().out.replace("\r\n", "\n") == (
+        "Recording of completion statistics is disabled\n"
+        "No completion statistics recorded\n"
+    )
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+from prompt_toolkit.history import FileHistory
+
+from click_repl import MappedFileHistory
+
+ENTRIES = ["ls", "multi\nline", "", "héllo wörld", "+plus", "echo '# not a comment'"]
+
+
+async def _load(history):
+    return [item async for item in history.load()]
+
+
+def load(history):
+    return asyncio.run(_load(history))
+
+
+def test_reads_file_history(tmp_path):
+    path = tmp_path / "history"
+    file_history = FileHistory(path)
+    for entry in ENTRIES:
+        file_history.store_string(entry)
+
+    history = MappedFileHistory(path)
+    assert list(history.load_history_strings()) == ENTRIES[::-1]
+    assert load(history) == ENTRIES[::-1]
+
+
+def test_writes_file_history(tmp_path):
+    path = tmp_path / "history"
+    history = MappedFileHistory(path)
+    for entry in ENTRIES:
+        history.append_string(entry)
+
+    assert list(FileHistory(path).load_history_strings()) == ENTRIES[::-1]
+
+
+def test_missing_file(tmp_path):
+    history = MappedFileHistory(tmp_path / "history")
+    assert load(history) == []
+
+    history.append_string("ls")
+    assert load(history) == ["ls"]
+    assert list(history.load_history_strings()) == ["ls"]
+
+
+def test_only_the_tail_is_loaded(tmp_path):
+    path = tmp_path / "history"
+    entries = [f"cmd {i}" for i in range(500)]
+    file_history = FileHistory(path)
+    for entry in entries:
+        file_history.store_string(entry)
+
+    history = MappedFileHistory(path, tail_size=10)
+    assert load(history) == entries[:-11:-1]
+    assert list(history.load_history_strings()) == entries[::-1]
+
+    assert load(MappedFileHistory(path, tail_size=None)) == entries[::-1]
+
+
+def test_appends_of_other_processes(tmp_path):
+    path = tmp_path / "history"
+    first = MappedFileHistory(path)
+    second = MappedFileHistory(path)
+
+    first.append_string("a")
+    assert list(second.load_history_strings()) == ["a"]
+
+    second.append_string("b")
+    first.append_string("c\nd")
+    second.append_string("e")
+
+    assert list(first.load_history_strings()) == ["e", "c\nd", "b", "a"]
+    assert list(second.load_history_strings()) == ["e", "c\nd", "b", "a"]
+
+
+def test_concurrent_appends(tmp_path):
+    path = tmp_path / "history"
+
+    def append(n):
+        history = MappedFileHistory(path)
+        for i in range(200):
+            history.store_string(f"writer {n}\ncommand {i}")
+
+    threads = [threading.Thread(target=append, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    entries = list(MappedFileHistory(path).load_history_strings())
+    assert sorted(entries) == sorted(
+        f"writer {n}\ncommand {i}" for n in range(4) for i in range(200)
+    )
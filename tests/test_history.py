@@ -0,0 +1,149 @@
+import click
+import pytest
+
+import click_repl
+from click_repl import _history
+from click_repl._history import RingHistory
+from tests import mock_stdin
+
+
+def test_ring_buffer():
+    history = RingHistory(3)
+    for i in range(5):
+        history.append(f"cmd {i}")
+
+    assert len(history) == 3
+    assert list(history) == ["cmd 2", "cmd 3", "cmd 4"]
+    assert list(reversed(history)) == ["cmd 4", "cmd 3", "cmd 2"]
+    assert list(history.recent()) == ["cmd 4", "cmd 3", "cmd 2"]
+
+
+def test_unbounded():
+    history = RingHistory()
+    for i in range(1_000):
+        history.append(str(i))
+
+    assert len(history) == 1_000
+    assert next(history.recent()) == "999"
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        RingHistory(0)
+
+
+def test_spill_file(tmp_path, monkeypatch):
+    # Read back in blocks much smaller than the file
+    monkeypatch.setattr(_history, "_BLOCK_SIZE", 7)
+    path = tmp_path / "history"
+
+    commands = [f"cmd {i}" for i in range(50)]
+    commands[10] = "echo 'multi\nline' \\n \\"
+    commands[11] = "héllo wörld"
+
+    history = RingHistory(4, path)
+    for command in commands:
+        history.append(command)
+
+    assert len(history) == 4
+    assert list(history.recent()) == commands[::-1]
+
+    history.close()
+    assert path.read_text(encoding="utf-8").count("\n") == 46
+
+    # Commands spilled in previous sessions are part of the history
+    history = RingHistory(4, path)
+    history.append("new")
+    assert list(history.recent()) == ["new"] + commands[-5::-1]
+
+
+def test_spill_file_is_reopened(tmp_path):
+    path = tmp_path / "history"
+    history = RingHistory(1, path)
+
+    history.append("a")
+    history.append("b")
+    history.close()
+    history.append("c")
+
+    assert list(history.recent()) == ["c", "b", "a"]
+    history.close()
+
+
+def test_repl_history(capsys, tmp_path):
+    path = tmp_path / "history"
+
+    @click.group(invoke_without_command=True)
+    @click.pass_context
+    def cli(ctx):
+        if ctx.invoked_subcommand is None:
+            click_repl.repl(ctx, history_size=2, history_file=path)
+
+    @cli.command()
+    def hello():
+        pass
+
+    @cli.command()
+    @click_repl.pass_context
+    def history(repl_ctx):
+        print(list(repl_ctx.history()))
+
+    with mock_stdin("hello\nhello\nhello\nhistory\n"):
+        with pytest.raises(SystemExit):
+            cli(args=[], prog_name="test_repl_history")
+
+    assert capsys.readouterr().out == "['history', 'hello', 'hello', 'hello']\n"
+    assert path.read_text() == "hello\nhello\n"
+
+
+def test_repl_history_is_unbounded_by_default(capsys):
+    @click.group(invoke_without_command=True)
+    @click.pass_context
+    def cli(ctx):
+        if ctx.invoked_subcommand is None:
+            click_repl.repl(ctx)
+
+    @cli.command()
+    @click.argument("n")
+    def hello(n):
+        pass
+
+    @cli.command()
+    @click_repl.pass_context
+    def count(repl_ctx):
+        print(len(list(repl_ctx.history())))
+
+    stdin = "".join(f"hello {i}\n" for i in range(1_500)) + "count\n"
+    with mock_stdin(stdin):
+        with pytest.raises(SystemExit):
+            cli(args=[], prog_name="test_repl_history_is_unbounded_by_default")
+
+    assert capsys.readouterr().out == "1501\n"
+
+
+def test_batch_history_is_bounded_by_default(capsys, monkeypatch):
+    monkeypatch.setattr(click_repl._repl, "BATCH_HISTORY_SIZE", 100)
+
+    @click.group(invoke_without_command=True)
+    @click.pass_context
+    def cli(ctx):
+        if ctx.invoked_subcommand is None:
+            click_repl.repl(ctx, batch_mode=True)
+
+    @cli.command()
+    @click.argument("n")
+    def hello(n):
+        pass
+
+    @cli.command()
+    @click_repl.pass_context
+    def history(repl_ctx):
+        commands = list(repl_ctx.history())
+        print(len(commands), commands[-1])
+
+    stdin = "".join(f"hello {i}\n" for i in range(1_500)) + "history\n"
+    with mock_stdin(stdin):
+        with pytest.raises(SystemExit):
+            cli(args=[], prog_name="test_batch_history_is_bounded_by_default")
+
+    assert capsys.readouterr().out == "100 hello 1401\n"
@@ -0,0 +1,236 @@
+import mmap
+import os
+import types
+
+import click
+import pytest
+from prompt_toolkit.buffer import Buffer, CompletionState
+from prompt_toolkit.completion import Completion
+from prompt_toolkit.history import FileHistory, InMemoryHistory
+from prompt_toolkit.key_binding import KeyBindings
+
+import click_repl
+from click_repl import MappedFileHistory, _file_history
+from click_repl._repl import bootstrap_prompt
+from click_repl._history_search import (
+    TrigramIndex,
+    history_search_key_bindings,
+    search_entries,
+)
+from tests import mock_stdin
+
+ENTRIES = [
+    f"deploy --region {region} --replicas {i}"
+    for i in range(400)
+    for region in ("eu-west", "us-east", "ap-south")
+] + ["status", "Deploy --region EU-WEST --replicas 1", "ls\nstatus"]
+
+
+@pytest.fixture
+def history_file(tmp_path):
+    path = tmp_path / "history"
+    file_history = FileHistory(path)
+    for entry in ENTRIES:
+        file_history.store_string(entry)
+
+    return path
+
+
+def test_search_entries():
+    entries = ["ls -l", "LS", "cd /", "ls -l", "echo ls"]
+    assert search_entries(entries, "ls") == ["ls -l", "LS", "echo ls"]
+    assert search_entries(entries, "ls", limit=2) == ["ls -l", "LS"]
+    assert search_entries(entries, "") == ["ls -l", "LS", "cd /", "echo ls"]
+    assert search_entries(entries, "rm") == []
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    ["eu-west --replicas 1", "REPLICAS 29", "stat", "s\ns", "ls", "", "missing"],
+)
+def test_search(history_file, pattern):
+    expected = search_entries(reversed(ENTRIES), pattern, limit=15)
+    assert MappedFileHistory(history_file).search(pattern, limit=15) == expected
+
+
+def test_search_new_entries(history_file):
+    history = MappedFileHistory(history_file)
+    other = MappedFileHistory(history_file)
+    assert history.search("rollback") == []
+
+    history.append_string("rollback --to 3")
+    other.append_string("rollback --to 2")
+    assert history.search("rollback") == ["rollback --to 2", "rollback --to 3"]
+
+
+def test_saved_index(history_file, monkeypatch):
+    history = MappedFileHistory(history_file)
+    history.search("eu-west")
+    index_path = f"{history_file}.idx"
+    # Indexing the whole file at once saves the index right away
+    assert os.path.exists(index_path)
+
+    history.append_string("rollback --to 3")
+    assert history.search("rollback") == ["rollback --to 3"]
+    assert history.save_search_index()
+    assert not history.save_search_index()
+
+    indexed = []
+    update = TrigramIndex.update
+
+    def spy(self, entries, data, size):
+        entries = list(entries)
+        indexed.extend(text for _, _, text in entries)
+        return update(self, entries, data, size)
+
+    monkeypatch.setattr(TrigramIndex, "update", spy)
+
+    MappedFileHistory(history_file).append_string("rollback --to 2")
+    history = MappedFileHistory(history_file)
+    assert history.search("rollback") == ["rollback --to 2", "rollback --to 3"]
+    # Only the entry appended since the index was saved is indexed
+    assert indexed == ["rollback --to 2"]
+
+
+def test_index_format(history_file):
+    history = MappedFileHistory(history_file)
+    history.search("eu-west")
+
+    with open(f"{history_file}.idx", "rb") as f:
+        header = f.readline().split()
+    assert header[:2] == [b"click-repl-history-index", b"2"]
+    assert int(header[3]) == os.path.getsize(history_file)
+
+    other = MappedFileHistory(history_file)
+    assert other.search("eu-west --replicas 1") == history.search(
+        "eu-west --replicas 1"
+    )
+    assert len(other._index) == len(history._index) == len(ENTRIES)
+
+
+def test_truncated_index(history_file):
+    MappedFileHistory(history_file).search("eu-west")
+    index_path = f"{history_file}.idx"
+    with open(index_path, "rb+") as f:
+        f.truncate(os.path.getsize(index_path) // 2)
+
+    index = TrigramIndex(index_path)
+    with open(history_file, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            assert not index.load(data)
+
+    history = MappedFileHistory(history_file)
+    assert history.search("status") == ["ls\nstatus", "status"]
+
+
+def test_stale_index(history_file, tmp_path):
+    MappedFileHistory(history_file).search("eu-west")
+
+    # Another history, with the same index path
+    os.replace(history_file, tmp_path / "old")
+    history = MappedFileHistory(history_file)
+    history.append_string("status")
+    assert history.search("eu-west") == []
+    assert history.search("") == ["status"]
+
+
+def test_unwritable_index(history_file, monkeypatch):
+    def fail(*args, **kwargs):
+        raise PermissionError()
+
+    monkeypatch.setattr(_file_history.TrigramIndex, "save", fail)
+    history = MappedFileHistory(history_file)
+    assert history.search("status") == ["ls\nstatus", "status"]
+    assert not history.save_search_index()
+
+
+def test_history_internal_command(capsys):
+    @click.group(invoke_without_command=True)
+    @click.pass_context
+    def cli(ctx):
+        if ctx.invoked_subcommand is None:
+            click_repl.repl(ctx)
+
+    @cli.command()
+    @click.argument("name")
+    def hello(name):
+        pass
+
+    stdin = "hello world\nhello you\n:history\n:history WOR\n:help me\n"
+    with mock_stdin(stdin):
+        with pytest.raises(SystemExit):
+            cli(args=[], prog_name="test_history_internal_command")
+
+    assert capsys.readouterr().out == "hello you\nhello world\nhello world\n"
+
+
+def test_history_internal_command_skips_searches(capsys):
+    @click.group(invoke_without_command=True)
+    @click.pass_context
+    def cli(ctx):
+        if ctx.invoked_subcommand is None:
+            click_repl.repl(ctx)
+
+    @cli.command()
+    @click.argument("name")
+    def hello(name):
+        pass
+
+    stdin = "".join(f"hello {i}\n:history hello {i}\n" for i in range(30))
+    with mock_stdin(stdin + ":history hello\n"):
+        with pytest.raises(SystemExit):
+            cli(args=[], prog_name="test_history_internal_command_skips_searches")
+
+    listed = capsys.readouterr().out.splitlines()[-20:]
+    assert listed == [f"hello {i}" for i in range(29, 9, -1)]
+
+
+def test_key_bindings():
+    history = InMemoryHistory(["ls -l", "cd /", "ls /tmp", "echo"])
+    buffer = Buffer(history=history)
+    buffer.text = "ls"
+    buffer.cursor_position = 0
+
+    bindings = history_search_key_bindings()
+    (binding,) = bindings.bindings
+    event = types.SimpleNamespace(current_buffer=buffer)
+
+    changes = []
+    buffer.on_completions_changed += changes.append
+
+    binding.handler(event)
+    assert buffer.text == "ls /tmp"
+    assert [c.text for c in buffer.complete_state.completions] == ["ls /tmp", "ls -l"]
+    assert changes == [buffer]
+
+    binding.handler(event)
+    assert buffer.text == "ls -l"
+
+    # Completions of the prompt aren't cycled through
+    buffer.cancel_completion()
+    buffer.text = "cd"
+    buffer.complete_state = CompletionState(buffer.document, [Completion("cd ..", -2)])
+    binding.handler(event)
+    assert buffer.text == "cd /"
+
+
+def test_key_bindings_are_opt_in():
+    cli = click.Group()
+    ctx = click.Context(cli)
+    assert "key_bindings" not in bootstrap_prompt(cli, {}, ctx)
+
+    (binding,) = bootstrap_prompt(cli, {}, ctx, history_search=True)[
+        "key_bindings"
+    ].bindings
+    assert binding.keys == ("c-r",)
+
+    own = KeyBindings()
+    own.add("c-r")(lambda event: None)
+    own.add("c-t")(lambda event: None)
+    assert bootstrap_prompt(cli, {"key_bindings": own}, ctx)["key_bindings"] is own
+
+    merged = bootstrap_prompt(cli, {"key_bindings": own}, ctx, history_search=True)
+    keys = [binding.keys for binding in merged["key_bindings"].bindings]
+    # The bindings of the user come last, and take precedence
+    assert keys == [("c-r",), ("c-r",), ("c-t",)]
+    assert merged["key_bindings"].bindings[1:] == own.bindings
@@ -162,3 +162,36 @@ def test_inputs(capsys):
 
     captured_stdout = capsys.readouterr().out.replace("\r\n", "\n")
     assert captured_stdout == ""
+
+
+def test_cleanup_when_a_command_raises(monkeypatch):
+    from click_repl._workers import CallbackRunner
+
+    calls = []
+    monkeypatch.setattr(
+        click_repl.ClickCompleter, "save_index_cache", lambda self: calls.append("save")
+    )
+    monkeypatch.setattr(CallbackRunner, "shutdown", lambda self: calls.append("shutdown"))
+
+    @click.group()
+    def cli():
+        pass
+
+    @cli.command()
+    @click.pass_context
+    def shell(ctx):
+        completer = click_repl.ClickCompleter(cli, ctx.parent)
+        completer._callback_runner = CallbackRunner()
+        click_repl.repl(ctx, prompt_kwargs={"completer": completer})
+
+    @cli.command()
+    def crash():
+        raise RuntimeError("crashed")
+
+    with mock_stdin("crash\n"):
+        with pytest.raises(RuntimeError):
+            cli(args=["shell"], prog_name="test_cleanup_when_a_command_raises")
+
+    assert calls == ["shutdown", "save"]
+    # The REPL command is registered again
+    assert "shell" in cli.commands
@@ -0,0 +1,132 @@
+import click
+import pytest
+
+import click_repl
+from tests import mock_stdin
+
+
+@click.group(invoke_without_command=True)
+@click.pass_context
+def cli(ctx):
+    if ctx.invoked_subcommand is None:
+        click_repl.repl(ctx, allow_system_commands=ctx.obj != "no-system")
+
+
+@cli.command()
+@click.argument("name")
+def hello(name):
+    print(f"Hello {name}!")
+
+
+@cli.command()
+def fail():
+    raise click.ClickException("failed")
+
+
+@cli.command()
+def crash():
+    raise RuntimeError("crashed")
+
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / "script.repl"
+    path.write_text("# greetings\nhello a\n\nfail\ncrash\nhello b\n")
+    return path
+
+
+def test_run_script(capsys, script):
+    report = click_repl.run_script(click.Context(cli), script)
+    assert (report.commands, report.failures) == (4, 2)
+
+    captured = capsys.readouterr()
+    assert captured.out == "Hello a!\nHello b!\n"
+    assert "Error: failed" in captured.err
+    assert f"Error: {script}, line 4: command failed: fail" in captured.err
+    assert f"Error: {script}, line 5: RuntimeError: crashed" in captured.err
+
+
+def test_run_script_fail_fast(capsys, script):
+    report = click_repl.run_script(click.Context(cli), script, fail_fast=True)
+    assert (report.commands, report.failures) == (2, 1)
+    assert capsys.readouterr().out == "Hello a!\n"
+
+
+def test_missing_script(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        click_repl.run_script(click.Context(cli), tmp_path / "missing")
+
+
+def test_source_internal_command(capsys, script, tmp_path):
+    stdin = f"hello x\n:source {script}\n:source {tmp_path / 'missing'}\nhello y\n"
+    with mock_stdin(stdin):
+        with pytest.raises(SystemExit):
+            cli(args=[], prog_name="test_source_internal_command")
+
+    captured = capsys.readouterr()
+    assert captured.out == "Hello x!\nHello a!\nHello b!\nHello y!\n"
+    assert "4 commands in" in captured.err
+    assert "2 failed" in captured.err
+    assert "No such file or directory" in captured.err
+
+
+def test_source_without_system_commands(capfd, tmp_path):
+    script = tmp_path / "script.repl"
+    script.write_text("!echo from-the-shell\n")
+
+    with mock_stdin(f":source {script}\n"):
+        with pytest.raises(SystemExit):
+            cli(args=[], prog_name="test_source", obj="no-system")
+
+    captured = capfd.readouterr()
+    assert "from-the-shell" not in captured.out
+    assert "1 failed" in captured.err
+
+
+def test_source_failures_fail_the_batch(capsys, script):
+    @click.group(invoke_without_command=True)
+    @click.pass_context
+    def batch_cli(ctx):
+        if ctx.invoked_subcommand is None:
+            click_repl.repl(ctx, batch_mode=True, fail_fast=ctx.obj == "fail-fast")
+
+    batch_cli.add_command(hello)
+    batch_cli.add_command(fail)
+
+    with mock_stdin(f":source {script}\nhello y\n"):
+        with pytest.raises(SystemExit) as exit_info:
+            batch_cli(args=[], prog_name="test_source", obj="fail-fast")
+
+    assert exit_info.value.code == 1
+    captured = capsys.readouterr()
+    # The script, then the batch, stop at their first failure
+    assert captured.out == "Hello a!\n"
+    assert f"Error: {script}: 1 of 2 commands failed" in captured.err
+
+    with mock_stdin(f":source {script.parent / 'missing'}\nhello y\n"):
+        with pytest.raises(SystemExit) as exit_info:
+            batch_cli(args=[], prog_name="test_source")
+
+    assert exit_info.value.code == 1
+    captured = capsys.readouterr()
+    assert captured.out == "Hello y!\n"
+    assert "No such file or directory" in captured.err
+    assert "2 commands in" in captured.err
+    assert "1 failed" in captured.err
+
+
+def test_sourcing_cycles(capsys, tmp_path):
+    first, second = tmp_path / "first.repl", tmp_path / "second.repl"
+    first.write_text(f"hello first\n:source {second}\n")
+    second.write_text(f"hello second\n:source {first}\n:source {second}\n")
+
+    with mock_stdin(f":source {first}\n"):
+        with pytest.raises(SystemExit):
+            cli(args=[], prog_name="test_sourcing_cycles")
+
+    captured = capsys.readouterr()
+    assert captured.out == "Hello first!\nHello second!\n"
+    assert f"Error: {first} sources itself" in captured.err
+    assert f"Error: {second} sources itself" in captured.err
+    assert f"Error: {second}: 2 of 3 commands failed" in captured.err
+    assert f"Error: {first}: 1 of 2 commands failed" in captured.err